@@ -1,18 +1,44 @@
-from fastapi import APIRouter, Depends, status
-from sqlmodel import Session, select
-from app.crud import articulo_crud
+from datetime import datetime
+from typing import Optional, Union
 
-from app.models.articulo import Articulo, ArticuloCreate, ArticuloRead, ArticuloUpdate
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlmodel import Session
+from app.crud import articulo_crud, sync_crud
+
+from app.models.articulo import Articulo, ArticuloCreate, ArticuloRead, ArticuloSync, ArticuloUpdate
 from app.db.session import get_session
+from app.core.http_cache import respuesta_condicional
+from app.core.pagination import poner_cabeceras
+from app.core.sincronizacion import leer_token, nuevo_token, poner_token
 
 router = APIRouter(tags=["Articulos"])
 
 
-@router.get("/", response_model=list[ArticuloRead], summary="Listar articulos")
-def read_articulos(*, session: Session = Depends(get_session)):
-    """Lista todos los artículos del catálogo."""
-    articulos = session.exec(select(Articulo)).all()
-    return articulos
+@router.get("/", response_model=Union[list[ArticuloRead], ArticuloSync], summary="Listar articulos")
+def read_articulos(
+    *,
+    session: Session = Depends(get_session),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Tamaño de página (sin él se devuelven todos)"),
+    updated_since: Optional[str] = Query(None, description="Token X-Sync-Token de la carga o sincronización anterior"),
+):
+    """
+    Lista los artículos del catálogo, con paginación por cursor.
+
+    Toda respuesta lleva la cabecera X-Sync-Token (en una carga paginada,
+    vale el de la primera página). Con `?updated_since=<token>` se devuelve
+    solo lo que ha cambiado desde entonces: `{cambios, borrados, token}`.
+    """
+    token = nuevo_token(datetime.now())
+    poner_token(response, token)
+    if updated_since is not None:
+        cambios, borrados = sync_crud.get_cambios(session, Articulo, leer_token(updated_since))
+        return ArticuloSync(cambios=cambios, borrados=borrados, token=token)
+
+    pagina = articulo_crud.get_articulos(session, cursor=cursor, limit=limit)
+    poner_cabeceras(response, pagina)
+    return pagina.items
 
 
 @router.post("/", response_model=ArticuloRead, status_code=status.HTTP_201_CREATED, summary="Crear articulo")
@@ -29,8 +55,24 @@ def create_articulo(*, session: Session = Depends(get_session), articulo_in: Art
 
 
 @router.get("/{articulo_id}", response_model=ArticuloRead, summary="Obtener articulo")
-def read_articulo(*, session: Session = Depends(get_session), articulo_id: str):
-    """Obtener un artículo por su ID."""
+def read_articulo(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    articulo_id: str,
+):
+    """
+    Obtener un artículo por su ID.
+
+    Lleva ETag y Last-Modified; si el cliente ya tiene la versión actual
+    responde 304 sin cargar la fila.
+    """
+    updated_at = articulo_crud.get_articulo_updated_at(session, articulo_id)
+    no_modificada = respuesta_condicional(request, response, "articulo", articulo_id, updated_at)
+    if no_modificada is not None:
+        return no_modificada
+
     articulo = session.get(Articulo, articulo_id)
     if not articulo:
         raise HTTPException(
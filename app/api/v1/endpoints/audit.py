@@ -1,11 +1,12 @@
 from typing import Optional, List # Importamos List por compatibilidad
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlmodel import Session
 
 from app.db.session import get_session
 from app.utils.security import get_current_user
 from app.crud import audit_crud
+from app.core.pagination import poner_cabeceras
 
 # IMPORTAMOS LOS MODELOS DESDE SU ORIGEN (Sin redefinirlos aquí)
 from app.models.audit import AuditLog, AuditLogRead
@@ -20,7 +21,8 @@ def list_audit_logs(
     *,
     session: Session = Depends(get_session),
     current_user: UserRead = Depends(get_current_user),
-    skip: int = Query(0, ge=0, description="Cantidad de registros a saltar"),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
     limit: int = Query(100, ge=1, le=500, description="Cantidad máxima de registros a retornar"),
     actor_email: Optional[str] = Query(None, description="Filtrar por email del actor"),
     target_email: Optional[str] = Query(None, description="Filtrar por email del usuario afectado"),
@@ -39,9 +41,9 @@ def list_audit_logs(
             detail="Solo los administradores pueden acceder a los registros de auditoría"
         )
     
-    logs = audit_crud.list_audit_logs(
+    pagina = audit_crud.list_audit_logs(
         session,
-        skip=skip,
+        cursor=cursor,
         limit=limit,
         actor_email=actor_email,
         target_email=target_email,
@@ -49,7 +51,8 @@ def list_audit_logs(
         date_from=date_from,
         date_to=date_to,
     )
-    return logs
+    poner_cabeceras(response, pagina)
+    return pagina.items
 
 
 @router.get("/{log_id}", response_model=AuditLogRead, summary="Obtener registro de auditoría")
@@ -1,27 +1,157 @@
 # app/api/v1/endpoints/client.py
 
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlmodel import Session, select
+import io
+from datetime import datetime
+from typing import Optional, Union
+
+from fastapi import APIRouter, Depends, File, Query, Request, Response, UploadFile, status, HTTPException
+from sqlmodel import Session
 
 from app.db.session import get_session
-from app.crud import client_crud
-from app.models.client import Client, ClientCreate, ClientRead, ClientUpdate
+from app.crud import client_crud, import_crud, sync_crud
+from app.core.http_cache import respuesta_condicional
+from app.core.pagination import poner_cabeceras
+from app.core.sincronizacion import leer_token, nuevo_token, poner_token
+from app.models.client import (
+    Client,
+    ClientCreate,
+    ClientImportResultado,
+    ClientRead,
+    ClientReadConResumen,
+    ClientResumen,
+    ClientSugerencia,
+    ClientSync,
+    ClientUpdate,
+)
 from app.models.user import User  # Para validar el comercial propietario
+from app.utils.security import get_current_user
 
 router = APIRouter(tags=["Clientes"])
 
 
 @router.get(
     "/",
-    response_model=list[ClientRead],
+    response_model=Union[list[ClientReadConResumen], ClientSync],
     summary="Listar clientes",
 )
-def read_clients(*, session: Session = Depends(get_session)):
+def read_clients(
+    *,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Tamaño de página (sin él se devuelven todos)"),
+    con_resumen: bool = Query(False, description="Incluir nº de presupuestos, total aprobado, último presupuesto y nº de notas"),
+    q: Optional[str] = Query(None, max_length=200, description="Búsqueda en nombre, NIF, correo, teléfono, dirección y provincia"),
+    updated_since: Optional[str] = Query(None, description="Token X-Sync-Token de la carga o sincronización anterior"),
+):
     """
-    Lista todos los clientes.
+    Lista los clientes ordenados por nombre, con paginación por cursor.
+
+    Un ADMIN ve todos; el resto, solo los clientes de los que es comercial
+    propietario.
+
+    Con `q` se devuelven los clientes que contienen todas las palabras
+    (como prefijo, sin distinguir tildes), de más a menos relevante, usando
+    el índice de texto completo. Solo los `limit` primeros (50 por defecto);
+    X-Has-More indica si había más, pero no hay cursor.
+
+    Con `con_resumen=true` cada cliente lleva `resumen` con su actividad,
+    calculado para toda la página en una sola consulta agrupada.
+
+    Toda respuesta lleva la cabecera X-Sync-Token (en una carga paginada,
+    vale el de la primera página). Con `?updated_since=<token>` se devuelve
+    solo lo que ha cambiado desde entonces: `{cambios, borrados, token}`;
+    en `borrados` también van los clientes que han pasado a otro comercial.
     """
-    clients = session.exec(select(Client)).all()
-    return clients
+    id_comercial = None if current_user.rol == "ADMIN" else current_user.id_usuario
+    token = nuevo_token(datetime.now())
+    poner_token(response, token)
+    if updated_since is not None:
+        cambios, borrados = sync_crud.get_cambios(
+            session, Client, leer_token(updated_since), id_propietario=id_comercial
+        )
+        return ClientSync(cambios=cambios, borrados=borrados, token=token)
+
+    if q:
+        pagina = client_crud.buscar_clients(session, q, limit=limit or 50, id_comercial=id_comercial)
+    else:
+        pagina = client_crud.get_clients(session, cursor=cursor, limit=limit, id_comercial=id_comercial)
+    poner_cabeceras(response, pagina)
+    if not con_resumen:
+        return pagina.items
+
+    resumenes = client_crud.get_resumenes(session, [c.id_cliente for c in pagina.items])
+    return [
+        ClientReadConResumen.model_validate(
+            c, update={"resumen": resumenes.get(c.id_cliente, ClientResumen())}
+        )
+        for c in pagina.items
+    ]
+
+
+@router.get(
+    "/sugerencias",
+    response_model=list[ClientSugerencia],
+    summary="Sugerir clientes por nombre (autocompletar)",
+)
+def suggest_clients(
+    *,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    q: str = Query(..., min_length=1, max_length=100, description="Lo escrito hasta ahora"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Sugerencias para el formulario de presupuesto mientras se escribe el
+    cliente. No distingue mayúsculas ni tildes e ignora la forma jurídica
+    (S.L., SA, LDA...): primero los nombres que empiezan por lo escrito,
+    después los que tienen palabras que empiezan así y, por último, los
+    parecidos (trigramas). Se sirve desde un índice en memoria.
+
+    Un ADMIN ve todos los clientes; el resto, solo los suyos.
+    """
+    id_comercial = None if current_user.rol == "ADMIN" else current_user.id_usuario
+    return [
+        ClientSugerencia(id_cliente=e.id_cliente, nombre=e.nombre)
+        for e in client_crud.sugerir_clients(session, q, limite=limit, id_comercial=id_comercial)
+    ]
+
+
+@router.post(
+    "/import",
+    response_model=ClientImportResultado,
+    summary="Importar clientes desde CSV",
+)
+def import_clients(
+    *,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    fichero: UploadFile = File(..., description="CSV con cabecera (nombre obligatorio; nif, correo/email, telefono, direccion, provincia)"),
+    id_comercial_propietario: Optional[int] = Query(None, description="Comercial al que se asignan. Por defecto, quien importa"),
+):
+    """
+    Importa clientes en bloque desde un CSV (UTF-8, separador ; , tab o |
+    detectado automáticamente). Se omiten los que ya existen (mismo nombre
+    normalizado o mismo NIF) y los repetidos dentro del fichero. Todo entra
+    en una sola transacción. Solo para ADMIN.
+    """
+    if current_user.rol != "ADMIN":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los administradores pueden importar clientes",
+        )
+    id_comercial = id_comercial_propietario or current_user.id_usuario
+    if session.get(User, id_comercial) is None:
+        raise HTTPException(status_code=404, detail="El comercial propietario no existe")
+
+    texto = io.TextIOWrapper(fichero.file, encoding="utf-8-sig", newline="")
+    try:
+        return import_crud.importar_clients(session, texto, id_comercial=id_comercial)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El fichero debe estar en UTF-8")
+    finally:
+        texto.detach()
 
 
 @router.post(
@@ -63,11 +193,21 @@ def create_client(
 def read_client(
     *,
     session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
     client_id: int,
 ):
     """
     Obtener un cliente por su ID.
+
+    Lleva ETag y Last-Modified; si el cliente ya tiene la versión actual
+    responde 304 sin cargar la fila.
     """
+    updated_at = client_crud.get_client_updated_at(session, client_id)
+    no_modificada = respuesta_condicional(request, response, "cliente", client_id, updated_at)
+    if no_modificada is not None:
+        return no_modificada
+
     client = session.get(Client, client_id)
     if not client:
         raise HTTPException(
@@ -1,67 +1,94 @@
-from typing import Dict, Any, List
-from datetime import date
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select, func, SQLModel
-from sqlalchemy.orm import selectinload #para poder traer los datos del cliente
+import asyncio
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, SQLModel
 
-from app.db import get_session
-from app.models.client import Client
-from app.models.presupuesto import Presupuesto
+from app.db.session import get_session
+from app.crud import dashboard_crud
+from app.core.eventos import difusor_dashboard, registrar_fallo
+from app.utils.security import usuario_desde_token
+from app.core.pagination import poner_cabeceras
+from app.schemas.dashboard import DashboardStats, PuntoSerieVentas
+from app.schemas.presupuesto import PresupuestoConCliente
 
 router = APIRouter(tags=["Dashboard"])
 
-# 1. Esquema de Respuesta
-class DashboardStats(SQLModel):
-    ventas_mensuales: float = 0.0 
-    total_presupuestos_activos: int = 0
-    nuevos_clientes_mes: int = 0 
-    
-    total_clientes: int
-    presupuestos_pendientes: int
-    presupuestos_aprobados: int
-    presupuestos_denegados: int
-    presupuestos_borrador: int
 
-router = APIRouter()
+class DashboardCacheStats(SQLModel):
+    hits: int
+    misses: int
+    invalidaciones: int
+    entradas: int
+    ttl_segundos: float
+
 
 @router.get("/stats", response_model=DashboardStats)
-def get_dashboard_stats(session: Session = Depends(get_session)) -> DashboardStats:
-    
-    # --- CALCULAR FECHAS ---
+def get_dashboard_stats(
+    session: Session = Depends(get_session),
+    fecha_desde: Optional[date] = Query(None, alias="date_from", description="Inicio del periodo (incluido)"),
+    fecha_hasta: Optional[date] = Query(None, alias="date_to", description="Fin del periodo (incluido). Por defecto, hoy"),
+) -> DashboardStats:
+    """
+    Tarjetas del dashboard, cacheadas unos segundos (DASHBOARD_CACHE_TTL)
+    y recalculadas en cuanto se escribe un presupuesto o un cliente.
+
+    Con `date_from` (y opcionalmente `date_to`) las cifras son las de los
+    presupuestos con fecha en ese periodo: ventas aprobadas, contadores por
+    estado, clientes nuevos y artículos más vendidos. Salen de los buckets
+    diarios, así que cualquier rango (un trimestre, 90 días) cuesta lo mismo.
+    `date_to` sin `date_from` es un error (400).
+    """
     hoy = date.today()
-    inicio_mes = hoy.replace(day=1) 
+    if fecha_hasta is not None and fecha_desde is None:
+        # Sin esto se devolverían las cifras de siempre como si fueran del periodo
+        raise HTTPException(status_code=400, detail="date_to requiere date_from")
+    if fecha_desde is not None:
+        fecha_hasta = fecha_hasta or hoy
+        return dashboard_crud.cache_dashboard.obtener(
+            ("stats", fecha_desde, fecha_hasta),
+            lambda: _calcular_stats_periodo(session, fecha_desde, fecha_hasta),
+        )
+    return dashboard_crud.cache_dashboard.obtener(
+        ("stats", hoy), lambda: _calcular_stats(session, hoy)
+    )
+
+
+def _calcular_stats(session: Session, hoy: date) -> DashboardStats:
+    """
+    Contadores y ventas salen de la tabla de agregados (dashboard_crud), que
+    se mantiene al escribir presupuestos y clientes: una sola consulta por
+    clave primaria en lugar de SUM/COUNT/GROUP BY. Los clientes nuevos y el
+    ranking de artículos del mes son consultas por rango sobre índices.
+    """
+
+    claves = {
+        "ventas": dashboard_crud.clave_ventas(hoy),
+        "clientes": dashboard_crud.CLAVE_CLIENTES,
+        "pendientes": dashboard_crud.clave_estado("ENVIADO_ADMIN"),
+        "aprobados": dashboard_crud.clave_estado("APROBADO"),
+        "denegados": dashboard_crud.clave_estado("DENEGADO"),
+        "borradores": dashboard_crud.clave_estado("BORRADOR"),
+    }
+    valores = dashboard_crud.leer_agregados(session, claves.values())
+    stats = {nombre: valores[clave] for nombre, clave in claves.items()}
 
     # --- A. Ventas Mensuales (APROBADOS este mes) ---
-    query_ventas = select(func.sum(Presupuesto.total)).where(
-        Presupuesto.estado == "APROBADO",
-        Presupuesto.fecha_presupuesto >= inicio_mes
-    )
-    
-    # ### CORRECCIÓN 2: Unificar nombres de variables
-    resultado_ventas = session.exec(query_ventas).first()
-    # Aquí antes ponías "result_ventas", pero la variable de arriba es "resultado_ventas"
-    ventas_mensuales = resultado_ventas if resultado_ventas else 0.0
-
-    # --- B. Nuevos Clientes ---
-    nuevos_clientes = 0 # (Lógica pendiente, lo dejamos a 0 por ahora)
-
-    # --- C. Clientes Totales ---
-    count_clientes = session.exec(select(func.count()).select_from(Client)).one()
-
-    # --- D. Presupuestos por Estado ---
-    statement = (
-        select(Presupuesto.estado, func.count())
-        .select_from(Presupuesto)
-        .group_by(Presupuesto.estado)
+    ventas_mensuales = stats["ventas"]
+
+    # --- B. Nuevos Clientes y artículos más vendidos del mes ---
+    inicio_mes = hoy.replace(day=1)
+    nuevos_clientes = dashboard_crud.contar_clientes_nuevos(
+        session, datetime.combine(inicio_mes, datetime.min.time())
     )
-    results = session.exec(statement).all()
-    
-    stats_map: Dict[str, int] = {estado: total for estado, total in results}
+    mas_vendidos = dashboard_crud.get_articulos_mas_vendidos(session, fecha_desde=inicio_mes)
 
-    pendientes = stats_map.get("ENVIADO_ADMIN", 0)
-    aprobados = stats_map.get("APROBADO", 0)
-    denegados = stats_map.get("DENEGADO", 0)
-    borradores = stats_map.get("BORRADOR", 0)
+    # --- C/D. Clientes Totales y Presupuestos por Estado ---
+    pendientes = int(stats["pendientes"])
+    aprobados = int(stats["aprobados"])
+    denegados = int(stats["denegados"])
+    borradores = int(stats["borradores"])
 
     activos = pendientes + borradores 
 
@@ -69,25 +96,160 @@ def get_dashboard_stats(session: Session = Depends(get_session)) -> DashboardSta
         ventas_mensuales=ventas_mensuales,
         total_presupuestos_activos=activos,
         nuevos_clientes_mes=nuevos_clientes,
-        total_clientes=count_clientes,
+        articulos_mas_vendidos=mas_vendidos,
+        total_clientes=int(stats["clientes"]),
         presupuestos_pendientes=pendientes,
         presupuestos_aprobados=aprobados,
         presupuestos_denegados=denegados,
         presupuestos_borrador=borradores
     )
 
-# Cambiar el response_model
-# Al usar selectinload, el objeto Presupuesto ya incluirá dentro los datos del cliente.
-@router.get("/history", response_model=List[Presupuesto]) 
-def get_dashboard_history(session: Session = Depends(get_session)):
+
+def _calcular_stats_periodo(session: Session, fecha_desde: date, fecha_hasta: date) -> DashboardStats:
+    por_estado = dashboard_crud.leer_periodo(session, fecha_desde, fecha_hasta)
+    vacio = {"num": 0.0, "bruto": 0.0, "neto": 0.0}
+    aprobados = por_estado.get("APROBADO", vacio)
+    pendientes = int(por_estado.get("ENVIADO_ADMIN", vacio)["num"])
+    borradores = int(por_estado.get("BORRADOR", vacio)["num"])
+    clientes = dashboard_crud.leer_agregados(session, [dashboard_crud.CLAVE_CLIENTES])
+
+    return DashboardStats(
+        ventas_mensuales=aprobados["neto"],
+        total_presupuestos_activos=pendientes + borradores,
+        nuevos_clientes_mes=dashboard_crud.contar_clientes_nuevos(
+            session,
+            datetime.combine(fecha_desde, datetime.min.time()),
+            datetime.combine(fecha_hasta + timedelta(days=1), datetime.min.time()),
+        ),
+        articulos_mas_vendidos=dashboard_crud.get_articulos_mas_vendidos(
+            session, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta
+        ),
+        total_clientes=int(clientes[dashboard_crud.CLAVE_CLIENTES]),
+        presupuestos_pendientes=pendientes,
+        presupuestos_aprobados=int(aprobados["num"]),
+        presupuestos_denegados=int(por_estado.get("DENEGADO", vacio)["num"]),
+        presupuestos_borrador=borradores,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        ventas_brutas=aprobados["bruto"],
+    )
+
+
+@router.get("/history", response_model=List[PresupuestoConCliente])
+def get_dashboard_history(
+    *,
+    session: Session = Depends(get_session),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    limit: int = Query(10, ge=1, le=100),
+    since_id: Optional[int] = Query(None, description="Solo presupuestos con id mayor que este (polling)"),
+):
     """
-    Devuelve los últimos presupuestos incluyendo los datos del cliente real.
+    Feed de los últimos presupuestos (más recientes primero) con el
+    nombre y la provincia del cliente.
+
+    - Siguiente página: `?cursor=<X-Next-Cursor>`.
+    - Polling: `?since_id=<mayor id recibido>` devuelve solo los nuevos.
+
+    La primera página (sin cursor ni since_id) se cachea igual que /stats.
+    """
+    if cursor is None and since_id is None:
+        pagina = dashboard_crud.cache_dashboard.obtener(
+            ("history", limit), lambda: dashboard_crud.get_historial(session, limit=limit)
+        )
+    else:
+        pagina = dashboard_crud.get_historial(session, cursor=cursor, limit=limit, since_id=since_id)
+    poner_cabeceras(response, pagina)
+    return pagina.items
+
+
+@router.get("/series", response_model=List[PuntoSerieVentas])
+def get_dashboard_series(
+    *,
+    session: Session = Depends(get_session),
+    fecha_desde: Optional[date] = Query(None, description="Desde (incluida). Por defecto, hace un año"),
+    fecha_hasta: Optional[date] = Query(None, description="Hasta (incluida). Por defecto, hoy"),
+    periodo: str = Query("mes", pattern=r"^(dia|semana|mes)$", description="Agrupación temporal: dia, semana o mes"),
+    desglose: Optional[str] = Query(
+        None,
+        pattern=r"^(comercial|provincia|familia)$",
+        description="Desglose opcional: comercial, provincia o familia",
+    ),
+):
+    """
+    Serie temporal de ventas aprobadas (importe neto), opcionalmente
+    desglosada por comercial creador, provincia del cliente o familia del
+    artículo. Cacheada igual que /stats.
+    """
+    fecha_hasta = fecha_hasta or date.today()
+    fecha_desde = fecha_desde or fecha_hasta - timedelta(days=365)
+    return dashboard_crud.cache_dashboard.obtener(
+        ("series", fecha_desde, fecha_hasta, periodo, desglose),
+        lambda: dashboard_crud.get_series_ventas(
+            session,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            periodo=periodo,
+            desglose=desglose,
+        ),
+    )
+
+
+@router.get("/cache", response_model=DashboardCacheStats)
+def get_dashboard_cache_stats() -> DashboardCacheStats:
+    """Aciertos/fallos/invalidaciones de la caché del dashboard."""
+    stats = dashboard_crud.cache_dashboard.estadisticas()
+    return DashboardCacheStats(
+        hits=stats.hits,
+        misses=stats.misses,
+        invalidaciones=stats.invalidaciones,
+        entradas=stats.entradas,
+        ttl_segundos=dashboard_crud.cache_dashboard.ttl,
+    )
+
+
+@router.websocket("/ws")
+async def dashboard_en_vivo(
+    websocket: WebSocket,
+    token: str = Query(..., description="JWT (los navegadores no envían cabeceras en WebSocket)"),
+    session: Session = Depends(get_session),
+):
+    """
+    Canal de eventos en vivo del dashboard. Tras conectar llega
+    `{"tipo": "conectado"}` y después un JSON por cambio confirmado:
+    `presupuesto_creado`, `presupuesto_actualizado` (estado/total, con
+    `estado_anterior`) y `cliente_creado`. Un ADMIN recibe todos; el resto,
+    solo los de sus presupuestos y clientes. Con ellos el cliente actualiza
+    contadores e historial sin volver a pedir /stats ni /history. Si llega
+    `resync`, el cliente se ha quedado atrás y debe recargar ambos.
     """
-    # 1. Creamos la consulta
-    statement = (
-        select(Presupuesto)
-        # Esto le dice a la BD: "Traete también los datos del cliente asociado"
-        .options(selectinload(Presupuesto.cliente)) 
-        .order_by(Presupuesto.fecha_presupuesto.desc()) 
-        .limit(10) 
-    )
\ No newline at end of file
+    usuario = await run_in_threadpool(usuario_desde_token, session, token)
+    bind = session.get_bind()
+    # La sesión solo hace falta para autenticar; no se retiene la conexión a BD
+    session.close()
+    if usuario is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    suscripcion = await difusor_dashboard.suscribir(
+        bind, None if usuario.rol == "ADMIN" else usuario.id_usuario
+    )
+    suscripcion.entregar('{"tipo": "conectado"}')
+
+    async def enviar():
+        while True:
+            await websocket.send_text(await suscripcion.siguiente())
+
+    envio = asyncio.create_task(enviar(), name="dashboard-ws-envio")
+    envio.add_done_callback(registrar_fallo)
+    try:
+        while True:
+            # Lo que mande el cliente (pings) se ignora; sirve para
+            # enterarse del cierre de la conexión.
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        difusor_dashboard.cancelar(suscripcion)
+        envio.cancel()
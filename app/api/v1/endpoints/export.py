@@ -0,0 +1,77 @@
+# app/api/v1/endpoints/export.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from app.crud import export_crud
+from app.db.session import get_session
+from app.models.presupuesto import PresupuestoFiltros
+from app.models.user import User
+from app.utils.export import FORMATOS_EXPORT, serializar
+from app.utils.security import get_current_user
+
+router = APIRouter(tags=["Exportación"])
+
+
+def _respuesta_export(session: Session, statement, formato: str, nombre: str) -> StreamingResponse:
+    columnas = export_crud.columnas(statement)
+    lotes = export_crud.iterar_lotes(session.get_bind(), statement)
+    return StreamingResponse(
+        serializar(formato, columnas, lotes),
+        media_type=FORMATOS_EXPORT[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'},
+    )
+
+
+def _solo_admin(current_user: User) -> None:
+    if current_user.rol != "ADMIN":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los administradores pueden exportar datos",
+        )
+
+
+@router.get(
+    "/presupuestos",
+    response_class=StreamingResponse,
+    summary="Exportar cabeceras de presupuestos (CSV / NDJSON)",
+)
+def export_presupuestos(
+    *,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    filtros: PresupuestoFiltros = Depends(),
+    formato: str = Query("csv", pattern=r"^(csv|ndjson)$", description="csv o ndjson"),
+):
+    """
+    Una fila por presupuesto (con nombre y provincia del cliente y los
+    totales), con los mismos filtros que el listado. Se envía en streaming
+    desde un cursor de BD: empieza a llegar enseguida y no carga todo en
+    memoria. Solo para ADMIN.
+    """
+    _solo_admin(current_user)
+    statement = export_crud.consulta_presupuestos(filtros)
+    return _respuesta_export(session, statement, formato, "presupuestos")
+
+
+@router.get(
+    "/lineas",
+    response_class=StreamingResponse,
+    summary="Exportar líneas de presupuestos (CSV / NDJSON)",
+)
+def export_lineas(
+    *,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    filtros: PresupuestoFiltros = Depends(),
+    formato: str = Query("csv", pattern=r"^(csv|ndjson)$", description="csv o ndjson"),
+):
+    """
+    Una fila por línea de presupuesto con fecha, estado, cliente y comercial
+    de su cabecera. Los filtros se aplican sobre la cabecera (estado,
+    fechas, cliente...). En streaming, como /presupuestos. Solo para ADMIN.
+    """
+    _solo_admin(current_user)
+    statement = export_crud.consulta_lineas(filtros)
+    return _respuesta_export(session, statement, formato, "lineas")
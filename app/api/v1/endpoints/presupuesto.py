@@ -1,18 +1,30 @@
 # app/api/v1/endpoints/presupuesto.py
 
-from typing import List
+from datetime import date
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlmodel import Session
 
 from app.db.session import get_session
 from app.crud import presupuesto_crud
+from app.core.http_cache import respuesta_condicional
+from app.core.pagination import poner_cabeceras
+from app.models.client import Client
+from app.models.user import User
 from app.models.presupuesto import (
     Presupuesto,
+    PresupuestoBulkResultado,
     PresupuestoCompletoCreate,
     PresupuestoCompletoRead,
+    PresupuestoFiltros,
+    PresupuestoResumen,
     PresupuestoUpdate,
 )
+from app.utils import pdf
+from app.utils.security import get_current_user
 
 router = APIRouter(tags=["Presupuestos"])
 
@@ -29,22 +41,82 @@ router = APIRouter(tags=["Presupuestos"])
 def list_presupuestos(
     *,
     session: Session = Depends(get_session),
-    skip: int = 0,
-    limit: int = 100,
+    current_user: User = Depends(get_current_user),
+    response: Response,
+    filtros: PresupuestoFiltros = Depends(),
+    orden: str = Query(
+        "id",
+        pattern=r"^-?(id|fecha|total)$",
+        description="Campo de orden: id, fecha o total ('-' delante = descendente)",
+    ),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=500),
 ) -> List[PresupuestoCompletoRead]:
     """
-    Listar presupuestos con paginación.
+    Listar presupuestos con filtros, orden y paginación por cursor.
+
+    Filtros: estado, id_cliente, id_comercial_creador, rango de
+    fecha_presupuesto (fecha_desde/fecha_hasta) y de total (total_min/total_max).
 
     Devuelve:
     - Cabecera del presupuesto
     - Líneas de detalle
-    - Totales calculados (total_bruto, total_descuento, total_neto)
+    - Totales (total_bruto, total_descuento, total_neto)
+
+    La siguiente página se pide con `?cursor=<X-Next-Cursor>` (mismos filtros y orden).
+
+    Quien no es ADMIN solo ve los presupuestos que ha creado.
     """
-    return presupuesto_crud.get_presupuestos_completos(
+    filtros = presupuesto_crud.limitar_a_usuario(filtros, current_user)
+    pagina = presupuesto_crud.get_presupuestos_completos(
         session=session,
-        skip=skip,
+        filtros=filtros,
+        orden=orden,
+        cursor=cursor,
         limit=limit,
     )
+    poner_cabeceras(response, pagina)
+    return pagina.items
+
+
+# ==================================
+#   LISTAR PRESUPUESTOS (RESUMEN)
+# ==================================
+@router.get(
+    "/resumen",
+    response_model=List[PresupuestoResumen],
+    status_code=status.HTTP_200_OK,
+    summary="Listar presupuestos (resumen sin líneas)",
+)
+def list_presupuestos_resumen(
+    *,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    response: Response,
+    filtros: PresupuestoFiltros = Depends(),
+    orden: str = Query(
+        "id",
+        pattern=r"^-?(id|fecha|total)$",
+        description="Campo de orden: id, fecha o total ('-' delante = descendente)",
+    ),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=1000),
+) -> List[PresupuestoResumen]:
+    """
+    Versión ligera del listado para tablas: cabecera, totales guardados,
+    número de líneas y nombre del cliente. Mismos filtros, orden y
+    paginación que `GET /presupuestos/`, pero sin cargar las líneas.
+    """
+    filtros = presupuesto_crud.limitar_a_usuario(filtros, current_user)
+    pagina = presupuesto_crud.get_presupuestos_resumen(
+        session=session,
+        filtros=filtros,
+        orden=orden,
+        cursor=cursor,
+        limit=limit,
+    )
+    poner_cabeceras(response, pagina)
+    return pagina.items
 
 
 # ==================================
@@ -76,6 +148,94 @@ def create_presupuesto_completo_api(
     return presupuesto_crud.build_presupuesto_completo_read(presupuesto_db)
 
 
+# ==================================
+#   IMPORTACIÓN MASIVA
+# ==================================
+@router.post(
+    "/bulk",
+    response_model=PresupuestoBulkResultado,
+    status_code=status.HTTP_200_OK,
+    summary="Importar presupuestos completos en bloque",
+)
+def create_presupuestos_bulk_api(
+    *,
+    session: Session = Depends(get_session),
+    presupuestos_in: List[PresupuestoCompletoCreate],
+) -> PresupuestoBulkResultado:
+    """
+    Crea muchos presupuestos completos en una sola transacción.
+
+    Los que referencian clientes o artículos inexistentes no se crean y
+    aparecen en `errores` con su posición en la lista; el resto se crea.
+    """
+    return presupuesto_crud.create_presupuestos_bulk(
+        session=session,
+        presupuestos_in=presupuestos_in,
+    )
+
+
+# ==================================
+#   EXPORTAR PDFs EN ZIP
+# ==================================
+@router.get(
+    "/exportar/pdf",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Descargar en un ZIP los PDFs de los presupuestos filtrados",
+)
+def export_presupuestos_pdf_zip(
+    *,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    estado: Optional[str] = Query(None, description="Estado del presupuesto (p. ej. APROBADO)"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha de presupuesto desde (incluida)"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha de presupuesto hasta (incluida)"),
+    id_comercial_creador: Optional[int] = Query(None, description="Comercial que creó el presupuesto"),
+) -> StreamingResponse:
+    """
+    Devuelve un ZIP con el PDF de cada presupuesto que cumple el filtro
+    (solo para ADMIN).
+
+    El ZIP se envía a medida que se generan los PDFs: se renderizan en
+    paralelo en el pool de procesos, se reutilizan los que ya están en caché
+    y los presupuestos se leen de la BD por lotes, así que la memoria no
+    depende de cuántos documentos entren.
+    """
+    if current_user.rol != "ADMIN":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los administradores pueden exportar presupuestos",
+        )
+
+    filtros = PresupuestoFiltros(
+        estado=estado,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        id_comercial_creador=id_comercial_creador,
+    )
+    # La respuesta se sigue generando después de cerrar la sesión de la
+    # petición, así que el generador abre la suya sobre el mismo engine.
+    bind = session.get_bind()
+
+    def _datos():
+        with Session(bind) as session_export:
+            for presupuesto_read, cliente in presupuesto_crud.iterar_presupuestos_completos(
+                session_export, filtros=filtros
+            ):
+                yield pdf.preparar_datos(presupuesto_read, cliente)
+
+    nombre = "presupuestos"
+    if estado:
+        nombre += f"_{estado.lower()}"
+    if fecha_desde or fecha_hasta:
+        nombre += f"_{fecha_desde or ''}_{fecha_hasta or ''}"
+    return StreamingResponse(
+        pdf.zip_en_streaming(_datos()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.zip"'},
+    )
+
+
 # ==================================
 #   LEER PRESUPUESTO POR ID
 # ==================================
@@ -88,6 +248,8 @@ def create_presupuesto_completo_api(
 def read_presupuesto(
     *,
     presupuesto_id: int,
+    request: Request,
+    response: Response,
     session: Session = Depends(get_session),
 ) -> PresupuestoCompletoRead:
     """
@@ -95,7 +257,15 @@ def read_presupuesto(
     - Cabecera
     - Líneas
     - Totales
+
+    Lleva ETag y Last-Modified; con `If-None-Match` / `If-Modified-Since` de
+    la versión actual responde 304 sin cargar el presupuesto.
     """
+    updated_at = presupuesto_crud.get_presupuesto_updated_at(session, presupuesto_id)
+    no_modificada = respuesta_condicional(request, response, "presupuesto", presupuesto_id, updated_at)
+    if no_modificada is not None:
+        return no_modificada
+
     presupuesto_read = presupuesto_crud.get_presupuesto_completo_by_id(
         session=session,
         presupuesto_id=presupuesto_id,
@@ -108,6 +278,50 @@ def read_presupuesto(
     return presupuesto_read
 
 
+# ==================================
+#   PDF DEL PRESUPUESTO
+# ==================================
+@router.get(
+    "/{presupuesto_id}/pdf",
+    response_class=FileResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Descargar el presupuesto en PDF",
+)
+async def read_presupuesto_pdf(
+    *,
+    presupuesto_id: int,
+    session: Session = Depends(get_session),
+) -> FileResponse:
+    """
+    Devuelve el PDF del presupuesto, generado en el servidor.
+
+    El PDF se cachea en disco por id y versión del contenido: si el
+    presupuesto no ha cambiado desde la última descarga se envía el fichero
+    ya generado; si ha cambiado, se vuelve a renderizar (en el pool de
+    procesos, sin bloquear la API).
+    """
+    def _cargar_datos() -> Optional[dict]:
+        presupuesto_read = presupuesto_crud.get_presupuesto_completo_by_id(
+            session=session,
+            presupuesto_id=presupuesto_id,
+        )
+        if not presupuesto_read:
+            return None
+        cliente = session.get(Client, presupuesto_read.id_cliente)
+        return pdf.preparar_datos(presupuesto_read, cliente)
+
+    datos = await run_in_threadpool(_cargar_datos)
+    if datos is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Presupuesto no encontrado",
+        )
+
+    ruta = await pdf.obtener_pdf(datos)
+    nombre = datos.get("numero_presupuesto") or f"presupuesto_{presupuesto_id}"
+    return FileResponse(ruta, media_type="application/pdf", filename=f"{nombre}.pdf")
+
+
 # ==================================
 #   LISTAR POR CLIENTE
 # ==================================
@@ -141,7 +355,7 @@ def read_presupuestos_by_cliente(
     "/{presupuesto_id}",
     response_model=PresupuestoCompletoRead,
     status_code=status.HTTP_200_OK,
-    summary="Actualizar presupuesto (solo cabecera)",
+    summary="Actualizar presupuesto",
 )
 def update_presupuesto(
     *,
@@ -150,8 +364,9 @@ def update_presupuesto(
     session: Session = Depends(get_session),
 ) -> PresupuestoCompletoRead:
     """
-    Actualiza la **cabecera** de un presupuesto existente.
-    (No modifica las líneas de detalle.)
+    Actualiza la cabecera de un presupuesto existente y, si el body trae
+    `lineas`, reconcilia las líneas por id (solo se tocan las que cambian).
+    La respuesta incluye `cambios_lineas` con lo insertado/actualizado/borrado.
     """
     presupuesto_db = presupuesto_crud.get_presupuesto_by_id(
         session=session,
@@ -163,14 +378,16 @@ def update_presupuesto(
             detail="Presupuesto no encontrado",
         )
 
-    presupuesto_db = presupuesto_crud.update_presupuesto(
+    presupuesto_db, cambios = presupuesto_crud.update_presupuesto(
         session=session,
         presupuesto=presupuesto_db,
         presupuesto_in=presupuesto_in,
     )
 
     # Devolvemos el presupuesto actualizado como PresupuestoCompletoRead
-    return presupuesto_crud.build_presupuesto_completo_read(presupuesto_db)
+    presupuesto_read = presupuesto_crud.build_presupuesto_completo_read(presupuesto_db)
+    presupuesto_read.cambios_lineas = cambios
+    return presupuesto_read
 
 
 # ==================================
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 # Imports de tu proyecto
@@ -10,7 +10,8 @@ from app.utils.security import get_current_user, get_password_hash
 # Si quieres mantener el rate limit
 from app.core.rate_limiting import rate_limit, RATE_LIMITS 
 # (Opcional) Si quieres mantener auditoría, impórtalo, pero asegúrate que use id_usuario
-from app.crud import audit_crud 
+from app.crud import audit_crud, user_crud
+from app.core.pagination import poner_cabeceras
 
 router = APIRouter(tags=["Usuarios"])
 
@@ -20,12 +21,19 @@ class PasswordReset(BaseModel):
 
 # 1. LISTAR USUARIOS (Solo Admin)
 @router.get("/", response_model=List[User], summary="Listar usuarios")
-def read_users(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def read_users(
+    response: Response,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Tamaño de página (sin él se devuelven todos)"),
+):
     if current_user.rol != "ADMIN":
         raise HTTPException(status_code=403, detail="No tienes permisos de administrador")
     
-    users = session.exec(select(User)).all()
-    return users
+    pagina = user_crud.get_users(session, cursor=cursor, limit=limit)
+    poner_cabeceras(response, pagina)
+    return pagina.items
 
 # 2. CREAR USUARIO (Solo Admin)
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED, summary="Crear usuario")
@@ -0,0 +1,117 @@
+"""
+Caché en memoria (por proceso) con caducidad para resultados caros de leer.
+
+- Cada entrada caduca a los `ttl` segundos. Como las claves dependen de
+  parámetros de la petición (rangos de fechas...), al guardar se purgan las
+  caducadas y, si aun así hay más de `max_entradas`, se descartan las usadas
+  hace más tiempo (LRU): la memoria no crece sin límite entre escrituras.
+- Si llegan varias peticiones a la vez para una clave que no está, solo una
+  calcula el valor; las demás esperan a ese resultado (sin estampidas tras
+  un login masivo).
+- `invalidar()` vacía la caché; se llama al confirmar escrituras que
+  afectan a los datos cacheados (ver dashboard_crud).
+- Lleva contadores de aciertos/fallos para poder vigilar su efecto.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class EstadisticasCache:
+    hits: int = 0
+    misses: int = 0
+    invalidaciones: int = 0
+    entradas: int = 0
+
+
+class CacheTTL:
+    """Caché clave -> valor con caducidad y cálculo coalescido por clave."""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entradas: int = 1000,
+        reloj: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._reloj = reloj
+        # Orden de uso (la menos usada recientemente, primero)
+        self._datos: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # Se incrementa en cada invalidación: un cálculo que empezó antes no
+        # debe guardar su resultado (podría ser anterior a la escritura).
+        self._generacion = 0
+        self._stats = EstadisticasCache()
+
+    def _vigente(self, clave: Hashable):
+        entrada = self._datos.get(clave)
+        if entrada is not None and entrada[0] > self._reloj():
+            self._datos.move_to_end(clave)
+            return True, entrada[1]
+        return False, None
+
+    def _guardar(self, clave: Hashable, valor: Any) -> None:
+        ahora = self._reloj()
+        for caducada in [k for k, (caduca, _) in self._datos.items() if caduca <= ahora]:
+            del self._datos[caducada]
+        self._datos[clave] = (ahora + self.ttl, valor)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+
+    def obtener(self, clave: Hashable, calcular: Callable[[], T]) -> T:
+        """Devuelve el valor cacheado de `clave` o lo calcula con `calcular()`."""
+        with self._lock:
+            encontrado, valor = self._vigente(clave)
+            if encontrado:
+                self._stats.hits += 1
+                return valor
+            lock_clave = self._locks.setdefault(clave, threading.Lock())
+
+        with lock_clave:
+            try:
+                # Otro hilo puede haberlo calculado mientras esperábamos
+                with self._lock:
+                    encontrado, valor = self._vigente(clave)
+                    if encontrado:
+                        self._stats.hits += 1
+                        return valor
+                    self._stats.misses += 1
+                    generacion = self._generacion
+
+                valor = calcular()
+
+                with self._lock:
+                    if generacion == self._generacion:
+                        self._guardar(clave, valor)
+                return valor
+            finally:
+                # Los que ya esperan tienen su referencia; los que lleguen
+                # después encuentran el valor guardado
+                with self._lock:
+                    if self._locks.get(clave) is lock_clave:
+                        del self._locks[clave]
+
+    def invalidar(self) -> None:
+        """Vacía la caché."""
+        with self._lock:
+            self._datos.clear()
+            self._generacion += 1
+            self._stats.invalidaciones += 1
+
+    def estadisticas(self) -> EstadisticasCache:
+        with self._lock:
+            return EstadisticasCache(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                invalidaciones=self._stats.invalidaciones,
+                entradas=len(self._datos),
+            )
@@ -0,0 +1,221 @@
+"""
+Compresión de respuestas (Brotli o gzip) según `Accept-Encoding`.
+
+Middleware ASGI puro (no usa BaseHTTPMiddleware, así que no bufferiza las
+respuestas en streaming):
+
+- Elige br si el cliente lo acepta, si no gzip; con q=0 o nada, sin comprimir.
+- No comprime cuerpos pequeños (COMPRESION_MINIMO), los ya comprimidos
+  (Content-Encoding, imágenes, PDF, ZIP...) ni las respuestas sin cuerpo.
+- Las respuestas en streaming (exportaciones) se comprimen trozo a trozo,
+  vaciando el compresor en cada trozo para que sigan llegando al momento.
+- Si la respuesta lleva ETag, los bytes comprimidos se guardan en una caché
+  LRU en memoria (por ETag y codificación): la misma versión de un recurso
+  no se vuelve a comprimir.
+- Los cuerpos grandes se comprimen en un hilo para no parar el bucle de
+  eventos.
+"""
+
+import gzip
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import anyio
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Tipos que no se comprimen (ya lo están)
+_TIPOS_COMPRIMIDOS = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/pdf", "application/zip", "application/gzip",
+    "application/x-gzip", "application/octet-stream",
+)
+
+# A partir de este tamaño se comprime en un hilo aparte
+_TAMANO_HILO = 256 * 1024
+
+# Nivel de compresión: rápido, que se hace en cada petición
+_CALIDAD_BROTLI = 5
+_NIVEL_GZIP = 6
+
+
+def elegir_codificacion(accept_encoding: str) -> Optional[str]:
+    """'gzip, deflate, br' -> 'br'; respeta q=0. None si no acepta ninguna."""
+    aceptadas: Dict[str, float] = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        aceptadas[nombre.strip()] = calidad
+    comodin = aceptadas.get("*", 0.0)
+    for codificacion in ("br", "gzip"):
+        if aceptadas.get(codificacion, comodin) > 0:
+            return codificacion
+    return None
+
+
+def comprimir(datos: bytes, codificacion: str) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(datos, quality=_CALIDAD_BROTLI)
+    return gzip.compress(datos, compresslevel=_NIVEL_GZIP)
+
+
+class _CompresorIncremental:
+    """Compresión por trozos (respuestas en streaming)."""
+
+    def __init__(self, codificacion: str) -> None:
+        if codificacion == "br":
+            self._br = brotli.Compressor(quality=_CALIDAD_BROTLI)
+            self._gz = None
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(_NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def trozo(self, datos: bytes) -> bytes:
+        if self._br is not None:
+            return self._br.process(datos) + self._br.flush()
+        return self._gz.compress(datos) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def fin(self) -> bytes:
+        if self._br is not None:
+            return self._br.finish()
+        return self._gz.flush(zlib.Z_FINISH)
+
+
+class CacheComprimidos:
+    """LRU de cuerpos comprimidos (clave -> bytes) limitada por tamaño total."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._datos: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._bytes = 0
+
+    def obtener(self, clave: Tuple[str, str]) -> Optional[bytes]:
+        valor = self._datos.get(clave)
+        if valor is not None:
+            self._datos.move_to_end(clave)
+        return valor
+
+    def guardar(self, clave: Tuple[str, str], valor: bytes) -> None:
+        if len(valor) > self.max_bytes:
+            return
+        anterior = self._datos.pop(clave, None)
+        if anterior is not None:
+            self._bytes -= len(anterior)
+        self._datos[clave] = valor
+        self._bytes += len(valor)
+        while self._bytes > self.max_bytes:
+            _, viejo = self._datos.popitem(last=False)
+            self._bytes -= len(viejo)
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+
+class CompresionMiddleware:
+    def __init__(self, app: ASGIApp, minimo: int = 1024, cache_bytes: int = 32 * 1024 * 1024) -> None:
+        self.app = app
+        self.minimo = minimo
+        self.cache = CacheComprimidos(cache_bytes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+        await _RespuestaComprimida(self, codificacion, send).ejecutar(scope, receive)
+
+
+class _RespuestaComprimida:
+    """Estado de una respuesta: decide al ver el primer trozo del cuerpo."""
+
+    def __init__(self, middleware: CompresionMiddleware, codificacion: str, send: Send) -> None:
+        self.middleware = middleware
+        self.codificacion = codificacion
+        self.send = send
+        self.inicio: Optional[Message] = None
+        self.modo: Optional[str] = None   # "pasar" | "streaming"
+        self.compresor: Optional[_CompresorIncremental] = None
+
+    async def ejecutar(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.enviar)
+
+    async def enviar(self, mensaje: Message) -> None:
+        if mensaje["type"] == "http.response.start":
+            self.inicio = mensaje
+            return
+        if mensaje["type"] != "http.response.body":
+            await self.send(mensaje)
+            return
+
+        cuerpo = mensaje.get("body", b"")
+        mas = mensaje.get("more_body", False)
+
+        if self.modo is None:
+            if not self._comprimible(cuerpo, mas):
+                self.modo = "pasar"
+                await self.send(self.inicio)
+            elif not mas:
+                # Cuerpo completo en un solo mensaje (lo normal en JSON)
+                await self._enviar_completo(cuerpo)
+                return
+            else:
+                self.modo = "streaming"
+                del self._cabeceras_comprimidas()["content-length"]
+                self.compresor = _CompresorIncremental(self.codificacion)
+                await self.send(self.inicio)
+
+        if self.modo == "pasar":
+            await self.send(mensaje)
+            return
+
+        datos = self.compresor.trozo(cuerpo) if cuerpo else b""
+        if not mas:
+            datos += self.compresor.fin()
+        await self.send({"type": "http.response.body", "body": datos, "more_body": mas})
+
+    def _comprimible(self, cuerpo: bytes, mas: bool) -> bool:
+        cabeceras = Headers(raw=self.inicio["headers"])
+        if "content-encoding" in cabeceras:
+            return False
+        tipo = cabeceras.get("content-type", "")
+        if not tipo or tipo.startswith(_TIPOS_COMPRIMIDOS):
+            return False
+        # Si el cuerpo entero es pequeño, no compensa
+        return mas or len(cuerpo) >= self.middleware.minimo
+
+    def _cabeceras_comprimidas(self) -> MutableHeaders:
+        cabeceras = MutableHeaders(scope=self.inicio)
+        cabeceras["content-encoding"] = self.codificacion
+        cabeceras.add_vary_header("Accept-Encoding")
+        etag = cabeceras.get("etag")
+        if etag:
+            # Otra representación: ETag débil (sigue valiendo para If-None-Match)
+            cabeceras["etag"] = etag if etag.startswith("W/") else f"W/{etag}"
+        return cabeceras
+
+    async def _enviar_completo(self, cuerpo: bytes) -> None:
+        etag = Headers(raw=self.inicio["headers"]).get("etag")
+        clave = (etag, self.codificacion) if etag else None
+        comprimido = self.middleware.cache.obtener(clave) if clave else None
+        if comprimido is None:
+            if len(cuerpo) >= _TAMANO_HILO:
+                comprimido = await anyio.to_thread.run_sync(comprimir, cuerpo, self.codificacion)
+            else:
+                comprimido = comprimir(cuerpo, self.codificacion)
+            if clave:
+                self.middleware.cache.guardar(clave, comprimido)
+
+        cabeceras = self._cabeceras_comprimidas()
+        cabeceras["content-length"] = str(len(comprimido))
+        await self.send(self.inicio)
+        await self.send({"type": "http.response.body", "body": comprimido})
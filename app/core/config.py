@@ -32,6 +32,36 @@ class Settings(BaseSettings):
     # En proyectos grandes, esta variable se usaría para crear el motor.
     DATABASE_FILE: str = "mora_comercial.db"
     
+    # --- Generación de PDFs de presupuestos ---
+    # Carpeta de caché de PDFs renderizados (relativa a la raíz del proyecto)
+    PDF_CACHE_DIR: str = "pdf_cache"
+    # Procesos dedicados a renderizar (fuera de los workers de la API)
+    PDF_WORKERS: int = 2
+
+    # --- Caché del dashboard ---
+    # Segundos que se reutilizan /dashboard/stats y /dashboard/history
+    # (se invalida antes si se escriben presupuestos o clientes)
+    DASHBOARD_CACHE_TTL: int = 30
+    # Tope de entradas (las claves incluyen los rangos de fechas pedidos)
+    DASHBOARD_CACHE_MAX_ENTRADAS: int = 1000
+
+    # --- Eventos en vivo del dashboard (WebSocket) ---
+    # Cada cuántos segundos mira cada worker si hay eventos de otros workers
+    DASHBOARD_EVENTOS_INTERVALO: float = 1.0
+    # Filas que se conservan en evento_dashboard (las más antiguas se borran)
+    DASHBOARD_EVENTOS_RETENIDOS: int = 10000
+
+    # --- Sugerencias de clientes (índice en memoria) ---
+    # Cada proceso aplica sus propias escrituras al momento; cada cuántos
+    # segundos se recarga entero para ver las de otros workers/scripts
+    SUGERENCIAS_RECARGA: int = 300
+
+    # --- Compresión de respuestas (br/gzip) ---
+    # Cuerpos menores que esto se envían tal cual
+    COMPRESION_MINIMO: int = 1024
+    # Memoria para guardar comprimidas las respuestas con ETag
+    COMPRESION_CACHE_MB: int = 32
+
     # --- Configuración de Usuario Admin Automático ---
     # Credenciales para el usuario administrador inicial
     # Se crea automáticamente en el startup si no existe
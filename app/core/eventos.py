@@ -0,0 +1,191 @@
+"""
+Difusión de eventos en vivo a los dashboards conectados (WebSocket).
+
+- Los eventos se guardan en la tabla `evento_dashboard` en la misma
+  transacción que el cambio (ver dashboard_crud), así que los ven todos los
+  workers, no solo el que hizo el commit. Cada proceso con conexiones
+  abiertas tiene una tarea que lee las filas nuevas (id > último leído) cada
+  DASHBOARD_EVENTOS_INTERVALO segundos; un commit en el propio proceso la
+  despierta al momento. En SQLite las escrituras van de una en una, así que
+  los ids se hacen visibles en orden y no se salta ninguno.
+- Cada conexión tiene su propia cola acotada; publicar nunca bloquea ni
+  espera a los clientes lentos.
+- El evento se guarda ya serializado y se reparte el mismo texto a todas
+  las colas, así que el coste por conexión es un `put_nowait`.
+- Si la cola de una conexión se llena (cliente lento o parado), se vacía y
+  se le manda un único evento `resync`: el cliente debe volver a pedir
+  /stats y /history en lugar de recibir un histórico que ya no sirve.
+- Cada evento lleva el comercial al que pertenece y solo se entrega a las
+  suscripciones de ese comercial y a las de los ADMIN (como los listados).
+- Se puede avisar desde cualquier hilo (los commits ocurren en el
+  threadpool de FastAPI): el aviso llega al bucle de eventos con
+  `call_soon_threadsafe`.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import anyio
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models.dashboard import EventoDashboard
+
+logger = logging.getLogger(__name__)
+
+TAMANO_COLA_EVENTOS = 100
+
+EVENTO_RESYNC = json.dumps({"tipo": "resync"})
+
+
+class Suscripcion:
+    """Cola de eventos pendientes de enviar a una conexión."""
+
+    def __init__(self, tamano: int, id_usuario: Optional[int] = None) -> None:
+        self.cola: "asyncio.Queue[str]" = asyncio.Queue(maxsize=tamano)
+        self.descartados = 0
+        # Comercial de la conexión; None: ve todo (ADMIN)
+        self.id_usuario = id_usuario
+
+    def puede_ver(self, id_propietario: Optional[int]) -> bool:
+        return self.id_usuario is None or self.id_usuario == id_propietario
+
+    def entregar(self, mensaje: str) -> None:
+        try:
+            self.cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            # Se pierde el histórico pendiente: el cliente se resincroniza
+            while not self.cola.empty():
+                self.cola.get_nowait()
+                self.descartados += 1
+            self.cola.put_nowait(EVENTO_RESYNC)
+
+    async def siguiente(self) -> str:
+        return await self.cola.get()
+
+
+class _Lector:
+    """Suscripciones de un bucle de eventos y la tarea que les lee la tabla."""
+
+    def __init__(self) -> None:
+        self.suscripciones: Set[Suscripcion] = set()
+        self.arranque = asyncio.Lock()
+        self.aviso = asyncio.Event()
+        self.tarea: Optional[asyncio.Task] = None
+
+
+class Difusor:
+    """Lee los eventos nuevos de la tabla y los reparte a las suscripciones."""
+
+    def __init__(
+        self,
+        tamano_cola: int = TAMANO_COLA_EVENTOS,
+        intervalo: Optional[float] = None,
+    ) -> None:
+        self.tamano_cola = tamano_cola
+        self.intervalo = intervalo or settings.DASHBOARD_EVENTOS_INTERVALO
+        # Uno por bucle de eventos (en producción, uno por worker)
+        self._lectores: Dict[asyncio.AbstractEventLoop, _Lector] = {}
+        self._lock = threading.Lock()
+
+    async def suscribir(self, bind, id_usuario: Optional[int] = None) -> Suscripcion:
+        """
+        Se llama desde el bucle de eventos (en el handler del WebSocket).
+        `bind` es el engine de la BD de los eventos. Con `id_usuario` solo
+        llegan los eventos de ese comercial. Al volver, ya le llegan los
+        eventos que se confirmen desde ese momento, en cualquier worker.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for cerrado in [l for l in self._lectores if l.is_closed()]:
+                del self._lectores[cerrado]
+            lector = self._lectores.get(loop)
+            if lector is None:
+                lector = self._lectores[loop] = _Lector()
+        async with lector.arranque:
+            if lector.tarea is None or lector.tarea.done():
+                ultimo = await anyio.to_thread.run_sync(_ultimo_id, bind)
+                lector.tarea = asyncio.create_task(
+                    self._sondear(lector, bind, ultimo), name="dashboard-eventos"
+                )
+                lector.tarea.add_done_callback(registrar_fallo)
+            suscripcion = Suscripcion(self.tamano_cola, id_usuario)
+            lector.suscripciones.add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion) -> None:
+        with self._lock:
+            for lector in self._lectores.values():
+                lector.suscripciones.discard(suscripcion)
+
+    @property
+    def conexiones(self) -> int:
+        with self._lock:
+            return sum(len(lector.suscripciones) for lector in self._lectores.values())
+
+    def avisar(self) -> None:
+        """
+        Hay eventos nuevos confirmados en este proceso: que se lean ya, sin
+        esperar al intervalo. Seguro desde cualquier hilo.
+        """
+        with self._lock:
+            lectores = list(self._lectores.items())
+        for loop, lector in lectores:
+            if lector.suscripciones and not loop.is_closed():
+                loop.call_soon_threadsafe(lector.aviso.set)
+
+    async def _sondear(self, lector: _Lector, bind, ultimo: int) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(lector.aviso.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            lector.aviso.clear()
+            if not lector.suscripciones:
+                # Sin nadie escuchando se para; el siguiente suscribir la arranca
+                lector.tarea = None
+                return
+            try:
+                ultimo, mensajes = await anyio.to_thread.run_sync(_leer_desde, bind, ultimo)
+            except Exception:
+                logger.exception("No se han podido leer los eventos del dashboard")
+                continue
+            for suscripcion in list(lector.suscripciones):
+                for id_propietario, mensaje in mensajes:
+                    if suscripcion.puede_ver(id_propietario):
+                        suscripcion.entregar(mensaje)
+
+
+def _ultimo_id(bind) -> int:
+    with bind.connect() as conexion:
+        return conexion.execute(select(func.max(EventoDashboard.id))).scalar() or 0
+
+
+def _leer_desde(bind, ultimo: int) -> Tuple[int, List[Tuple[Optional[int], str]]]:
+    """Eventos con id > `ultimo`, en orden, y el nuevo último id leído."""
+    with bind.connect() as conexion:
+        filas = conexion.execute(
+            select(EventoDashboard.id, EventoDashboard.id_propietario, EventoDashboard.mensaje)
+            .where(EventoDashboard.id > ultimo)
+            .order_by(EventoDashboard.id)
+        ).all()
+    if filas:
+        ultimo = filas[-1].id
+    return ultimo, [(fila.id_propietario, fila.mensaje) for fila in filas]
+
+
+def registrar_fallo(tarea: "asyncio.Task") -> None:
+    """Done-callback de tareas en segundo plano: que un fallo no pase sin dejar rastro."""
+    if not tarea.cancelled() and tarea.exception() is not None:
+        logger.error(
+            "Tarea de eventos en vivo terminada con error: %s",
+            tarea.get_name(),
+            exc_info=tarea.exception(),
+        )
+
+
+# Canal del dashboard (presupuestos y clientes)
+difusor_dashboard = Difusor()
@@ -0,0 +1,94 @@
+"""
+GET condicionales (ETag / Last-Modified) para los endpoints de detalle.
+
+Cada fila guarda `updated_at`; con él se calcula un ETag y la cabecera
+Last-Modified. El endpoint lee primero solo esa columna y, si el cliente ya
+tiene la versión actual (`If-None-Match` / `If-Modified-Since`), responde 304
+sin cargar la entidad ni montar la respuesta.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+ETAG_HEADER = "ETag"
+LAST_MODIFIED_HEADER = "Last-Modified"
+
+
+def calcular_etag(recurso: str, identificador, updated_at: datetime) -> str:
+    """ETag fuerte de una fila: cambia cada vez que cambia su updated_at."""
+    clave = f"{recurso}:{identificador}:{updated_at.isoformat()}"
+    return '"' + hashlib.sha1(clave.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def _a_utc(momento: datetime) -> datetime:
+    # updated_at se guarda en hora local sin zona (datetime.now)
+    if momento.tzinfo is None:
+        momento = momento.astimezone()
+    return momento.astimezone(timezone.utc)
+
+
+def formatear_fecha_http(momento: datetime) -> str:
+    return format_datetime(_a_utc(momento).replace(microsecond=0), usegmt=True)
+
+
+def _etag_coincide(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 9110): se ignora el prefijo W/
+    candidatos = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+    return etag in candidatos
+
+
+def no_modificado(request: Request, etag: str, updated_at: datetime) -> bool:
+    """
+    True si el cliente ya tiene esta versión. If-None-Match tiene prioridad;
+    If-Modified-Since solo se mira si no viene If-None-Match.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_coincide(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        return _a_utc(updated_at).replace(microsecond=0) <= desde
+    return False
+
+
+def poner_cabeceras_cache(response: Response, etag: str, updated_at: datetime) -> None:
+    """Añade ETag y Last-Modified a la respuesta."""
+    response.headers[ETAG_HEADER] = etag
+    response.headers[LAST_MODIFIED_HEADER] = formatear_fecha_http(updated_at)
+
+
+def respuesta_condicional(
+    request: Request,
+    response: Response,
+    recurso: str,
+    identificador,
+    updated_at: Optional[datetime],
+) -> Optional[Response]:
+    """
+    Pone las cabeceras de caché en `response` y, si el cliente ya tiene la
+    versión actual, devuelve la respuesta 304 que debe retornar el endpoint.
+    Devuelve None si hay que enviar el cuerpo (o si la fila no tiene
+    updated_at, p. ej. filas antiguas insertadas a mano).
+    """
+    if updated_at is None:
+        return None
+    etag = calcular_etag(recurso, identificador, updated_at)
+    if no_modificado(request, etag, updated_at):
+        no_modificada = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+        poner_cabeceras_cache(no_modificada, etag, updated_at)
+        return no_modificada
+    poner_cabeceras_cache(response, etag, updated_at)
+    return None
@@ -0,0 +1,147 @@
+"""
+Paginación por cursor (keyset) compartida por los listados.
+
+En lugar de OFFSET/LIMIT (que lee y descarta todas las filas saltadas), cada
+página continúa desde la última fila de la anterior:
+
+    WHERE (clave_orden, pk) > (:ultima_clave, :ultima_pk) ORDER BY clave_orden, pk
+
+así la página 1000 cuesta lo mismo que la primera si hay índice sobre la
+clave de orden. El cursor es un token opaco (base64 de los valores de la
+última fila) que el cliente devuelve tal cual.
+
+Los endpoints siguen devolviendo un array JSON; el cursor viaja en las
+cabeceras `X-Next-Cursor` / `X-Has-More` de la respuesta.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Generic, List, Optional, Sequence, TypeVar
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+from sqlmodel import Session
+
+T = TypeVar("T")
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+HAS_MORE_HEADER = "X-Has-More"
+
+
+@dataclass
+class Pagina(Generic[T]):
+    """Una página de resultados y el token para pedir la siguiente."""
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
+def json_default(valor: Any) -> Any:
+    """`default` de json.dumps para fechas (ISO). Lo usan también exportaciones y eventos."""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor)!r}")
+
+
+def encode_cursor(valores: Sequence[Any]) -> str:
+    """Construye el token opaco a partir de los valores de orden de una fila."""
+    raw = json.dumps(list(valores), default=json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Inversa de encode_cursor. Devuelve 400 si el token está manipulado."""
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError):
+        valores = None
+    if not isinstance(valores, list):
+        _cursor_invalido()
+    return valores
+
+
+def _cursor_invalido():
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Cursor de paginación inválido",
+    )
+
+
+def _coerce(columna, valor: Any) -> Any:
+    """
+    Devuelve los valores JSON al tipo Python de la columna (las fechas llegan
+    en ISO). ValueError si el valor no puede ser de esa columna: el cursor se
+    ha manipulado.
+    """
+    if valor is None:
+        return valor
+    if isinstance(valor, (list, dict, bool)):
+        raise ValueError(f"Valor de cursor no válido: {valor!r}")
+    try:
+        tipo = columna.type.python_type
+    except NotImplementedError:
+        return valor
+    if tipo in (datetime, date):
+        if not isinstance(valor, str):
+            raise ValueError(f"Fecha de cursor no válida: {valor!r}")
+        return tipo.fromisoformat(valor)
+    if tipo in (int, float) and not isinstance(valor, (int, float)):
+        raise ValueError(f"Número de cursor no válido: {valor!r}")
+    if tipo is str and not isinstance(valor, str):
+        raise ValueError(f"Texto de cursor no válido: {valor!r}")
+    return valor
+
+
+def paginar(
+    session: Session,
+    statement,
+    orden: Sequence[Any],
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    descendente: bool = False,
+) -> Pagina:
+    """
+    Ejecuta `statement` (un select de un modelo) paginado por keyset.
+
+    `orden` son las columnas de ordenación del modelo; la última debe ser la
+    clave primaria para que el orden sea total y estable aunque haya valores
+    repetidos. Sin `limit` se devuelven todas las filas (en el mismo orden).
+    """
+    if cursor:
+        valores = decode_cursor(cursor)
+        if len(valores) != len(orden):
+            _cursor_invalido()
+        try:
+            valores = [_coerce(col, v) for col, v in zip(orden, valores)]
+        except (ValueError, TypeError):
+            _cursor_invalido()
+        clave = tuple_(*orden)
+        limite = tuple_(*valores)
+        statement = statement.where(clave < limite if descendente else clave > limite)
+
+    statement = statement.order_by(*[col.desc() if descendente else col.asc() for col in orden])
+
+    if limit is None:
+        return Pagina(items=list(session.exec(statement).all()))
+
+    # Pedimos una fila de más para saber si hay página siguiente
+    filas = list(session.exec(statement.limit(limit + 1)).all())
+    has_more = len(filas) > limit
+    items = filas[:limit]
+
+    next_cursor = None
+    if has_more:
+        ultimo = items[-1]
+        next_cursor = encode_cursor([getattr(ultimo, col.key) for col in orden])
+
+    return Pagina(items=items, next_cursor=next_cursor, has_more=has_more)
+
+
+def poner_cabeceras(response: Response, pagina: Pagina) -> None:
+    """Copia el estado de la paginación en las cabeceras de la respuesta."""
+    response.headers[HAS_MORE_HEADER] = "true" if pagina.has_more else "false"
+    if pagina.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = pagina.next_cursor
@@ -0,0 +1,44 @@
+"""
+Token de sincronización incremental (`?updated_since=`) de los listados.
+
+El token es opaco para el cliente (como el cursor de paginación) y lleva el
+instante en que se empezó a leer la respuesta anterior. Con él se devuelve
+lo modificado (updated_at) y lo borrado (tombstones) desde entonces.
+
+Se lee con un pequeño solape hacia atrás: una transacción que empezó antes
+del token pero se confirmó después tiene un updated_at anterior y, sin el
+solape, se perdería. A cambio alguna fila puede llegar dos veces; aplicar
+los cambios en el cliente debe ser idempotente (sustituir por id).
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+SYNC_TOKEN_HEADER = "X-Sync-Token"
+
+SOLAPE_SYNC = timedelta(seconds=5)
+
+
+def nuevo_token(instante: Optional[datetime] = None) -> str:
+    return encode_cursor([instante or datetime.now()])
+
+
+def leer_token(token: str) -> datetime:
+    """Desde cuándo hay que buscar cambios (instante del token menos el solape)."""
+    valores = decode_cursor(token)
+    try:
+        instante = datetime.fromisoformat(valores[0])
+    except (IndexError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Token de sincronización inválido",
+        )
+    return instante - SOLAPE_SYNC
+
+
+def poner_token(response: Response, token: str) -> None:
+    response.headers[SYNC_TOKEN_HEADER] = token
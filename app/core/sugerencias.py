@@ -0,0 +1,214 @@
+"""
+Índice en memoria (por proceso) para sugerir clientes mientras se escribe.
+
+Los nombres se normalizan (sin tildes ni mayúsculas, sin puntuación y sin
+la forma jurídica: S.L., SA, LDA...), así que "metalomecanica" encuentra
+"METALOMECÂNICA, LDA". Se busca, por este orden de relevancia:
+
+1. nombres que empiezan por lo escrito,
+2. nombres en los que cada palabra escrita es el principio de alguna de
+   las suyas ("sand met" -> "Sandiães Metal"),
+3. nombres que comparten trigramas (faltas de ortografía, trozos del medio).
+
+Los dos primeros son búsquedas binarias sobre listas ordenadas y el tercero
+un índice invertido trigrama -> ids, así que una consulta no recorre todos
+los clientes. El índice se construye al primer uso y después se actualiza
+entrada a entrada (ver client_crud); `invalidar()` fuerza a reconstruirlo
+tras escrituras que no pasan por el ORM.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Formas jurídicas que no cuentan para buscar (ya normalizadas)
+FORMAS_JURIDICAS = {
+    "sl", "slu", "sll", "slne", "sa", "sau", "sal", "scoop", "coop", "cb", "sc",
+    "lda", "ltda", "unipessoal", "sociedad", "limitada", "anonima",
+}
+
+_PUNTOS_DE_SIGLA = re.compile(r"(?<=\b\w)\.")
+_NO_ALFANUMERICO = re.compile(r"[^\w]+")
+
+# Longitud mínima de lo escrito para buscar parecidos (con 1-2 letras casi
+# todo se "parece")
+_MIN_TRIGRAMAS = 4
+
+
+def normalizar(texto: str) -> str:
+    """'Metalomecânica Sandiães, LDA.' -> 'metalomecanica sandiaes'."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+    texto = _PUNTOS_DE_SIGLA.sub("", texto)  # "s.l." -> "sl"
+    palabras = [p for p in _NO_ALFANUMERICO.split(texto.replace("_", " ")) if p]
+    sin_forma = [p for p in palabras if p not in FORMAS_JURIDICAS]
+    # Si el nombre es solo la forma jurídica, se deja tal cual
+    return " ".join(sin_forma or palabras)
+
+
+def trigramas(texto: str) -> Set[str]:
+    relleno = f"  {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+@dataclass(frozen=True)
+class Entrada:
+    id_cliente: int
+    nombre: str
+    id_comercial: Optional[int]
+    normalizado: str
+
+
+class IndiceSugerencias:
+    """Índice de prefijos y trigramas sobre los nombres de cliente."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._entradas: Dict[int, Entrada] = {}
+        self._nombres: List[Tuple[str, int]] = []    # (normalizado, id) ordenado
+        self._palabras: List[Tuple[str, int]] = []   # (palabra, id) ordenado
+        self._trigramas: Dict[str, Set[int]] = {}
+        self._cargado = False
+        self._cargado_en = 0.0
+
+    # --- Mantenimiento ---
+
+    def vigente(self, max_edad: float) -> bool:
+        """Cargado hace menos de `max_edad` segundos (otros procesos también escriben)."""
+        return self._cargado and time.monotonic() - self._cargado_en < max_edad
+
+    def cargar(self, filas: Iterable[Tuple[int, str, Optional[int]]]) -> None:
+        """Reconstruye el índice con (id_cliente, nombre, id_comercial)."""
+        with self._lock:
+            self._entradas, self._trigramas = {}, {}
+            nombres, palabras = [], []
+            for id_cliente, nombre, id_comercial in filas:
+                entrada = self._nueva_entrada(id_cliente, nombre, id_comercial)
+                nombres.append((entrada.normalizado, id_cliente))
+                palabras.extend((p, id_cliente) for p in set(entrada.normalizado.split()))
+            self._nombres, self._palabras = sorted(nombres), sorted(palabras)
+            self._cargado = True
+            self._cargado_en = time.monotonic()
+
+    def invalidar(self) -> None:
+        """El siguiente uso reconstruye el índice desde la BD."""
+        with self._lock:
+            self._cargado = False
+
+    def actualizar(self, id_cliente: int, nombre: str, id_comercial: Optional[int]) -> None:
+        """Alta o cambio de un cliente."""
+        with self._lock:
+            if not self._cargado:
+                return
+            self._quitar(id_cliente)
+            entrada = self._nueva_entrada(id_cliente, nombre, id_comercial)
+            insort(self._nombres, (entrada.normalizado, id_cliente))
+            for palabra in set(entrada.normalizado.split()):
+                insort(self._palabras, (palabra, id_cliente))
+
+    def eliminar(self, id_cliente: int) -> None:
+        with self._lock:
+            if self._cargado:
+                self._quitar(id_cliente)
+
+    def _nueva_entrada(self, id_cliente: int, nombre: str, id_comercial: Optional[int]) -> Entrada:
+        entrada = Entrada(id_cliente, nombre, id_comercial, normalizar(nombre))
+        self._entradas[id_cliente] = entrada
+        for trigrama in trigramas(entrada.normalizado):
+            self._trigramas.setdefault(trigrama, set()).add(id_cliente)
+        return entrada
+
+    def _quitar(self, id_cliente: int) -> None:
+        entrada = self._entradas.pop(id_cliente, None)
+        if entrada is None:
+            return
+        _quitar_ordenado(self._nombres, (entrada.normalizado, id_cliente))
+        for palabra in set(entrada.normalizado.split()):
+            _quitar_ordenado(self._palabras, (palabra, id_cliente))
+        for trigrama in trigramas(entrada.normalizado):
+            ids = self._trigramas.get(trigrama)
+            if ids is not None:
+                ids.discard(id_cliente)
+                if not ids:
+                    del self._trigramas[trigrama]
+
+    # --- Consulta ---
+
+    def buscar(
+        self,
+        texto: str,
+        limite: int = 10,
+        filtro: Optional[Callable[[Entrada], bool]] = None,
+    ) -> List[Entrada]:
+        """Los `limite` clientes que mejor encajan con `texto` (y pasan `filtro`)."""
+        consulta = normalizar(texto)
+        if not consulta:
+            return []
+        with self._lock:
+            vistos: Set[int] = set()
+            resultado: List[Entrada] = []
+
+            def anadir(ids: Iterable[int]) -> bool:
+                for id_cliente in ids:
+                    if id_cliente in vistos:
+                        continue
+                    vistos.add(id_cliente)
+                    entrada = self._entradas[id_cliente]
+                    if filtro is None or filtro(entrada):
+                        resultado.append(entrada)
+                        if len(resultado) >= limite:
+                            return True
+                return False
+
+            if anadir(_con_prefijo(self._nombres, consulta)):
+                return resultado
+            # Cada palabra escrita es el principio de alguna palabra del nombre
+            escritas = consulta.split()
+
+            def tiene_todas(id_cliente: int) -> bool:
+                palabras = self._entradas[id_cliente].normalizado.split()
+                return all(any(p.startswith(e) for p in palabras) for e in escritas)
+
+            if anadir(i for i in _con_prefijo(self._palabras, escritas[0]) if tiene_todas(i)):
+                return resultado
+            if len(consulta) < _MIN_TRIGRAMAS:
+                return resultado
+
+            # Trigramas: los que comparten más, primero
+            propios = trigramas(consulta)
+            comunes = Counter()
+            for trigrama in propios:
+                comunes.update(self._trigramas.get(trigrama, ()))
+            minimo = max(1, len(propios) // 2)
+            # El filtro (p. ej. el comercial) va antes de ordenar y cortar: si
+            # no, los mejores de otros comerciales dejarían fuera a los suyos
+            candidatos = Counter({
+                id_cliente: n for id_cliente, n in comunes.items()
+                if n >= minimo and id_cliente not in vistos
+                and (filtro is None or filtro(self._entradas[id_cliente]))
+            })
+            anadir(id_cliente for id_cliente, _ in candidatos.most_common(limite - len(resultado)))
+            return resultado
+
+
+def _con_prefijo(ordenada: List[Tuple[str, int]], prefijo: str):
+    """Ids de `ordenada` cuya clave empieza por `prefijo`, en orden."""
+    i = bisect_left(ordenada, (prefijo, -1))
+    while i < len(ordenada) and ordenada[i][0].startswith(prefijo):
+        yield ordenada[i][1]
+        i += 1
+
+
+def _quitar_ordenado(ordenada: List[Tuple[str, int]], elemento: Tuple[str, int]) -> None:
+    i = bisect_left(ordenada, elemento)
+    if i < len(ordenada) and ordenada[i] == elemento:
+        del ordenada[i]
+
+
+# Índice de los nombres de cliente (lo mantiene client_crud)
+indice_clientes = IndiceSugerencias()
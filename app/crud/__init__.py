@@ -0,0 +1,7 @@
+# app/crud/__init__.py
+
+# Registra los listeners que mantienen los agregados del dashboard en la
+# misma transacción que las escrituras de presupuestos y clientes, el
+# índice de sugerencias de clientes y las marcas de borrado para la
+# sincronización incremental.
+from app.crud import client_crud, dashboard_crud, sync_crud  # noqa: F401
@@ -2,7 +2,10 @@
 
 from sqlmodel import Session, select
 from app.models.articulo import Articulo, ArticuloCreate, ArticuloUpdate
+from app.core.pagination import Pagina, paginar
 from typing import Optional
+from datetime import datetime
+from fastapi import HTTPException
 
 # --- READ OPERATIONS ---
 
@@ -10,9 +13,24 @@ def get_articulo_by_id(session: Session, articulo_id: str) -> Optional[Articulo]
     """Busca un artículo por su ID."""
     return session.get(Articulo, articulo_id)
 
-def get_articulos(session: Session, skip: int = 0, limit: int = 100) -> list[Articulo]:
-    """Lista todos los artículos del catálogo."""
-    return session.exec(select(Articulo).offset(skip).limit(limit)).all()
+def get_articulo_updated_at(session: Session, articulo_id: str) -> Optional[datetime]:
+    """Solo la versión (updated_at) del artículo, para los GET condicionales. 404 si no existe."""
+    fila = session.exec(
+        select(Articulo.id, Articulo.updated_at).where(Articulo.id == articulo_id)
+    ).first()
+    if fila is None:
+        raise HTTPException(status_code=404, detail="Articulo no encontrado")
+    return fila.updated_at
+
+def get_articulos(session: Session, cursor: Optional[str] = None, limit: Optional[int] = None) -> Pagina[Articulo]:
+    """Lista los artículos del catálogo ordenados por nombre (paginación por cursor)."""
+    return paginar(
+        session,
+        select(Articulo),
+        orden=[Articulo.nombre, Articulo.id],
+        cursor=cursor,
+        limit=limit,
+    )
 
 # --- CREATE OPERATION ---
 
@@ -1,6 +1,7 @@
 from sqlmodel import Session, select
 from datetime import datetime
 from app.models.audit import AuditLog
+from app.core.pagination import Pagina, paginar
 
 
 def create_audit(session: Session, action: str, actor_email: str | None = None, target_email: str | None = None, details: str | None = None) -> AuditLog:
@@ -14,16 +15,17 @@ def create_audit(session: Session, action: str, actor_email: str | None = None,
 
 def list_audit_logs(
     session: Session,
-    skip: int = 0,
-    limit: int = 100,
+    cursor: str | None = None,
+    limit: int | None = 100,
     actor_email: str | None = None,
     target_email: str | None = None,
     action: str | None = None,
     date_from: datetime | None = None,
     date_to: datetime | None = None,
-) -> list[AuditLog]:
+) -> Pagina[AuditLog]:
     """
-    Lista registros de auditoría con filtros opcionales.
+    Lista registros de auditoría con filtros opcionales
+    (paginación por cursor, más recientes primero).
     """
     query = select(AuditLog)
     
@@ -39,9 +41,14 @@ def list_audit_logs(
         query = query.where(AuditLog.timestamp <= date_to)
     
     # Ordenar por timestamp descendente (más recientes primero)
-    query = query.order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit)
-    
-    return session.exec(query).all()
+    return paginar(
+        session,
+        query,
+        orden=[AuditLog.timestamp, AuditLog.id],
+        cursor=cursor,
+        limit=limit,
+        descendente=True,
+    )
 
 
 def count_audit_logs(
@@ -1,9 +1,19 @@
 # app/crud/client_crud.py
 
 from sqlmodel import Session, select
-from app.models.client import Client, ClientCreate, ClientUpdate
+from sqlalchemy import case, event, func, literal_column
+from sqlalchemy.orm import Session as OrmSession
+from app.models.client import Client, ClientCreate, ClientResumen, ClientUpdate
+from app.models.nota import Nota
+from app.models.presupuesto import Presupuesto
 from app.models.user import User
-from typing import Optional
+from app.core.pagination import Pagina, paginar
+from app.core.config import settings
+from app.core.sugerencias import Entrada, indice_clientes
+from app.db.busqueda import COLUMNAS_FTS_CLIENTES, TABLA_FTS_CLIENTES, client_fts, consulta_fts
+from typing import Dict, Iterable, Optional
+from datetime import datetime
+from fastapi import HTTPException
 
 # --- READ OPERATIONS ---
 
@@ -11,9 +21,139 @@ def get_client_by_id(session: Session, client_id: int) -> Optional[Client]:
     """Busca un cliente por su ID."""
     return session.get(Client, client_id)
 
-def get_clients(session: Session, skip: int = 0, limit: int = 100) -> list[Client]:
-    """Lista todos los clientes."""
-    return session.exec(select(Client).offset(skip).limit(limit)).all()
+def get_client_updated_at(session: Session, client_id: int) -> Optional[datetime]:
+    """Solo la versión (updated_at) del cliente, para los GET condicionales. 404 si no existe."""
+    fila = session.exec(
+        select(Client.id_cliente, Client.updated_at).where(Client.id_cliente == client_id)
+    ).first()
+    if fila is None:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return fila.updated_at
+
+def get_clients(
+    session: Session,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    id_comercial: Optional[int] = None,
+) -> Pagina[Client]:
+    """
+    Lista los clientes ordenados por nombre (paginación por cursor). Con
+    `id_comercial`, solo los de ese comercial (índice comercial + nombre).
+    """
+    statement = select(Client)
+    if id_comercial is not None:
+        statement = statement.where(Client.id_comercial_propietario == id_comercial)
+    return paginar(
+        session,
+        statement,
+        orden=[Client.nombre, Client.id_cliente],
+        cursor=cursor,
+        limit=limit,
+    )
+
+def buscar_clients(
+    session: Session,
+    texto: str,
+    limit: int = 50,
+    id_comercial: Optional[int] = None,
+) -> Pagina[Client]:
+    """
+    Búsqueda de texto completo (índice FTS5 client_fts) en nombre, NIF,
+    correo, teléfono, dirección y provincia, de más a menos relevante. Cada
+    palabra se busca como prefijo y sin tildes. Devuelve los `limit` mejores
+    (sin cursor: el orden por relevancia no se puede continuar por keyset).
+    """
+    consulta = consulta_fts(texto)
+    if consulta is None:
+        return Pagina()
+
+    fts = literal_column(TABLA_FTS_CLIENTES)
+    relevancia = func.bm25(fts, *COLUMNAS_FTS_CLIENTES.values())
+    statement = (
+        select(Client)
+        .join(client_fts, client_fts.c.rowid == Client.id_cliente)
+        .where(fts.op("MATCH")(consulta))
+    )
+    if id_comercial is not None:
+        statement = statement.where(Client.id_comercial_propietario == id_comercial)
+    clientes = list(session.exec(statement.order_by(relevancia, Client.id_cliente).limit(limit + 1)).all())
+    return Pagina(items=clientes[:limit], has_more=len(clientes) > limit)
+
+
+def sugerir_clients(
+    session: Session,
+    texto: str,
+    limite: int = 10,
+    id_comercial: Optional[int] = None,
+) -> list[Entrada]:
+    """
+    Sugerencias para autocompletar por nombre, desde el índice en memoria
+    (app/core/sugerencias.py). Lo carga de la BD si hace falta.
+    """
+    if not indice_clientes.vigente(settings.SUGERENCIAS_RECARGA):
+        indice_clientes.cargar(session.exec(
+            select(Client.id_cliente, Client.nombre, Client.id_comercial_propietario)
+        ).all())
+    filtro = None
+    if id_comercial is not None:
+        filtro = lambda entrada: entrada.id_comercial == id_comercial  # noqa: E731
+    return indice_clientes.buscar(texto, limite=limite, filtro=filtro)
+
+
+def get_resumenes(session: Session, client_ids: Iterable[int]) -> Dict[int, ClientResumen]:
+    """
+    Resumen de actividad (presupuestos, total aprobado, último presupuesto y
+    notas) de varios clientes en una sola consulta agrupada, pensada para
+    una página del listado. Los presupuestos se agregan sobre el índice
+    (id_cliente, fecha_presupuesto) y las notas sobre el de id_cliente.
+    """
+    ids = list(client_ids)
+    if not ids:
+        return {}
+    # Para páginas enormes (listado sin limit) es más barato agregar todo
+    # que mandar miles de parámetros en el IN
+    filtrar = len(ids) <= 1000
+
+    def _en_pagina(statement, columna):
+        return statement.where(columna.in_(ids)) if filtrar else statement
+
+    presupuestos = _en_pagina(
+        select(
+            Presupuesto.id_cliente.label("id_cliente"),
+            func.count(Presupuesto.id).label("num_presupuestos"),
+            func.sum(case((Presupuesto.estado == "APROBADO", Presupuesto.total), else_=0.0)).label("total_aprobado"),
+            func.max(Presupuesto.fecha_presupuesto).label("ultimo_presupuesto"),
+        ),
+        Presupuesto.id_cliente,
+    ).group_by(Presupuesto.id_cliente).subquery()
+
+    notas = _en_pagina(
+        select(Nota.id_cliente.label("id_cliente"), func.count(Nota.id).label("num_notas")),
+        Nota.id_cliente,
+    ).group_by(Nota.id_cliente).subquery()
+
+    statement = (
+        select(
+            Client.id_cliente,
+            presupuestos.c.num_presupuestos,
+            presupuestos.c.total_aprobado,
+            presupuestos.c.ultimo_presupuesto,
+            notas.c.num_notas,
+        )
+        .outerjoin(presupuestos, presupuestos.c.id_cliente == Client.id_cliente)
+        .outerjoin(notas, notas.c.id_cliente == Client.id_cliente)
+    )
+    filas = session.exec(_en_pagina(statement, Client.id_cliente)).all()
+
+    return {
+        fila.id_cliente: ClientResumen(
+            num_presupuestos=fila.num_presupuestos or 0,
+            total_aprobado=fila.total_aprobado or 0.0,
+            ultimo_presupuesto=fila.ultimo_presupuesto,
+            num_notas=fila.num_notas or 0,
+        )
+        for fila in filas
+    }
 
 # --- CREATE OPERATION ---
 
@@ -59,6 +199,54 @@ def delete_client(session: Session, client: Client) -> None:
 
 def get_clients_by_comercial(session: Session, comercial_id: int) -> list[Client]:
     """Lista los clientes asignados a un comercial específico."""
-    return session.exec(
-        select(Client).where(Client.id_comercial_propietario == comercial_id)
-    ).all()
\ No newline at end of file
+    return get_clients(session, id_comercial=comercial_id).items
+
+
+# --- ÍNDICE DE SUGERENCIAS ---
+# Los cambios de clientes se recogen en cada flush y se aplican al índice en
+# memoria solo tras el commit (lo que se deshace no llega a verse).
+
+_CAMBIOS_SUGERENCIAS = "sugerencias_clientes"
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _recoger_cambios_clientes(session, flush_context) -> None:
+    if _CAMBIOS_SUGERENCIAS in session.info and session.info[_CAMBIOS_SUGERENCIAS] is None:
+        return  # ya se va a recargar entero
+    cambios = None
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, Client):
+            continue
+        if cambios is None:
+            cambios = session.info.setdefault(_CAMBIOS_SUGERENCIAS, {})
+        cambios[obj.id_cliente] = (
+            None if obj in session.deleted else (obj.nombre, obj.id_comercial_propietario)
+        )
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _cambios_masivos_clientes(orm_execute_state) -> None:
+    # UPDATE/DELETE masivos: no se sabe qué filas cambian, se recarga entero
+    mapper = orm_execute_state.bind_mapper
+    if not orm_execute_state.is_select and mapper is not None and mapper.class_ is Client:
+        orm_execute_state.session.info[_CAMBIOS_SUGERENCIAS] = None
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _aplicar_cambios_clientes(session) -> None:
+    if _CAMBIOS_SUGERENCIAS not in session.info:
+        return
+    cambios = session.info.pop(_CAMBIOS_SUGERENCIAS)
+    if cambios is None:
+        indice_clientes.invalidar()
+        return
+    for id_cliente, valores in cambios.items():
+        if valores is None:
+            indice_clientes.eliminar(id_cliente)
+        else:
+            indice_clientes.actualizar(id_cliente, *valores)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _descartar_cambios_clientes(session) -> None:
+    session.info.pop(_CAMBIOS_SUGERENCIAS, None)
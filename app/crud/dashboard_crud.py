@@ -0,0 +1,683 @@
+# app/crud/dashboard_crud.py
+"""
+Agregados del dashboard mantenidos de forma incremental.
+
+En lugar de hacer SUM/COUNT/GROUP BY sobre presupuestos y clientes en cada
+carga del dashboard, la tabla `dashboard_agregado` guarda los contadores ya
+calculados. Un listener `before_flush` mira qué presupuestos y clientes se
+insertan, modifican o borran y aplica la diferencia en la misma transacción,
+así que los contadores nunca quedan a medias respecto a los datos.
+
+Las escrituras que no pasan por el ORM (UPDATE masivos, scripts con SQL
+directo) no se ven aquí: después de ellas hay que llamar a
+reconstruir_agregados() (scripts/reconstruir_agregados.py).
+"""
+
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Hashable, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, distinct, event, func, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app.core.cache import CacheTTL
+from app.core.config import settings
+from app.core.eventos import difusor_dashboard
+from app.models.articulo import Articulo
+from app.models.client import Client
+from app.models.dashboard import DashboardAgregado, DashboardDiario, EventoDashboard
+from app.models.presupuesto import Presupuesto
+from app.models.presupuesto_linea import PresupuestoLinea
+from app.core.pagination import Pagina, json_default, paginar
+from app.schemas.dashboard import ArticuloVendido, PuntoSerieVentas
+from app.schemas.presupuesto import ClientRead, PresupuestoConCliente
+
+# Resultados de /dashboard/stats y /dashboard/history
+cache_dashboard = CacheTTL(
+    ttl=settings.DASHBOARD_CACHE_TTL,
+    max_entradas=settings.DASHBOARD_CACHE_MAX_ENTRADAS,
+)
+
+CLAVE_CLIENTES = "clientes"
+CLAVE_INICIALIZADO = "_inicializado"
+# Los buckets diarios llegaron después: BDs con contadores pero sin buckets
+CLAVE_DIARIO_INICIALIZADO = "_inicializado:diario"
+
+# Campos de Presupuesto de los que dependen los agregados
+_CAMPOS_PRESUPUESTO = ("estado", "total", "fecha_presupuesto", "total_bruto", "id_comercial_creador")
+
+
+def clave_estado(estado: Optional[str]) -> str:
+    return f"presupuestos:{estado}"
+
+
+def clave_ventas(fecha: date) -> str:
+    return f"ventas:{fecha:%Y-%m}"
+
+
+# ============================
+#    DIFERENCIAS POR FLUSH
+# ============================
+
+def _aportacion(estado, total, fecha, bruto, comercial) -> Dict[str, float]:
+    """Lo que suma un presupuesto con estos valores a los agregados."""
+    aportacion = {clave_estado(estado): 1.0}
+    if estado == "APROBADO" and fecha is not None:
+        aportacion[clave_ventas(fecha)] = total or 0.0
+    return aportacion
+
+
+def _aportacion_diaria(estado, total, fecha, bruto, comercial) -> Dict[tuple, float]:
+    """Lo que suma un presupuesto a su bucket diario (fecha, estado, comercial)."""
+    if fecha is None:
+        return {}
+    bucket = (fecha, estado, comercial)
+    return {bucket + ("num",): 1.0, bucket + ("bruto",): bruto or 0.0, bucket + ("neto",): total or 0.0}
+
+
+def _valores_anteriores(estado_obj) -> tuple:
+    """Valores ya guardados en BD (antes de los cambios pendientes)."""
+    valores = []
+    for campo in _CAMPOS_PRESUPUESTO:
+        historia = estado_obj.attrs[campo].load_history()
+        anteriores = historia.deleted or historia.unchanged
+        valores.append(anteriores[0] if anteriores else None)
+    return tuple(valores)
+
+
+def _valores_actuales(presupuesto: Presupuesto) -> tuple:
+    return tuple(getattr(presupuesto, campo) for campo in _CAMPOS_PRESUPUESTO)
+
+
+def _diferencias(nuevos, modificados, borrados, aportacion) -> Dict[Hashable, float]:
+    """Diferencia que producen los presupuestos nuevos/modificados/borrados según `aportacion`."""
+    deltas: Dict[Hashable, float] = defaultdict(float)
+
+    for obj in nuevos:
+        if isinstance(obj, Presupuesto):
+            for clave, valor in aportacion(*_valores_actuales(obj)).items():
+                deltas[clave] += valor
+
+    for obj in borrados:
+        if isinstance(obj, Presupuesto):
+            for clave, valor in aportacion(*_valores_anteriores(inspect(obj))).items():
+                deltas[clave] -= valor
+
+    for obj in modificados:
+        if not isinstance(obj, Presupuesto):
+            continue
+        estado_obj = inspect(obj)
+        if not any(estado_obj.attrs[c].history.has_changes() for c in _CAMPOS_PRESUPUESTO):
+            continue
+        for clave, valor in aportacion(*_valores_anteriores(estado_obj)).items():
+            deltas[clave] -= valor
+        for clave, valor in aportacion(*_valores_actuales(obj)).items():
+            deltas[clave] += valor
+
+    return deltas
+
+
+def calcular_deltas(
+    nuevos: Iterable[object],
+    modificados: Iterable[object],
+    borrados: Iterable[object],
+) -> Dict[str, float]:
+    """Diferencia que producen estos cambios del ORM en cada clave."""
+    deltas = _diferencias(nuevos, modificados, borrados, _aportacion)
+    deltas[CLAVE_CLIENTES] += sum(isinstance(obj, Client) for obj in nuevos)
+    deltas[CLAVE_CLIENTES] -= sum(isinstance(obj, Client) for obj in borrados)
+    return {clave: valor for clave, valor in deltas.items() if valor}
+
+
+def calcular_deltas_diarios(
+    nuevos: Iterable[object],
+    modificados: Iterable[object],
+    borrados: Iterable[object],
+) -> Dict[tuple, Dict[str, float]]:
+    """Diferencia en cada bucket diario: (fecha, estado, comercial) -> {num, bruto, neto}."""
+    buckets: Dict[tuple, Dict[str, float]] = {}
+    for (*bucket, medida), valor in _diferencias(nuevos, modificados, borrados, _aportacion_diaria).items():
+        if valor:
+            buckets.setdefault(tuple(bucket), {"num": 0.0, "bruto": 0.0, "neto": 0.0})[medida] = valor
+    return buckets
+
+
+def aplicar_deltas(conexion, deltas: Dict[str, float]) -> None:
+    """Suma `deltas` a los agregados con un único UPSERT."""
+    if not deltas:
+        return
+    stmt = sqlite_insert(DashboardAgregado).values(
+        [{"clave": clave, "valor": valor} for clave, valor in deltas.items()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DashboardAgregado.clave],
+        set_={"valor": DashboardAgregado.valor + stmt.excluded.valor},
+    )
+    conexion.execute(stmt)
+
+
+def aplicar_deltas_diarios(conexion, buckets: Dict[tuple, Dict[str, float]]) -> None:
+    """Suma las diferencias a los buckets diarios con un único UPSERT."""
+    if not buckets:
+        return
+    stmt = sqlite_insert(DashboardDiario).values([
+        {
+            "fecha": fecha, "estado": estado, "id_comercial": comercial,
+            "num": int(medidas["num"]), "bruto": medidas["bruto"], "neto": medidas["neto"],
+        }
+        for (fecha, estado, comercial), medidas in buckets.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DashboardDiario.fecha, DashboardDiario.estado, DashboardDiario.id_comercial],
+        set_={
+            "num": DashboardDiario.num + stmt.excluded.num,
+            "bruto": DashboardDiario.bruto + stmt.excluded.bruto,
+            "neto": DashboardDiario.neto + stmt.excluded.neto,
+        },
+    )
+    conexion.execute(stmt)
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _mantener_agregados(session, flush_context, instances) -> None:
+    deltas = calcular_deltas(session.new, session.dirty, session.deleted)
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+    buckets = calcular_deltas_diarios(session.new, session.dirty, session.deleted)
+    if buckets:
+        aplicar_deltas_diarios(session.connection(), buckets)
+
+
+# ============================
+#    INVALIDACIÓN DE LA CACHÉ
+# ============================
+
+_MODELOS_DASHBOARD = (Presupuesto, PresupuestoLinea, Client, DashboardAgregado, DashboardDiario)
+_MARCA_CAMBIOS = "dashboard_modificado"
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _marcar_cambios(session, flush_context) -> None:
+    if any(
+        isinstance(obj, _MODELOS_DASHBOARD)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info[_MARCA_CAMBIOS] = True
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _marcar_cambios_masivos(orm_execute_state) -> None:
+    # UPDATE/DELETE/INSERT masivos (sin objetos en la sesión)
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _MODELOS_DASHBOARD:
+        orm_execute_state.session.info[_MARCA_CAMBIOS] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidar_cache(session) -> None:
+    # Solo tras el commit: antes, otra petición podría volver a cachear
+    # los datos viejos.
+    if session.info.pop(_MARCA_CAMBIOS, False):
+        cache_dashboard.invalidar()
+    session.info.pop(_EVENTOS, None)
+    if session.info.pop(_FILAS_EVENTOS, None):
+        difusor_dashboard.avisar()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _descartar_marca(session) -> None:
+    session.info.pop(_MARCA_CAMBIOS, None)
+    session.info.pop(_EVENTOS, None)
+    session.info.pop(_FILAS_EVENTOS, None)
+
+
+# ============================
+#    EVENTOS EN VIVO
+# ============================
+# Se recogen en cada flush (todavía se ve qué ha cambiado) y se guardan en
+# evento_dashboard en la misma transacción, de donde los leen los WebSocket
+# de todos los workers (app/core/eventos.py). Van indexados por objeto: si
+# un presupuesto se crea y se le recalcula el total en la misma transacción,
+# queda un único evento (una fila) con los valores finales.
+
+_EVENTOS = "dashboard_eventos"
+_FILAS_EVENTOS = "dashboard_eventos_filas"   # clave del objeto -> id de su fila
+
+# Cada cuántas filas nuevas se borran las que pasan de DASHBOARD_EVENTOS_RETENIDOS
+_PODA_EVENTOS_CADA = 500
+
+
+def _evento_presupuesto(tipo: str, presupuesto: Presupuesto) -> Dict:
+    return {
+        "tipo": tipo,
+        "id": presupuesto.id,
+        "numero_presupuesto": presupuesto.numero_presupuesto,
+        "estado": presupuesto.estado,
+        "total": presupuesto.total,
+        "fecha_presupuesto": presupuesto.fecha_presupuesto,
+        "id_cliente": presupuesto.id_cliente,
+        "id_comercial_creador": presupuesto.id_comercial_creador,
+    }
+
+
+def _propietario(evento: Dict) -> Optional[int]:
+    """Comercial al que pertenece el evento (solo lo reciben él y los ADMIN)."""
+    if "id_comercial_creador" in evento:
+        return evento["id_comercial_creador"]
+    return evento.get("id_comercial_propietario")
+
+
+def _clave_evento(obj) -> tuple:
+    # Por clave primaria: en after_flush los objetos nuevos aún no tienen
+    # identity, pero sí el id que les ha dado el INSERT
+    return (type(obj).__name__, tuple(inspect(obj).mapper.primary_key_from_instance(obj)))
+
+
+def _guardar_eventos(session, eventos: Dict, claves: Iterable) -> None:
+    """
+    Escribe los eventos de `claves`: los nuevos en un único INSERT y los que
+    ya tienen fila en esta transacción reescribiéndola.
+    """
+    filas = session.info.setdefault(_FILAS_EVENTOS, {})
+    tabla = EventoDashboard.__table__
+    conexion = session.connection()
+    nuevas, valores_nuevos = [], []
+    for clave in dict.fromkeys(claves):
+        evento = eventos[clave]
+        valores = {
+            "id_propietario": _propietario(evento),
+            "mensaje": json.dumps(evento, default=json_default, ensure_ascii=False),
+        }
+        if clave in filas:
+            conexion.execute(tabla.update().where(tabla.c.id == filas[clave]).values(**valores))
+        else:
+            nuevas.append(clave)
+            valores_nuevos.append({**valores, "creado_en": datetime.now()})
+    if not nuevas:
+        return
+
+    # Un solo INSERT de varias filas; dentro de la transacción de escritura
+    # nadie más inserta, así que los ids van seguidos y en el orden de VALUES
+    ids = sorted(conexion.execute(
+        tabla.insert().values(valores_nuevos).returning(tabla.c.id)
+    ).scalars().all())
+    filas.update(zip(nuevas, ids))
+    # De vez en cuando se borran los antiguos (ya los han leído todos los workers)
+    if ids[-1] // _PODA_EVENTOS_CADA != (ids[0] - 1) // _PODA_EVENTOS_CADA:
+        conexion.execute(
+            tabla.delete().where(tabla.c.id <= ids[-1] - settings.DASHBOARD_EVENTOS_RETENIDOS)
+        )
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _recoger_eventos(session, flush_context) -> None:
+    eventos = None
+    tocados = []
+    for obj in session.new:
+        if isinstance(obj, Presupuesto):
+            evento = _evento_presupuesto("presupuesto_creado", obj)
+        elif isinstance(obj, Client):
+            evento = {
+                "tipo": "cliente_creado",
+                "id_cliente": obj.id_cliente,
+                "nombre": obj.nombre,
+                "id_comercial_propietario": obj.id_comercial_propietario,
+            }
+        else:
+            continue
+        if eventos is None:
+            eventos = session.info.setdefault(_EVENTOS, {})
+        clave = _clave_evento(obj)
+        eventos[clave] = evento
+        tocados.append(clave)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Presupuesto):
+            continue
+        historial = inspect(obj).attrs
+        if not (historial.estado.history.has_changes() or historial.total.history.has_changes()):
+            continue
+        if eventos is None:
+            eventos = session.info.setdefault(_EVENTOS, {})
+        clave = _clave_evento(obj)
+        anterior = eventos.get(clave)
+        if anterior is not None:
+            # Creado en esta misma transacción: se actualiza ese evento
+            anterior.update(_evento_presupuesto(anterior["tipo"], obj))
+            tocados.append(clave)
+            continue
+        evento = _evento_presupuesto("presupuesto_actualizado", obj)
+        estado_anterior = historial.estado.history.deleted
+        evento["estado_anterior"] = estado_anterior[0] if estado_anterior else obj.estado
+        eventos[clave] = evento
+        tocados.append(clave)
+
+    if tocados:
+        _guardar_eventos(session, eventos, tocados)
+
+
+# Al cambiar estos atributos se carga antes el valor guardado (si no estaba
+# cargado), para poder restar la aportación anterior en el flush.
+for _campo in _CAMPOS_PRESUPUESTO:
+    event.listen(getattr(Presupuesto, _campo), "set", lambda *args: None, active_history=True)
+
+
+# ============================
+#    RECONSTRUCCIÓN
+# ============================
+
+def reconstruir_agregados(session: Session) -> Dict[str, float]:
+    """
+    Recalcula todos los agregados (contadores y buckets diarios) desde
+    presupuestos y clientes y los guarda, borrando los anteriores, en una
+    sola transacción.
+    """
+    valores: Dict[str, float] = {CLAVE_INICIALIZADO: 1.0, CLAVE_DIARIO_INICIALIZADO: 1.0}
+
+    for estado, total in session.exec(
+        select(Presupuesto.estado, func.count()).group_by(Presupuesto.estado)
+    ).all():
+        valores[clave_estado(estado)] = float(total)
+
+    mes = func.strftime("%Y-%m", Presupuesto.fecha_presupuesto)
+    for mes_valor, total in session.exec(
+        select(mes, func.sum(Presupuesto.total))
+        .where(Presupuesto.estado == "APROBADO")
+        .group_by(mes)
+    ).all():
+        valores[f"ventas:{mes_valor}"] = float(total or 0.0)
+
+    valores[CLAVE_CLIENTES] = float(
+        session.exec(select(func.count()).select_from(Client)).one()
+    )
+
+    session.execute(delete(DashboardAgregado))
+    session.execute(
+        sqlite_insert(DashboardAgregado),
+        [{"clave": clave, "valor": valor} for clave, valor in valores.items()],
+    )
+
+    # Buckets diarios: INSERT ... SELECT, sin pasar las filas por Python
+    session.execute(delete(DashboardDiario))
+    session.execute(
+        sqlite_insert(DashboardDiario).from_select(
+            ["fecha", "estado", "id_comercial", "num", "bruto", "neto"],
+            select(
+                Presupuesto.fecha_presupuesto,
+                Presupuesto.estado,
+                Presupuesto.id_comercial_creador,
+                func.count(),
+                func.coalesce(func.sum(Presupuesto.total_bruto), 0.0),
+                func.coalesce(func.sum(Presupuesto.total), 0.0),
+            ).group_by(Presupuesto.fecha_presupuesto, Presupuesto.estado, Presupuesto.id_comercial_creador),
+        )
+    )
+    session.commit()
+    return valores
+
+
+# ============================
+#    LECTURA
+# ============================
+
+def leer_agregados(session: Session, claves: Iterable[str]) -> Dict[str, float]:
+    """
+    Devuelve el valor de cada clave (0 si no existe) con una sola consulta.
+    Si la tabla no se ha reconstruido nunca (BD anterior a los agregados),
+    la reconstruye antes.
+    """
+    claves = list(claves)
+    filas = dict(session.exec(
+        select(DashboardAgregado.clave, DashboardAgregado.valor)
+        .where(DashboardAgregado.clave.in_(claves + [CLAVE_INICIALIZADO]))
+    ).all())
+    if CLAVE_INICIALIZADO not in filas:
+        filas = reconstruir_agregados(session)
+    return {clave: filas.get(clave, 0.0) for clave in claves}
+
+
+def leer_periodo(session: Session, fecha_desde: date, fecha_hasta: date) -> Dict[str, Dict[str, float]]:
+    """
+    Totales por estado de los presupuestos con fecha entre `fecha_desde` y
+    `fecha_hasta` (incluidas): {estado: {num, bruto, neto}}. Suma los buckets
+    diarios del rango (escaneo por la clave primaria, que empieza por fecha).
+    """
+    if fecha_desde > fecha_hasta:
+        raise HTTPException(status_code=400, detail="date_from no puede ser posterior a date_to")
+
+    inicializado = session.exec(
+        select(DashboardAgregado.clave).where(DashboardAgregado.clave == CLAVE_DIARIO_INICIALIZADO)
+    ).first()
+    if inicializado is None:
+        reconstruir_agregados(session)
+
+    filas = session.exec(
+        select(
+            DashboardDiario.estado,
+            func.sum(DashboardDiario.num),
+            func.sum(DashboardDiario.bruto),
+            func.sum(DashboardDiario.neto),
+        )
+        .where(DashboardDiario.fecha >= fecha_desde, DashboardDiario.fecha <= fecha_hasta)
+        .group_by(DashboardDiario.estado)
+    ).all()
+    return {
+        estado: {"num": float(num or 0), "bruto": float(bruto or 0.0), "neto": float(neto or 0.0)}
+        for estado, num, bruto, neto in filas
+    }
+
+
+# ============================
+#    HISTORIAL
+# ============================
+
+def get_historial(
+    session: Session,
+    cursor: Optional[str] = None,
+    limit: int = 10,
+    since_id: Optional[int] = None,
+) -> Pagina[PresupuestoConCliente]:
+    """
+    Últimos presupuestos (por fecha, más recientes primero) con un resumen
+    del cliente, en una sola consulta con JOIN que solo lee las columnas del
+    feed. Paginado por cursor.
+
+    Con `since_id` solo devuelve los presupuestos creados después de ese id:
+    el frontend pasa el mayor id que ya tiene y recibe solo lo nuevo.
+    """
+    statement = (
+        select(
+            Presupuesto.id,
+            Presupuesto.numero_presupuesto,
+            Presupuesto.fecha_presupuesto,
+            Presupuesto.estado,
+            Presupuesto.total,
+            Presupuesto.id_comercial_creador,
+            Client.id_cliente,
+            Client.nombre,
+            Client.provincia,
+        )
+        .outerjoin(Client, Client.id_cliente == Presupuesto.id_cliente)
+    )
+    if since_id is not None:
+        statement = statement.where(Presupuesto.id > since_id)
+
+    pagina = paginar(
+        session,
+        statement,
+        orden=[Presupuesto.fecha_presupuesto, Presupuesto.id],
+        cursor=cursor,
+        limit=limit,
+        descendente=True,
+    )
+    pagina.items = [
+        PresupuestoConCliente(
+            id=fila.id,
+            numero_presupuesto=fila.numero_presupuesto,
+            fecha_presupuesto=fila.fecha_presupuesto,
+            estado=fila.estado,
+            total=fila.total,
+            id_comercial_creador=fila.id_comercial_creador,
+            cliente=(
+                ClientRead(id_cliente=fila.id_cliente, nombre=fila.nombre, provincia=fila.provincia)
+                if fila.id_cliente is not None
+                else None
+            ),
+        )
+        for fila in pagina.items
+    ]
+    return pagina
+
+
+# ============================
+#    MÉTRICAS DEL MES
+# ============================
+
+def contar_clientes_nuevos(session: Session, desde: datetime, hasta: Optional[datetime] = None) -> int:
+    """Clientes registrados desde `desde` (y antes de `hasta`, si se da), por el índice de fecha_registro."""
+    statement = select(func.count()).select_from(Client).where(Client.fecha_registro >= desde)
+    if hasta is not None:
+        statement = statement.where(Client.fecha_registro < hasta)
+    return session.exec(statement).one()
+
+
+def get_articulos_mas_vendidos(
+    session: Session,
+    fecha_desde: date,
+    fecha_hasta: Optional[date] = None,
+    limite: int = 5,
+) -> List[ArticuloVendido]:
+    """
+    Ranking de artículos por unidades (cantidad) en presupuestos APROBADOS
+    con fecha en el rango.
+
+    Los presupuestos salen del índice ix_presupuesto_ventas (estado + fecha)
+    y sus líneas de ix_presupuesto_linea_ventas, así que solo se recorren las
+    líneas del periodo. El resultado se sirve desde la caché del dashboard,
+    que se invalida al escribir presupuestos.
+    """
+    filtros = [
+        Presupuesto.estado == "APROBADO",
+        Presupuesto.fecha_presupuesto >= fecha_desde,
+    ]
+    if fecha_hasta is not None:
+        filtros.append(Presupuesto.fecha_presupuesto <= fecha_hasta)
+
+    cantidad = func.sum(PresupuestoLinea.cantidad).label("cantidad")
+    ranking = (
+        select(PresupuestoLinea.id_articulo, cantidad)
+        .select_from(Presupuesto)
+        .join(PresupuestoLinea, PresupuestoLinea.id_presupuesto == Presupuesto.id)
+        .where(*filtros)
+        .group_by(PresupuestoLinea.id_articulo)
+        .order_by(cantidad.desc(), PresupuestoLinea.id_articulo)
+        .limit(limite)
+        .subquery()
+    )
+    # El nombre solo se busca para los `limite` artículos del ranking
+    filas = session.exec(
+        select(ranking.c.id_articulo, Articulo.nombre, ranking.c.cantidad)
+        .outerjoin(Articulo, Articulo.id == ranking.c.id_articulo)
+        .order_by(ranking.c.cantidad.desc(), ranking.c.id_articulo)
+    ).all()
+    return [
+        ArticuloVendido(id_articulo=id_articulo, nombre=nombre, cantidad=total or 0.0)
+        for id_articulo, nombre, total in filas
+    ]
+
+
+# ============================
+#    SERIES DE VENTAS
+# ============================
+
+PERIODOS_SERIE = ("dia", "semana", "mes")
+DESGLOSES_SERIE = ("comercial", "provincia", "familia")
+
+
+def _expresion_periodo(periodo: str):
+    fecha = Presupuesto.fecha_presupuesto
+    if periodo == "dia":
+        return func.strftime("%Y-%m-%d", fecha)
+    if periodo == "semana":
+        # Lunes de la semana (SQLite no tiene semana ISO en strftime)
+        return func.date(fecha, "-6 days", "weekday 1")
+    if periodo == "mes":
+        return func.strftime("%Y-%m", fecha)
+    raise HTTPException(status_code=400, detail=f"Periodo inválido. Opciones: {', '.join(PERIODOS_SERIE)}")
+
+
+def get_series_ventas(
+    session: Session,
+    fecha_desde: date,
+    fecha_hasta: date,
+    periodo: str = "mes",
+    desglose: Optional[str] = None,
+) -> List[PuntoSerieVentas]:
+    """
+    Ventas aprobadas (importe neto) entre dos fechas, agrupadas por
+    día/semana/mes y, opcionalmente, por comercial, provincia del cliente o
+    familia del artículo.
+
+    Es una sola consulta agregada en SQL. Sin desglose por familia basta con
+    las cabeceras (su `total` ya es la suma de las líneas) y el índice
+    ix_presupuesto_ventas la cubre entera; por familia se suma `total_linea`
+    de las líneas (ix_presupuesto_linea_ventas) uniendo con el artículo.
+    """
+    if fecha_desde > fecha_hasta:
+        raise HTTPException(status_code=400, detail="fecha_desde no puede ser posterior a fecha_hasta")
+    if desglose is not None and desglose not in DESGLOSES_SERIE:
+        raise HTTPException(status_code=400, detail=f"Desglose inválido. Opciones: {', '.join(DESGLOSES_SERIE)}")
+
+    bucket = _expresion_periodo(periodo).label("periodo")
+    filtros = (
+        Presupuesto.estado == "APROBADO",
+        Presupuesto.fecha_presupuesto >= fecha_desde,
+        Presupuesto.fecha_presupuesto <= fecha_hasta,
+    )
+
+    if desglose == "familia":
+        grupo = Articulo.familia
+        statement = (
+            select(
+                bucket,
+                grupo.label("grupo"),
+                func.sum(PresupuestoLinea.total_linea),
+                func.count(distinct(Presupuesto.id)),
+            )
+            .select_from(Presupuesto)
+            .join(PresupuestoLinea, PresupuestoLinea.id_presupuesto == Presupuesto.id)
+            .join(Articulo, Articulo.id == PresupuestoLinea.id_articulo)
+        )
+    else:
+        grupo = {
+            None: None,
+            "comercial": Presupuesto.id_comercial_creador,
+            "provincia": Client.provincia,
+        }[desglose]
+        columnas = [bucket] + ([grupo.label("grupo")] if grupo is not None else [])
+        statement = select(*columnas, func.sum(Presupuesto.total), func.count(Presupuesto.id)).select_from(Presupuesto)
+        if desglose == "provincia":
+            statement = statement.join(Client, Client.id_cliente == Presupuesto.id_cliente)
+
+    agrupar = [bucket] + ([grupo] if grupo is not None else [])
+    statement = statement.where(*filtros).group_by(*agrupar).order_by(*agrupar)
+
+    puntos = []
+    for fila in session.exec(statement).all():
+        if grupo is not None:
+            periodo_valor, grupo_valor, ventas, num = fila
+        else:
+            (periodo_valor, ventas, num), grupo_valor = fila, None
+        puntos.append(PuntoSerieVentas(
+            periodo=periodo_valor,
+            grupo=str(grupo_valor) if grupo_valor is not None else None,
+            ventas=ventas or 0.0,
+            presupuestos=num,
+        ))
+    return puntos
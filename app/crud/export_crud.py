@@ -0,0 +1,89 @@
+# app/crud/export_crud.py
+"""
+Consultas de exportación para BI (presupuestos y líneas).
+
+Devuelven filas planas (solo columnas, sin objetos del ORM) y se leen con
+un cursor en servidor por lotes, así que la memoria no depende del número
+de filas exportadas.
+"""
+
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.crud.presupuesto_crud import aplicar_filtros
+from app.models.client import Client
+from app.models.presupuesto import Presupuesto, PresupuestoFiltros
+from app.models.presupuesto_linea import PresupuestoLinea
+
+# Filas que se piden a la BD en cada viaje
+TAMANO_LOTE_EXPORT = 2000
+
+_COLUMNAS_PRESUPUESTO = [
+    Presupuesto.id,
+    Presupuesto.numero_presupuesto,
+    Presupuesto.fecha_presupuesto,
+    Presupuesto.estado,
+    Presupuesto.id_cliente,
+    Client.nombre.label("cliente_nombre"),
+    Client.provincia.label("cliente_provincia"),
+    Presupuesto.id_comercial_creador,
+    Presupuesto.total_bruto,
+    Presupuesto.total_descuento,
+    Presupuesto.total.label("total_neto"),
+]
+
+_COLUMNAS_LINEA = [
+    PresupuestoLinea.id,
+    PresupuestoLinea.id_presupuesto,
+    Presupuesto.fecha_presupuesto,
+    Presupuesto.estado,
+    Presupuesto.id_cliente,
+    Presupuesto.id_comercial_creador,
+    PresupuestoLinea.id_articulo,
+    PresupuestoLinea.descripcion,
+    PresupuestoLinea.cantidad,
+    PresupuestoLinea.precio_unitario,
+    PresupuestoLinea.descuento,
+    PresupuestoLinea.total_linea,
+]
+
+
+def consulta_presupuestos(filtros: Optional[PresupuestoFiltros] = None):
+    """Cabeceras con nombre/provincia del cliente, por id."""
+    statement = (
+        select(*_COLUMNAS_PRESUPUESTO)
+        .select_from(Presupuesto)
+        .outerjoin(Client, Client.id_cliente == Presupuesto.id_cliente)
+    )
+    return aplicar_filtros(statement, filtros).order_by(Presupuesto.id)
+
+
+def consulta_lineas(filtros: Optional[PresupuestoFiltros] = None):
+    """Líneas con los datos de su cabecera, por presupuesto y línea."""
+    statement = (
+        select(*_COLUMNAS_LINEA)
+        .select_from(PresupuestoLinea)
+        .join(Presupuesto, Presupuesto.id == PresupuestoLinea.id_presupuesto)
+    )
+    return aplicar_filtros(statement, filtros).order_by(PresupuestoLinea.id_presupuesto, PresupuestoLinea.id)
+
+
+def columnas(statement) -> List[str]:
+    return [columna.key for columna in statement.selected_columns]
+
+
+def iterar_lotes(bind: Engine, statement, tamano_lote: int = TAMANO_LOTE_EXPORT) -> Iterator[List[Tuple]]:
+    """
+    Ejecuta `statement` con cursor en servidor y va devolviendo las filas
+    en lotes de `tamano_lote`. Abre su propia sesión: se usa desde
+    respuestas en streaming, que siguen después de cerrar la de la petición.
+    """
+    with Session(bind) as session:
+        resultado = session.execute(
+            statement.execution_options(stream_results=True, yield_per=tamano_lote)
+        )
+        for lote in resultado.partitions():
+            yield lote
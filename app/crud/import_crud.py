@@ -0,0 +1,164 @@
+# app/crud/import_crud.py
+"""
+Importación masiva de clientes desde CSV.
+
+- El fichero se lee en streaming (fila a fila), nunca entero en memoria.
+- El separador (; , tab |) se detecta con csv.Sniffer sobre la cabecera.
+- Los duplicados se detectan en memoria: se cargan una sola vez los
+  nombres normalizados y los NIF de los clientes existentes en dos sets y
+  se van añadiendo los del propio fichero. Nada de un SELECT por fila.
+- Se inserta por lotes (executemany) en una única transacción: o entra todo
+  el fichero o nada.
+
+Los INSERT por lotes no pasan por los objetos del ORM, así que el contador
+de clientes del dashboard se actualiza aquí. La caché del dashboard y el
+índice de sugerencias se enteran solos (INSERT masivo sobre Client) y el
+índice FTS lo mantienen sus triggers.
+"""
+
+import csv
+import re
+from datetime import datetime
+from typing import IO, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from app.core.sugerencias import normalizar
+from app.crud.dashboard_crud import CLAVE_CLIENTES, aplicar_deltas
+from app.models.client import Client, ClientImportError, ClientImportResultado
+
+TAMANO_LOTE_IMPORT = 5000
+
+# Errores que se detallan en la respuesta (el resto solo cuenta)
+MAX_ERRORES_DETALLADOS = 100
+
+# Cabeceras aceptadas (ya en minúsculas) -> columna de Client
+COLUMNAS_IMPORT = {
+    "nombre": "nombre",
+    "nif": "nif",
+    "cif": "nif",
+    "correo": "correo",
+    "email": "correo",
+    "telefono": "telefono",
+    "teléfono": "telefono",
+    "direccion": "direccion",
+    "dirección": "direccion",
+    "provincia": "provincia",
+}
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9A-Z]")
+
+
+def normalizar_nif(nif: Optional[str]) -> str:
+    """'b-12.345.678' -> 'B12345678'."""
+    return _NO_ALFANUMERICO.sub("", (nif or "").upper())
+
+
+def detectar_dialecto(cabecera: str):
+    """
+    Dialecto del CSV a partir de su cabecera. No se mira una muestra de
+    datos: los nombres llevan comas ("X, S.L.") y confundirían al Sniffer.
+    """
+    try:
+        return csv.Sniffer().sniff(cabecera, delimiters=";,\t|")
+    except csv.Error:
+        return csv.excel  # una sola columna: coma
+
+
+def _claves_existentes(session: Session):
+    nombres: Set[str] = set()
+    nifs: Set[str] = set()
+    for nombre, nif in session.exec(select(Client.nombre, Client.nif)).all():
+        nombres.add(normalizar(nombre))
+        if normalizar_nif(nif):
+            nifs.add(normalizar_nif(nif))
+    return nombres, nifs
+
+
+def importar_clients(
+    session: Session,
+    fichero: IO[str],
+    id_comercial: int,
+    tamano_lote: int = TAMANO_LOTE_IMPORT,
+) -> ClientImportResultado:
+    """
+    Importa los clientes de `fichero` (texto CSV con cabecera) asignándolos
+    a `id_comercial`. Devuelve cuántos se han creado, cuántos eran
+    duplicados y cuántas filas no eran válidas (con el motivo).
+    """
+    resultado = ClientImportResultado()
+    errores: List[ClientImportError] = []
+
+    def invalida(fila: int, detalle: str) -> None:
+        resultado.invalidos += 1
+        if len(errores) < MAX_ERRORES_DETALLADOS:
+            errores.append(ClientImportError(fila=fila, detalle=detalle))
+
+    primera_linea = fichero.readline()
+    fichero.seek(0)
+    lector = csv.reader(fichero, detectar_dialecto(primera_linea))
+
+    cabecera = next(lector, None)
+    columnas = [COLUMNAS_IMPORT.get(c.strip().lower()) for c in cabecera or []]
+    if "nombre" not in columnas:
+        invalida(1, "La cabecera no tiene columna 'nombre'")
+        resultado.errores = errores
+        return resultado
+
+    nombres, nifs = _claves_existentes(session)
+    ahora = datetime.now()
+    lote: List[Dict] = []
+
+    for fila in lector:
+        numero = lector.line_num
+        if not any(valor.strip() for valor in fila):
+            continue  # líneas en blanco
+        if len(fila) > len(columnas):
+            invalida(numero, f"{len(fila)} campos y la cabecera tiene {len(columnas)}")
+            continue
+
+        datos = {
+            columna: valor.strip() or None
+            for columna, valor in zip(columnas, fila)
+            if columna is not None
+        }
+        if not datos.get("nombre"):
+            invalida(numero, "Falta el nombre")
+            continue
+
+        clave_nombre = normalizar(datos["nombre"])
+        clave_nif = normalizar_nif(datos.get("nif"))
+        if clave_nombre in nombres or (clave_nif and clave_nif in nifs):
+            resultado.duplicados += 1
+            continue
+        nombres.add(clave_nombre)
+        if clave_nif:
+            nifs.add(clave_nif)
+
+        lote.append({
+            **{c: None for c in ("nif", "correo", "telefono", "direccion", "provincia")},
+            **datos,
+            "id_comercial_propietario": id_comercial,
+            "fecha_registro": ahora,
+            "updated_at": ahora,
+        })
+        if len(lote) >= tamano_lote:
+            _insertar(session, lote)
+            resultado.creados += len(lote)
+            lote = []
+
+    if lote:
+        _insertar(session, lote)
+        resultado.creados += len(lote)
+
+    if resultado.creados:
+        aplicar_deltas(session.connection(), {CLAVE_CLIENTES: float(resultado.creados)})
+    session.commit()
+
+    resultado.errores = errores
+    return resultado
+
+
+def _insertar(session: Session, filas: Iterable[Dict]) -> None:
+    session.execute(insert(Client), list(filas))
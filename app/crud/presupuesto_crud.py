@@ -1,22 +1,76 @@
 # app/crud/presupuesto_crud.py
 
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
 
 from app.models.presupuesto import (
     Presupuesto,
+    PresupuestoFiltros,
     PresupuestoCompletoCreate,
     PresupuestoUpdate,
     PresupuestoCompletoRead,
+    PresupuestoResumen,
+    PresupuestoBulkError,
+    PresupuestoBulkResultado,
 )
 from app.models.presupuesto_linea import (
     PresupuestoLinea,
     PresupuestoLineaRead,
+    PresupuestoLineaUpsert,
+    CambiosLineas,
 )
 from app.models.client import Client
 from app.models.articulo import Articulo
+from app.models.user import User
+from app.core.pagination import Pagina, paginar
+
+
+# ============================
+#    CÁLCULO DE TOTALES
+# ============================
+
+def calcular_totales_linea(
+    cantidad: Optional[float],
+    precio_unitario: Optional[float],
+    descuento: Optional[float],
+) -> Tuple[float, float, float]:
+    """
+    Devuelve (bruto, importe_descuento, neto) de una línea.
+    El descuento viene en porcentaje (10 => 10%).
+    """
+    bruto = (cantidad or 0.0) * (precio_unitario or 0.0)
+    importe_descuento = bruto * (descuento or 0.0) / 100.0
+    return bruto, importe_descuento, bruto - importe_descuento
+
+
+def _guardar_totales_cabecera(
+    presupuesto: Presupuesto,
+    importes: Iterable[Tuple[float, float, float]],
+) -> None:
+    """
+    Suma los (bruto, descuento, neto) de las líneas y los guarda en la
+    cabecera (`total_bruto`, `total_descuento` y `total` = neto).
+
+    Se llama al escribir (crear/actualizar), para que las lecturas y el
+    dashboard usen directamente los valores guardados.
+    """
+    total_bruto = 0.0
+    total_descuento = 0.0
+    total_neto = 0.0
+
+    for bruto, importe_descuento, neto in importes:
+        total_bruto += bruto
+        total_descuento += importe_descuento
+        total_neto += neto
+
+    presupuesto.total_bruto = total_bruto
+    presupuesto.total_descuento = total_descuento
+    presupuesto.total = total_neto
 
 
 # ============================
@@ -29,46 +83,31 @@ def build_presupuesto_completo_read(
     """
     Construye el esquema PresupuestoCompletoRead
     a partir de la entidad Presupuesto (incluyendo líneas y totales).
-    """
 
-    total_bruto = 0.0
-    total_descuento = 0.0
-    total_neto = 0.0
-
-    lineas_read: List[PresupuestoLineaRead] = []
-
-    for linea in presupuesto.lineas or []:
-        # Cálculos de línea (usando nombres correctos)
-        bruto_linea = (linea.cantidad or 0.0) * (linea.precio_unitario or 0.0)
-        descuento_linea = bruto_linea * (linea.descuento or 0.0) / 100.0
-        neto_linea = bruto_linea - descuento_linea
-
-        total_bruto += bruto_linea
-        total_descuento += descuento_linea
-        total_neto += neto_linea
-
-        # Mapeamos a esquema de lectura de línea
-        lineas_read.append(
-            PresupuestoLineaRead(
-                # 👇 CORRECCIONES AQUÍ 👇
-                id=linea.id,                        # Antes: id_linea
-                id_presupuesto=linea.id_presupuesto,
-                id_articulo=linea.id_articulo,
-                cantidad=linea.cantidad,            # Antes: cantidad_m2
-                precio_unitario=linea.precio_unitario, # Antes: precio_m2
-                descuento=linea.descuento,          # Antes: descuento_pct
-                descripcion=linea.descripcion,      # Antes: descripcion_articulo
-            )
+    Los totales se leen tal cual están guardados (ver `_guardar_totales_cabecera`).
+    """
+    lineas_read: List[PresupuestoLineaRead] = [
+        PresupuestoLineaRead(
+            id=linea.id,
+            id_presupuesto=linea.id_presupuesto,
+            id_articulo=linea.id_articulo,
+            cantidad=linea.cantidad,
+            precio_unitario=linea.precio_unitario,
+            descuento=linea.descuento,
+            descripcion=linea.descripcion,
+            total_linea=linea.total_linea,
         )
+        for linea in presupuesto.lineas or []
+    ]
 
     return PresupuestoCompletoRead(
         # Cabecera
-        # 👇 CORRECCIÓN AQUÍ TAMBIÉN 👇
-        id=presupuesto.id,              # Antes: id_presupuesto
+        id=presupuesto.id,
         numero_presupuesto=presupuesto.numero_presupuesto,
         fecha_presupuesto=presupuesto.fecha_presupuesto,
         lugar_suministro=presupuesto.lugar_suministro,
         persona_contacto=presupuesto.persona_contacto,
+        total=presupuesto.total,
         estado=presupuesto.estado,
         fecha_revision=presupuesto.fecha_revision,
         motivo_denegacion=presupuesto.motivo_denegacion,
@@ -84,12 +123,91 @@ def build_presupuesto_completo_read(
         id_admin_revisor=presupuesto.id_admin_revisor,
         # Líneas
         lineas=lineas_read,
-        # Totales calculados
-        total_bruto=total_bruto,
-        total_descuento=total_descuento,
-        total_neto=total_neto,
+        # Totales guardados
+        total_bruto=presupuesto.total_bruto,
+        total_descuento=presupuesto.total_descuento,
+        total_neto=presupuesto.total,
     )
 
+# ============================
+#    CARGA DE RELACIONES
+# ============================
+
+def _con_relaciones(statement, incluir_cliente: bool = False):
+    """
+    Añade a la consulta la carga anticipada de las líneas (y, si se pide,
+    del cliente) con selectinload.
+
+    Así un listado cuesta siempre el mismo número de consultas
+    (cabeceras + líneas [+ clientes]) sea cual sea el tamaño de la página,
+    en lugar de una consulta extra por presupuesto al leer `.lineas`.
+    """
+    opciones = [selectinload(Presupuesto.lineas)]
+    if incluir_cliente:
+        opciones.append(selectinload(Presupuesto.cliente))
+    return statement.options(*opciones)
+
+
+# ============================
+#    FILTROS Y ORDENACIÓN
+# ============================
+
+# Ordenaciones admitidas en los listados ("-" delante = descendente).
+# Cada una se apoya en un índice de Presupuesto (ver __table_args__).
+ORDENES_PRESUPUESTO = {
+    "id": Presupuesto.id,
+    "fecha": Presupuesto.fecha_presupuesto,
+    "total": Presupuesto.total,
+}
+
+
+def aplicar_filtros(statement, filtros: Optional[PresupuestoFiltros] = None):
+    """Añade al select los filtros del listado que vengan informados."""
+    if filtros is None:
+        return statement
+    if filtros.estado:
+        statement = statement.where(Presupuesto.estado == filtros.estado)
+    if filtros.id_cliente is not None:
+        statement = statement.where(Presupuesto.id_cliente == filtros.id_cliente)
+    if filtros.id_comercial_creador is not None:
+        statement = statement.where(Presupuesto.id_comercial_creador == filtros.id_comercial_creador)
+    if filtros.fecha_desde:
+        statement = statement.where(Presupuesto.fecha_presupuesto >= filtros.fecha_desde)
+    if filtros.fecha_hasta:
+        statement = statement.where(Presupuesto.fecha_presupuesto <= filtros.fecha_hasta)
+    if filtros.total_min is not None:
+        statement = statement.where(Presupuesto.total >= filtros.total_min)
+    if filtros.total_max is not None:
+        statement = statement.where(Presupuesto.total <= filtros.total_max)
+    return statement
+
+
+def limitar_a_usuario(filtros: Optional[PresupuestoFiltros], usuario: User) -> PresupuestoFiltros:
+    """
+    Un ADMIN ve todos los presupuestos; el resto, solo los que ha creado
+    (aunque pida otro id_comercial_creador). Así el listado de un comercial
+    va por el índice (id_comercial_creador, ...) y no recorre la tabla.
+    """
+    filtros = filtros or PresupuestoFiltros()
+    if usuario.rol == "ADMIN":
+        return filtros
+    return filtros.model_copy(update={"id_comercial_creador": usuario.id_usuario})
+
+
+def _columnas_orden(orden: str) -> Tuple[list, bool]:
+    """Traduce `orden` ("fecha", "-total"...) a (columnas keyset, descendente)."""
+    descendente = orden.startswith("-")
+    columna = ORDENES_PRESUPUESTO.get(orden.lstrip("-"))
+    if columna is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Orden no válido: {orden}. Opciones: {', '.join(ORDENES_PRESUPUESTO)}",
+        )
+    if columna is Presupuesto.id:
+        return [Presupuesto.id], descendente
+    return [columna, Presupuesto.id], descendente
+
+
 # ============================
 #    READ OPERATIONS
 # ============================
@@ -104,6 +222,19 @@ def get_presupuesto_by_id(
     return session.get(Presupuesto, presupuesto_id)
 
 
+def get_presupuesto_updated_at(session: Session, presupuesto_id: int) -> Optional[datetime]:
+    """
+    Solo la versión (updated_at) del presupuesto, para los GET condicionales.
+    Lanza 404 si no existe.
+    """
+    fila = session.exec(
+        select(Presupuesto.id, Presupuesto.updated_at).where(Presupuesto.id == presupuesto_id)
+    ).first()
+    if fila is None:
+        raise HTTPException(status_code=404, detail="Presupuesto no encontrado")
+    return fila.updated_at
+
+
 def get_presupuesto_completo_by_id(
     session: Session,
     presupuesto_id: int,
@@ -120,11 +251,18 @@ def get_presupuesto_completo_by_id(
 def get_presupuestos_by_client(
     session: Session,
     client_id: int,
+    con_lineas: bool = False,
+    incluir_cliente: bool = False,
 ) -> List[Presupuesto]:
     """
     Lista todos los presupuestos (entidad BD) de un cliente concreto.
+
+    Con `con_lineas=True` las líneas (y opcionalmente el cliente) llegan
+    precargadas en un número fijo de consultas.
     """
     statement = select(Presupuesto).where(Presupuesto.id_cliente == client_id)
+    if con_lineas:
+        statement = _con_relaciones(statement, incluir_cliente=incluir_cliente)
     return list(session.exec(statement).all())
 
 
@@ -135,37 +273,210 @@ def get_presupuestos_completos_by_client(
     """
     Lista todos los presupuestos de un cliente como PresupuestoCompletoRead.
     """
-    presupuestos = get_presupuestos_by_client(session, client_id)
+    presupuestos = get_presupuestos_by_client(session, client_id, con_lineas=True)
     return [build_presupuesto_completo_read(p) for p in presupuestos]
 
 
 def get_presupuestos(
     session: Session,
-    skip: int = 0,
-    limit: int = 100,
-) -> List[Presupuesto]:
-    """Devuelve la lista paginada de presupuestos (solo entidad cabecera)."""
-    statement = select(Presupuesto).offset(skip).limit(limit)
-    return session.exec(statement).all()
+    filtros: Optional[PresupuestoFiltros] = None,
+    orden: str = "id",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = 100,
+    con_lineas: bool = False,
+    incluir_cliente: bool = False,
+) -> Pagina[Presupuesto]:
+    """
+    Devuelve una página de presupuestos (entidad cabecera), filtrada en BD
+    y paginada por cursor según `orden` (ver ORDENES_PRESUPUESTO).
+
+    Con `con_lineas=True` las líneas (y opcionalmente el cliente) llegan
+    precargadas en un número fijo de consultas.
+    """
+    statement = aplicar_filtros(select(Presupuesto), filtros)
+    if con_lineas:
+        statement = _con_relaciones(statement, incluir_cliente=incluir_cliente)
+    columnas, descendente = _columnas_orden(orden)
+    return paginar(
+        session,
+        statement,
+        orden=columnas,
+        cursor=cursor,
+        limit=limit,
+        descendente=descendente,
+    )
 
 
 def get_presupuestos_completos(
     session: Session,
-    skip: int = 0,
-    limit: int = 100,
-) -> List[PresupuestoCompletoRead]:
+    filtros: Optional[PresupuestoFiltros] = None,
+    orden: str = "id",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = 100,
+) -> Pagina[PresupuestoCompletoRead]:
     """
-    Devuelve la lista paginada de presupuestos como PresupuestoCompletoRead
+    Devuelve una página de presupuestos como PresupuestoCompletoRead
     (cabecera + líneas + totales).
     """
-    presupuestos = get_presupuestos(session, skip=skip, limit=limit)
-    return [build_presupuesto_completo_read(p) for p in presupuestos]
+    pagina = get_presupuestos(
+        session,
+        filtros=filtros,
+        orden=orden,
+        cursor=cursor,
+        limit=limit,
+        con_lineas=True,
+    )
+    pagina.items = [build_presupuesto_completo_read(p) for p in pagina.items]
+    return pagina
+
+
+def get_presupuestos_resumen(
+    session: Session,
+    filtros: Optional[PresupuestoFiltros] = None,
+    orden: str = "id",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = 100,
+) -> Pagina[PresupuestoResumen]:
+    """
+    Igual que get_presupuestos pero devolviendo PresupuestoResumen.
+
+    Todo sale de una única consulta: columnas de cabecera, nombre del cliente
+    (JOIN) y número de líneas (COUNT sobre el índice de id_presupuesto), sin
+    cargar ninguna fila de PresupuestoLinea.
+    """
+    num_lineas = (
+        select(func.count(PresupuestoLinea.id))
+        .where(PresupuestoLinea.id_presupuesto == Presupuesto.id)
+        .correlate(Presupuesto)
+        .scalar_subquery()
+        .label("num_lineas")
+    )
+    statement = (
+        select(
+            Presupuesto.id,
+            Presupuesto.numero_presupuesto,
+            Presupuesto.fecha_presupuesto,
+            Presupuesto.estado,
+            Presupuesto.id_cliente,
+            Client.nombre.label("cliente_nombre"),
+            Presupuesto.id_comercial_creador,
+            Presupuesto.total_bruto,
+            Presupuesto.total_descuento,
+            Presupuesto.total,
+            num_lineas,
+        )
+        .select_from(Presupuesto)
+        .outerjoin(Client, Client.id_cliente == Presupuesto.id_cliente)
+    )
+    statement = aplicar_filtros(statement, filtros)
+    columnas, descendente = _columnas_orden(orden)
+
+    pagina = paginar(
+        session,
+        statement,
+        orden=columnas,
+        cursor=cursor,
+        limit=limit,
+        descendente=descendente,
+    )
+    pagina.items = [PresupuestoResumen(**fila._mapping) for fila in pagina.items]
+    return pagina
+
+
+def iterar_presupuestos_completos(
+    session: Session,
+    filtros: Optional[PresupuestoFiltros] = None,
+    tamano_lote: int = 100,
+) -> Iterator[Tuple[PresupuestoCompletoRead, Optional[Client]]]:
+    """
+    Recorre todos los presupuestos que cumplen `filtros` (por id) como pares
+    (PresupuestoCompletoRead, Client), cargándolos por lotes.
+
+    Tras cada lote se vacía la sesión, así que la memoria no crece con el
+    número de presupuestos recorridos.
+    """
+    cursor = None
+    while True:
+        pagina = get_presupuestos(
+            session,
+            filtros=filtros,
+            cursor=cursor,
+            limit=tamano_lote,
+            con_lineas=True,
+            incluir_cliente=True,
+        )
+        lote = [(build_presupuesto_completo_read(p), p.cliente) for p in pagina.items]
+        session.expunge_all()
+        yield from lote
+        if not pagina.has_more:
+            return
+        cursor = pagina.next_cursor
 
 
 # ============================
 #    CREATE OPERATION
 # ============================
 
+def articulos_inexistentes(session: Session, ids_articulo: Iterable[str]) -> List[str]:
+    """
+    Devuelve (ordenados) los id_articulo que no existen en el catálogo,
+    con una sola consulta IN en lugar de un session.get() por línea.
+    """
+    ids = set(ids_articulo)
+    if not ids:
+        return []
+    existentes = set(session.exec(select(Articulo.id).where(Articulo.id.in_(ids))).all())
+    return sorted(ids - existentes)
+
+
+def _insertar_presupuestos(
+    session: Session,
+    presupuestos_in: List[PresupuestoCompletoCreate],
+) -> List[Presupuesto]:
+    """
+    Inserta cabeceras y líneas (ya validadas) sin hacer commit.
+
+    Las cabeceras se añaden con sus totales ya calculados y se insertan en
+    un único flush; después todas las líneas de todos los presupuestos van
+    en un solo INSERT masivo.
+    """
+    presupuestos: List[Presupuesto] = []
+    lineas_por_presupuesto: List[List[dict]] = []
+
+    for presupuesto_in in presupuestos_in:
+        # Cabecera: todos los campos menos 'lineas'
+        presupuesto = Presupuesto(**presupuesto_in.model_dump(exclude={"lineas"}))
+
+        lineas_data: List[dict] = []
+        importes: List[Tuple[float, float, float]] = []
+        for linea_in in (presupuesto_in.lineas or []):
+            # Ignoramos cualquier id_presupuesto que venga en el body
+            linea_data = linea_in.model_dump(exclude={"id_presupuesto"})
+            bruto, importe_descuento, neto = calcular_totales_linea(
+                linea_data["cantidad"], linea_data["precio_unitario"], linea_data["descuento"]
+            )
+            linea_data["total_linea"] = neto
+            importes.append((bruto, importe_descuento, neto))
+            lineas_data.append(linea_data)
+
+        _guardar_totales_cabecera(presupuesto, importes)
+        presupuestos.append(presupuesto)
+        lineas_por_presupuesto.append(lineas_data)
+
+    session.add_all(presupuestos)
+    session.flush()  # Para obtener los id de las cabeceras
+
+    filas = [
+        {**linea_data, "id_presupuesto": presupuesto.id}
+        for presupuesto, lineas_data in zip(presupuestos, lineas_por_presupuesto)
+        for linea_data in lineas_data
+    ]
+    if filas:
+        session.execute(insert(PresupuestoLinea), filas)
+
+    return presupuestos
+
+
 def create_presupuesto_completo(
     session: Session,
     presupuesto_in: PresupuestoCompletoCreate,
@@ -183,7 +494,8 @@ def create_presupuesto_completo(
 
     Además:
     - Valida que el id_cliente exista.
-    - Valida que cada id_articulo de las líneas exista.
+    - Valida que todos los id_articulo de las líneas existan (una sola
+      consulta; el error lista todos los que faltan).
     """
 
     # 0) Validar que el cliente exista
@@ -195,53 +507,183 @@ def create_presupuesto_completo(
         )
 
     # 0.1) Validar que todos los artículos de las líneas existan
-    for linea_in in (presupuesto_in.lineas or []):
-        articulo = session.get(Articulo, linea_in.id_articulo)
-        if not articulo:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Artículo con id_articulo={linea_in.id_articulo} no existe",
-            )
-
-    # 1) Separar datos de cabecera (todos los campos menos 'lineas')
-    cabecera_data = presupuesto_in.model_dump(exclude={"lineas"})
-
-    # 2) Crear la cabecera del presupuesto
-    presupuesto = Presupuesto(**cabecera_data)
-    session.add(presupuesto)
-    session.flush()  # Para obtener presupuesto.id_presupuesto antes del commit
-
-    # 3) Crear las líneas, forzando id_presupuesto desde la cabecera
-    for linea_in in (presupuesto_in.lineas or []):
-        # Ignoramos cualquier id_presupuesto que venga en el body
-        linea_data = linea_in.model_dump(exclude={"id_presupuesto"})
-
-        linea = PresupuestoLinea(
-            **linea_data,
-            id_presupuesto=presupuesto.id,
+    faltan = articulos_inexistentes(
+        session, (linea_in.id_articulo for linea_in in (presupuesto_in.lineas or []))
+    )
+    if faltan:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Artículos que no existen: {', '.join(faltan)}",
         )
-        session.add(linea)
 
-    # 4) Confirmar en base de datos
+    # 1) Insertar cabecera + líneas (con totales)
+    presupuesto = _insertar_presupuestos(session, [presupuesto_in])[0]
+
+    # 2) Confirmar en base de datos
     session.commit()
 
-    # 5) Refrescar la cabecera para que tenga las relaciones cargadas
+    # 3) Refrescar la cabecera para que tenga las relaciones cargadas
     session.refresh(presupuesto)
 
     return presupuesto
 
 
+def create_presupuestos_bulk(
+    session: Session,
+    presupuestos_in: List[PresupuestoCompletoCreate],
+) -> PresupuestoBulkResultado:
+    """
+    Importa muchos presupuestos completos en una sola transacción.
+
+    Clientes y artículos de todo el lote se validan con una consulta cada
+    uno; los presupuestos con referencias inválidas se descartan y se
+    informan por índice, y el resto se inserta junto (ver
+    _insertar_presupuestos) y se confirma con un único commit.
+    """
+    ids_cliente = {p.id_cliente for p in presupuestos_in}
+    clientes_existentes = set(
+        session.exec(select(Client.id_cliente).where(Client.id_cliente.in_(ids_cliente))).all()
+    ) if ids_cliente else set()
+    faltan_articulos = set(articulos_inexistentes(
+        session,
+        (linea.id_articulo for p in presupuestos_in for linea in (p.lineas or [])),
+    ))
+
+    validos: List[PresupuestoCompletoCreate] = []
+    errores: List[PresupuestoBulkError] = []
+    for indice, presupuesto_in in enumerate(presupuestos_in):
+        problemas = []
+        if presupuesto_in.id_cliente not in clientes_existentes:
+            problemas.append(f"Cliente con id_cliente={presupuesto_in.id_cliente} no existe")
+        faltan = sorted({linea.id_articulo for linea in (presupuesto_in.lineas or [])} & faltan_articulos)
+        if faltan:
+            problemas.append(f"Artículos que no existen: {', '.join(faltan)}")
+
+        if problemas:
+            errores.append(PresupuestoBulkError(indice=indice, detalle="; ".join(problemas)))
+        else:
+            validos.append(presupuesto_in)
+
+    creados = _insertar_presupuestos(session, validos) if validos else []
+    session.commit()
+
+    return PresupuestoBulkResultado(
+        creados=[presupuesto.id for presupuesto in creados],
+        errores=errores,
+    )
+
+
 # ============================
 #    UPDATE OPERATION
 # ============================
 
+# Campos de línea que se comparan para saber si una línea ha cambiado
+_CAMPOS_LINEA = ("id_articulo", "descripcion", "cantidad", "precio_unitario", "descuento")
+
+
+def _clave_linea(id_articulo: str, precio_unitario: float, descripcion: str) -> Tuple:
+    return (id_articulo, float(precio_unitario or 0), descripcion)
+
+
+def sincronizar_lineas(
+    session: Session,
+    presupuesto: Presupuesto,
+    lineas_in: List[PresupuestoLineaUpsert],
+) -> CambiosLineas:
+    """
+    Reconcilia las líneas guardadas con `lineas_in` (la lista completa)
+    comparando por id, en lugar de borrar todo y volver a insertar:
+
+    - líneas con id existente e iguales: no se tocan
+    - líneas con id existente y algún cambio: un UPDATE masivo por PK
+    - líneas guardadas que no vienen: un DELETE ... WHERE id IN (...)
+    - líneas sin id (o con un id ajeno): se emparejan con una guardada que
+      no se haya reclamado y tenga el mismo artículo, precio y descripción
+      (clientes que no envían el id); si no hay ninguna, un INSERT masivo
+
+    También deja actualizados los totales de la cabecera y, si alguna línea
+    cambia, su updated_at (las líneas forman parte de la versión del
+    presupuesto aunque los totales no varíen).
+    """
+    existentes = {linea.id: linea for linea in presupuesto.lineas}
+    vistas = set()
+    actualizar: List[dict] = []
+    insertar: List[dict] = []
+    importes: List[Tuple[float, float, float]] = []
+    sin_emparejar: List[dict] = []
+
+    def _reconciliar(actual: PresupuestoLinea, datos: dict) -> None:
+        vistas.add(actual.id)
+        if any(getattr(actual, campo) != valor for campo, valor in datos.items()):
+            actualizar.append({"id": actual.id, **datos})
+
+    # 1) Por id
+    for linea_in in lineas_in:
+        datos = linea_in.model_dump(include=set(_CAMPOS_LINEA))
+        bruto, importe_descuento, neto = calcular_totales_linea(
+            datos["cantidad"], datos["precio_unitario"], datos["descuento"]
+        )
+        datos["total_linea"] = neto
+        importes.append((bruto, importe_descuento, neto))
+
+        actual = existentes.get(linea_in.id)
+        if actual is None or actual.id in vistas:
+            sin_emparejar.append(datos)
+        else:
+            _reconciliar(actual, datos)
+
+    # 2) Sin id: por artículo, precio y descripción entre las no reclamadas
+    libres: Dict[Tuple, List[PresupuestoLinea]] = {}
+    for linea in existentes.values():
+        if linea.id not in vistas:
+            clave = _clave_linea(linea.id_articulo, linea.precio_unitario, linea.descripcion)
+            libres.setdefault(clave, []).append(linea)
+    for datos in sin_emparejar:
+        candidatas = libres.get(_clave_linea(datos["id_articulo"], datos["precio_unitario"], datos["descripcion"]))
+        if candidatas:
+            _reconciliar(candidatas.pop(0), datos)
+        else:
+            insertar.append({**datos, "id_presupuesto": presupuesto.id})
+
+    eliminadas = [linea_id for linea_id in existentes if linea_id not in vistas]
+
+    if eliminadas:
+        session.execute(
+            delete(PresupuestoLinea)
+            .where(PresupuestoLinea.id.in_(eliminadas))
+            .execution_options(synchronize_session=False)
+        )
+    if actualizar:
+        session.execute(update(PresupuestoLinea), actualizar)
+    insertadas: List[int] = []
+    if insertar:
+        insertadas = list(session.scalars(
+            insert(PresupuestoLinea).returning(PresupuestoLinea.id),
+            insertar,
+        ))
+
+    _guardar_totales_cabecera(presupuesto, importes)
+    if eliminadas or actualizar or insertadas:
+        presupuesto.updated_at = datetime.now()
+
+    return CambiosLineas(
+        insertadas=insertadas,
+        actualizadas=[datos["id"] for datos in actualizar],
+        eliminadas=eliminadas,
+        sin_cambios=len(vistas) - len(actualizar),
+    )
+
+
 def update_presupuesto(
     session: Session,
     presupuesto: Presupuesto,
     presupuesto_in: PresupuestoUpdate,
-) -> Presupuesto:
+) -> Tuple[Presupuesto, Optional[CambiosLineas]]:
     """
     Actualiza un presupuesto existente.
+
+    Devuelve el presupuesto y, si el body traía `lineas`, el resumen de
+    cambios en las líneas (ver sincronizar_lineas).
     """
     
     # Convertimos los datos de entrada a diccionario
@@ -273,29 +715,16 @@ def update_presupuesto(
         setattr(presupuesto, key, value)
 
     # ---------------------------------------------------------------
-    # 3. GESTIÓN DE LÍNEAS
+    # 3. GESTIÓN DE LÍNEAS (diff por id + totales)
     # ---------------------------------------------------------------
+    cambios = None
     if presupuesto_in.lineas is not None:
-        # A) Borrar líneas existentes
-        for linea_antigua in list(presupuesto.lineas):
-            session.delete(linea_antigua)
-        
-        # B) Crear líneas nuevas
-        for linea_in in presupuesto_in.lineas:
-            nueva_linea = PresupuestoLinea(
-                id_presupuesto=presupuesto.id,
-                id_articulo=linea_in.id_articulo,
-                descripcion=linea_in.descripcion,
-                cantidad=linea_in.cantidad,
-                precio_unitario=linea_in.precio_unitario,
-                descuento=linea_in.descuento
-            )
-            session.add(nueva_linea)
+        cambios = sincronizar_lineas(session, presupuesto, presupuesto_in.lineas)
 
     session.add(presupuesto)
     session.commit()
     session.refresh(presupuesto)
-    return presupuesto
+    return presupuesto, cambios
 
 # ============================
 #    DELETE OPERATION
@@ -323,4 +752,94 @@ def delete_presupuesto(
     session.commit()
     
     # 5. Devolvemos el objeto (útil para logs o confirmaciones)
-    return presupuesto
\ No newline at end of file
+    return presupuesto
+
+
+# ============================
+#    RECÁLCULO DE TOTALES
+# ============================
+
+# Tolerancia para comparar importes en coma flotante
+_EPSILON_TOTALES = 1e-6
+
+
+def _suma_lineas(expresion):
+    """Suma correlacionada de `expresion` sobre las líneas del presupuesto."""
+    return func.coalesce(
+        select(func.sum(expresion))
+        .where(PresupuestoLinea.id_presupuesto == Presupuesto.id)
+        .scalar_subquery(),
+        0.0,
+    )
+
+
+def recalcular_totales(session: Session, tamano_lote: int = 1000) -> Tuple[int, int]:
+    """
+    Recalcula en SQL, por lotes de `tamano_lote` presupuestos, los totales
+    guardados de líneas y cabeceras, y corrige los que no cuadren.
+
+    Cada lote son dos UPDATE (líneas y cabeceras) sobre un rango de ids y
+    se confirma por separado, así que tablas grandes no bloquean la BD
+    durante todo el proceso.
+
+    Devuelve (lineas_corregidas, presupuestos_corregidos).
+    """
+    cantidad = func.coalesce(PresupuestoLinea.cantidad, 0.0)
+    precio = func.coalesce(PresupuestoLinea.precio_unitario, 0.0)
+    descuento = func.coalesce(PresupuestoLinea.descuento, 0.0)
+    # Mismo orden de operaciones que calcular_totales_linea()
+    bruto_linea = cantidad * precio
+    descuento_linea = bruto_linea * descuento / 100.0
+    neto_linea = bruto_linea - descuento_linea
+
+    bruto = _suma_lineas(bruto_linea)
+    importe_descuento = _suma_lineas(descuento_linea)
+    neto = _suma_lineas(neto_linea)
+
+    lineas_corregidas = 0
+    presupuestos_corregidos = 0
+    ultimo_id = 0
+
+    while True:
+        ids = session.exec(
+            select(Presupuesto.id)
+            .where(Presupuesto.id > ultimo_id)
+            .order_by(Presupuesto.id)
+            .limit(tamano_lote)
+        ).all()
+        if not ids:
+            break
+        desde, hasta = ids[0], ids[-1]
+
+        resultado_lineas = session.execute(
+            update(PresupuestoLinea)
+            .where(
+                PresupuestoLinea.id_presupuesto.between(desde, hasta),
+                (PresupuestoLinea.total_linea.is_(None))
+                | (func.abs(PresupuestoLinea.total_linea - neto_linea) > _EPSILON_TOTALES),
+            )
+            .values(total_linea=neto_linea)
+            .execution_options(synchronize_session=False)
+        )
+
+        resultado_cabeceras = session.execute(
+            update(Presupuesto)
+            .where(
+                Presupuesto.id.between(desde, hasta),
+                (Presupuesto.total.is_(None))
+                | (Presupuesto.total_bruto.is_(None))
+                | (Presupuesto.total_descuento.is_(None))
+                | (func.abs(Presupuesto.total - neto) > _EPSILON_TOTALES)
+                | (func.abs(Presupuesto.total_bruto - bruto) > _EPSILON_TOTALES)
+                | (func.abs(Presupuesto.total_descuento - importe_descuento) > _EPSILON_TOTALES),
+            )
+            .values(total_bruto=bruto, total_descuento=importe_descuento, total=neto)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+
+        lineas_corregidas += resultado_lineas.rowcount
+        presupuestos_corregidos += resultado_cabeceras.rowcount
+        ultimo_id = hasta
+
+    return lineas_corregidas, presupuestos_corregidos
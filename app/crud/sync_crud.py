@@ -0,0 +1,95 @@
+# app/crud/sync_crud.py
+"""
+Sincronización incremental de clientes y artículos.
+
+- Los cambios salen de `updated_at` (índice propio en cada tabla).
+- Los borrados quedan en la tabla `borrado`: un listener before_flush añade
+  la marca en el mismo flush que el DELETE, así que no hay borrado sin marca
+  ni marca de un borrado que se deshizo. Los DELETE masivos con SQL directo
+  no dejan marca.
+- Un comercial solo sincroniza sus clientes: si uno pasa a otro comercial,
+  se deja una marca "reasignado" para el anterior (sale de su copia), y las
+  marcas de borrado solo le llegan a quien era el propietario.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple, Type
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, SQLModel, select
+
+from app.models.articulo import Articulo
+from app.models.borrado import MOTIVO_BORRADO, MOTIVO_REASIGNADO, Borrado
+from app.models.client import Client
+
+RECURSO_CLIENT = "client"
+RECURSO_ARTICULO = "articulo"
+
+# Modelo -> (recurso, atributo de la clave primaria, atributo del propietario)
+_RECURSOS = {
+    Client: (RECURSO_CLIENT, "id_cliente", "id_comercial_propietario"),
+    Articulo: (RECURSO_ARTICULO, "id", None),
+}
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _marcar_borrados(session, flush_context, instances) -> None:
+    for obj in list(session.deleted):
+        recurso = _RECURSOS.get(type(obj))
+        if recurso is not None:
+            nombre, pk, propietario = recurso
+            session.add(Borrado(
+                recurso=nombre,
+                id_recurso=str(getattr(obj, pk)),
+                id_propietario=getattr(obj, propietario) if propietario else None,
+            ))
+
+    for obj in list(session.dirty):
+        recurso = _RECURSOS.get(type(obj))
+        if recurso is None or recurso[2] is None:
+            continue
+        nombre, pk, propietario = recurso
+        for anterior in inspect(obj).attrs[propietario].history.deleted:
+            if anterior is not None and anterior != getattr(obj, propietario):
+                session.add(Borrado(
+                    recurso=nombre,
+                    id_recurso=str(getattr(obj, pk)),
+                    motivo=MOTIVO_REASIGNADO,
+                    id_propietario=anterior,
+                ))
+
+
+def get_cambios(
+    session: Session,
+    modelo: Type[SQLModel],
+    desde: datetime,
+    id_propietario: Optional[int] = None,
+) -> Tuple[List[SQLModel], List[str]]:
+    """
+    Filas de `modelo` modificadas desde `desde` y los ids que han dejado de
+    estar desde entonces. Un id que se borró y se ha vuelto a crear (o que
+    volvió a su comercial) solo aparece como cambio.
+
+    Con `id_propietario`, solo las filas de ese comercial, y como borrados
+    las que eran suyas y se borraron o pasaron a otro. Sin él (ADMIN), todas
+    las filas y solo los borrados de verdad.
+    """
+    recurso, pk, propietario = _RECURSOS[modelo]
+    statement = select(modelo).where(modelo.updated_at >= desde)
+    marcas = select(Borrado.id_recurso).where(Borrado.recurso == recurso, Borrado.borrado_en >= desde)
+    if id_propietario is not None and propietario is not None:
+        statement = statement.where(getattr(modelo, propietario) == id_propietario)
+        marcas = marcas.where(Borrado.id_propietario == id_propietario)
+    else:
+        marcas = marcas.where(Borrado.motivo == MOTIVO_BORRADO)
+    cambios = list(session.exec(statement.order_by(modelo.updated_at)).all())
+
+    vivos = {str(getattr(obj, pk)) for obj in cambios}
+    borrados = [
+        id_recurso
+        for id_recurso in session.exec(marcas.distinct()).all()
+        if id_recurso not in vivos
+    ]
+    return cambios, borrados
+
@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 
 from app.models.user import User, UserCreate, UserUpdate
 from app.utils.security import hash_password
+from app.core.pagination import Pagina, paginar
 
 
 def get_user(session: Session, user_id: int) -> Optional[User]:
@@ -21,10 +22,9 @@ def get_user_by_email(*, session: Session, email: str) -> User | None:
     statement = select(User).where(User.email == email)
     return session.exec(statement).first()
 
-def get_users(session: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    """Lista usuarios con paginación simple."""
-    statement = select(User).offset(skip).limit(limit)
-    return session.exec(statement).all()
+def get_users(session: Session, cursor: Optional[str] = None, limit: Optional[int] = None) -> Pagina[User]:
+    """Lista usuarios con paginación por cursor."""
+    return paginar(session, select(User), orden=[User.id_usuario], cursor=cursor, limit=limit)
 
 
 #def create_user(session: Session, user_in: UserCreate) -> User:
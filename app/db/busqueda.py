@@ -0,0 +1,100 @@
+"""
+Índice de búsqueda de texto completo (SQLite FTS5) sobre los clientes.
+
+`client_fts` es una tabla FTS5 de contenido externo: no duplica los datos,
+solo guarda el índice invertido y lee las columnas de `client` por rowid
+(= id_cliente). Tres triggers la mantienen al día en cada INSERT, UPDATE y
+DELETE de `client`, también los que no pasan por el ORM (scripts, importaciones
+masivas).
+
+Se crea junto con las tablas (create_all) y, en BDs anteriores, desde
+sincronizar_esquema(), que además la rellena con los clientes existentes.
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import column, event, table, text
+from sqlmodel import SQLModel
+
+TABLA_FTS_CLIENTES = "client_fts"
+
+# Columnas indexadas y su peso en el ranking (bm25): pesa más coincidir en
+# el nombre o el NIF que en la dirección.
+COLUMNAS_FTS_CLIENTES = {
+    "nombre": 10.0,
+    "nif": 5.0,
+    "correo": 3.0,
+    "telefono": 3.0,
+    "direccion": 1.0,
+    "provincia": 1.0,
+}
+
+# Para usarla en consultas (join por rowid = id_cliente)
+client_fts = table(TABLA_FTS_CLIENTES, column("rowid"))
+
+_COLUMNAS = ", ".join(COLUMNAS_FTS_CLIENTES)
+_NUEVOS = ", ".join(f"new.{c}" for c in COLUMNAS_FTS_CLIENTES)
+_VIEJOS = ", ".join(f"old.{c}" for c in COLUMNAS_FTS_CLIENTES)
+
+_DDL_FTS_CLIENTES = [
+    # remove_diacritics: "cadiz" encuentra "Cádiz"
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS_CLIENTES} USING fts5(
+        {_COLUMNAS},
+        content='client', content_rowid='id_cliente',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS client_fts_ai AFTER INSERT ON client BEGIN
+        INSERT INTO {TABLA_FTS_CLIENTES}(rowid, {_COLUMNAS}) VALUES (new.id_cliente, {_NUEVOS});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS client_fts_ad AFTER DELETE ON client BEGIN
+        INSERT INTO {TABLA_FTS_CLIENTES}({TABLA_FTS_CLIENTES}, rowid, {_COLUMNAS})
+        VALUES ('delete', old.id_cliente, {_VIEJOS});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS client_fts_au AFTER UPDATE ON client BEGIN
+        INSERT INTO {TABLA_FTS_CLIENTES}({TABLA_FTS_CLIENTES}, rowid, {_COLUMNAS})
+        VALUES ('delete', old.id_cliente, {_VIEJOS});
+        INSERT INTO {TABLA_FTS_CLIENTES}(rowid, {_COLUMNAS}) VALUES (new.id_cliente, {_NUEVOS});
+    END""",
+]
+
+
+def crear_fts_clientes(conexion, reconstruir: bool = False) -> None:
+    """Crea (si no existen) la tabla FTS y sus triggers; con `reconstruir`, reindexa todo."""
+    for sentencia in _DDL_FTS_CLIENTES:
+        conexion.exec_driver_sql(sentencia)
+    if reconstruir:
+        conexion.exec_driver_sql(
+            f"INSERT INTO {TABLA_FTS_CLIENTES}({TABLA_FTS_CLIENTES}) VALUES ('rebuild')"
+        )
+
+
+def existe_fts_clientes(conexion) -> bool:
+    return conexion.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"),
+        {"nombre": TABLA_FTS_CLIENTES},
+    ).first() is not None
+
+
+def consulta_fts(texto: str) -> Optional[str]:
+    """
+    Traduce lo que escribe el usuario a una consulta FTS5: cada palabra como
+    prefijo y todas obligatorias ("gar mad" -> "gar"* "mad"*). Los operadores
+    y comillas de FTS5 no se interpretan. None si no queda ninguna palabra.
+    """
+    palabras = re.findall(r"\w+", texto)
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _crear_tras_create_all(metadata, conexion, tables=(), **kw) -> None:
+    if conexion.dialect.name == "sqlite" and any(t.name == "client" for t in tables):
+        crear_fts_clientes(conexion)
+
+
+@event.listens_for(SQLModel.metadata, "before_drop")
+def _borrar_antes_de_drop_all(metadata, conexion, tables=(), **kw) -> None:
+    if conexion.dialect.name == "sqlite" and any(t.name == "client" for t in tables):
+        conexion.exec_driver_sql(f"DROP TABLE IF EXISTS {TABLA_FTS_CLIENTES}")
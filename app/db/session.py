@@ -1,5 +1,9 @@
 import os
+from sqlalchemy import bindparam, inspect, text
 from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel.main import default_registry
+
+from app.db import busqueda  # registra la creación del índice FTS de clientes
 
 # 1. Definición de la ruta a la base de datos
 # Buscamos la carpeta raíz del proyecto (donde estará tu archivo .db)
@@ -18,11 +22,97 @@ engine = create_engine(
     connect_args={"check_same_thread": False} 
 )
 
+# Índices que ya no están en los modelos porque otro más ancho empieza por
+# las mismas columnas (mantener los dos solo encarece las escrituras)
+INDICES_OBSOLETOS = [
+    "ix_presupuesto_estado_fecha",          # -> ix_presupuesto_ventas
+    "ix_presupuestolinea_id_presupuesto",   # -> ix_presupuesto_linea_ventas
+]
+
+# Cuánto espera un worker (ms) a que otro termine de actualizar el esquema
+ESPERA_ESQUEMA_MS = 120_000
+
+
 # 3. Función para crear las tablas
-def create_db_and_tables():
-    """Crea las tablas en el NAS si no existen."""
+def create_db_and_tables(bind=None):
+    """
+    Crea las tablas en el NAS si no existen y pone al día el esquema de una
+    BD existente (sincronizar_esquema). Se ejecuta al arrancar la API.
+
+    Con varios workers arrancan todos a la vez: el trabajo se hace dentro de
+    una transacción EXCLUSIVE, así que uno actualiza y los demás esperan y
+    ya no encuentran nada que hacer.
+    """
     import app.models # Aseguramos que SQLModel vea tus modelos
-    SQLModel.metadata.create_all(engine)
+    bind = bind or engine
+    with bind.connect() as conn:
+        # Transacción a mano: el driver no debe abrir ni cerrar la suya
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql(f"PRAGMA busy_timeout = {ESPERA_ESQUEMA_MS}")
+        conn.exec_driver_sql("BEGIN EXCLUSIVE")
+        try:
+            SQLModel.metadata.create_all(conn)
+            _sincronizar_esquema(conn)
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("COMMIT")
+
+
+def _valor_por_defecto(table, column):
+    """Valor por defecto (Python) del campo del modelo asociado a la columna."""
+    for mapper in default_registry.mappers:
+        if mapper.local_table is table:
+            field = mapper.class_.model_fields.get(column.name)
+            if field is not None and not field.is_required():
+                return field.get_default(call_default_factory=True)
+    return None
+
+
+def sincronizar_esquema(bind=None):
+    """
+    Añade a una BD ya existente las columnas e índices nuevos de los modelos.
+
+    create_all() solo crea tablas que no existen; no toca las que ya están.
+    Aquí comparamos cada tabla con su modelo y hacemos ALTER TABLE ADD COLUMN
+    de lo que falte (rellenando el valor por defecto del modelo) y creamos
+    los índices que no existan (y se borran los de INDICES_OBSOLETOS).
+    También el índice de búsqueda de clientes (FTS5), que se rellena con los
+    clientes ya guardados.
+    """
+    bind = bind or engine
+    with bind.begin() as conn:
+        _sincronizar_esquema(conn)
+
+
+def _sincronizar_esquema(conn) -> None:
+    inspector = inspect(conn)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existentes = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existentes:
+                continue
+            tipo = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {tipo}'))
+
+            valor = _valor_por_defecto(table, column)
+            if valor is not None:
+                # SQL a mano: table.update() añadiría las columnas con
+                # onupdate (updated_at), que quizá aún no existen
+                actualizar = text(f'UPDATE "{table.name}" SET "{column.name}" = :valor')
+                conn.execute(actualizar.bindparams(bindparam("valor", valor, type_=column.type)))
+
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+    for nombre in INDICES_OBSOLETOS:
+        conn.execute(text(f'DROP INDEX IF EXISTS "{nombre}"'))
+
+    if inspector.has_table("client") and not busqueda.existe_fts_clientes(conn):
+        busqueda.crear_fts_clientes(conn, reconstruir=True)
 
 # 4. Función generadora de sesiones
 def get_session():
@@ -4,17 +4,29 @@ from app.api.v1.api import api_router
 
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, select
-from app.db.session import get_session
+from app.db.session import create_db_and_tables, get_session
 from app.models.user import User
 from app.utils.security import hash_password
 from fastapi.staticfiles import StaticFiles
 from app.api.v1.endpoints import notas
+from app.core.pagination import NEXT_CURSOR_HEADER, HAS_MORE_HEADER
+from app.core.http_cache import ETAG_HEADER, LAST_MODIFIED_HEADER
+from app.core.sincronizacion import SYNC_TOKEN_HEADER
+from app.core.compresion import CompresionMiddleware
+from app.core.config import settings
+from app.utils import pdf
 
 
 from app.api.v1.api import api_router 
 
 app = FastAPI(title="Mora Comercial API")
 
+# Tablas nuevas y columnas/índices que falten en una BD existente
+app.add_event_handler("startup", create_db_and_tables)
+
+# El pool de render de PDFs se crea al primer uso; aquí solo se apaga
+app.add_event_handler("shutdown", pdf.cerrar_pool)
+
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 
@@ -32,6 +44,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # El navegador solo deja leer estas cabeceras si se exponen explícitamente
+    expose_headers=[NEXT_CURSOR_HEADER, HAS_MORE_HEADER, ETAG_HEADER, LAST_MODIFIED_HEADER, SYNC_TOKEN_HEADER],
+)
+
+# Brotli/gzip según Accept-Encoding (listados y catálogo son JSON grandes)
+app.add_middleware(
+    CompresionMiddleware,
+    minimo=settings.COMPRESION_MINIMO,
+    cache_bytes=settings.COMPRESION_CACHE_MB * 1024 * 1024,
 )
 
 
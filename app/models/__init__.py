@@ -9,6 +9,8 @@ from .articulo import Articulo, ArticuloCreate, ArticuloRead, ArticuloBase
 from .presupuesto import Presupuesto, PresupuestoCreate, PresupuestoRead, PresupuestoReadWithRelations, PresupuestoBase
 from .presupuesto_linea import PresupuestoLinea, PresupuestoLineaCreate, PresupuestoLineaRead, PresupuestoLineaBase
 from .audit import AuditLog
+from .dashboard import DashboardAgregado, DashboardDiario, EventoDashboard
+from .borrado import Borrado
 
 # Opcional: Si quieres una variable que contenga todos los modelos base (SQLModel)
 # Esto es útil si usas Alembic para migraciones, aunque no es estrictamente necesario 
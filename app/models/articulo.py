@@ -1,6 +1,7 @@
 # app/models/articulo.py
 
 from __future__ import annotations
+from datetime import datetime
 from typing import Optional, List, Dict
 from sqlmodel import SQLModel, Field
 from sqlalchemy import Column, JSON
@@ -11,7 +12,7 @@ class ArticuloBase(SQLModel):
     """
     Campos comunes de Articulo.
     """
-    nombre: str
+    nombre: str = Field(index=True)
     descripcion: str
     categoria: str
     
@@ -49,6 +50,14 @@ class Articulo(ArticuloBase, table=True):
     # definimos id como string y primary key.
     id: str = Field(primary_key=True)
 
+    # Versión de la fila para ETag/Last-Modified y la sincronización
+    # incremental (se actualiza en cada UPDATE)
+    updated_at: datetime = Field(
+        default_factory=datetime.now,
+        index=True,
+        sa_column_kwargs={"onupdate": datetime.now},
+    )
+
 
 class ArticuloCreate(ArticuloBase):
     id: str
@@ -61,6 +70,14 @@ class ArticuloRead(ArticuloBase):
     def make_full_urls(cls, v: List[str]) -> List[str]:
         return v or []
 
+
+class ArticuloSync(SQLModel):
+    """Respuesta de GET /articulos/?updated_since=<token>."""
+    cambios: List[ArticuloRead] = []  # creados o modificados desde el token
+    borrados: List[str] = []          # ids eliminados desde el token
+    token: str                        # para la siguiente sincronización
+
+
 class ArticuloUpdate(SQLModel):
     nombre: Optional[str] = None
     descripcion: Optional[str] = None
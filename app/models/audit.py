@@ -14,7 +14,7 @@ class AuditLogBase(SQLModel):
     actor_email: Optional[str] = Field(default="SYSTEM", nullable=True)
     
     target_email: str
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp: datetime = Field(default_factory=datetime.now, index=True)
     details: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
 
 # 2. CLASE TABLA
@@ -0,0 +1,34 @@
+# app/models/borrado.py
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+MOTIVO_BORRADO = "borrado"
+MOTIVO_REASIGNADO = "reasignado"
+
+
+class Borrado(SQLModel, table=True):
+    """
+    Marca de borrado (tombstone) de un cliente o artículo, para que la
+    sincronización incremental (`?updated_since=`) pueda avisar de lo que ya
+    no existe. Se crea en el mismo flush que el DELETE (ver sync_crud).
+
+    Para los clientes también se marca el cambio de comercial propietario
+    (motivo "reasignado"): para el comercial anterior es como si se hubiera
+    borrado. `id_propietario` es el comercial que lo tenía, para que cada
+    uno reciba solo las marcas de lo que podía ver.
+    """
+    __tablename__ = "borrado"
+    __table_args__ = (
+        Index("ix_borrado_recurso_fecha", "recurso", "borrado_en"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    recurso: str                 # "client" | "articulo"
+    id_recurso: str              # id del borrado (como texto: los de artículo lo son)
+    borrado_en: datetime = Field(default_factory=datetime.now)
+    motivo: str = Field(default=MOTIVO_BORRADO)
+    id_propietario: Optional[int] = None   # None: visible para todos (artículos)
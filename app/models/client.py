@@ -1,5 +1,6 @@
 from typing import List, Optional, TYPE_CHECKING
-from datetime import datetime
+from datetime import date, datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 # Esto evita el error de "importación circular"
@@ -8,7 +9,7 @@ if TYPE_CHECKING:
 
 class ClientBase(SQLModel):
     """Campos comunes del cliente."""
-    nombre: str
+    nombre: str = Field(index=True)
     nif: Optional[str] = None
     correo: Optional[str] = None
     provincia: Optional[str] = None
@@ -18,14 +19,27 @@ class ClientBase(SQLModel):
 
 class Client(ClientBase, table=True):
     """Tabla de clientes."""
+    # Listado de un comercial ordenado por nombre (keyset sobre el índice)
+    __table_args__ = (
+        Index("ix_client_comercial_nombre", "id_comercial_propietario", "nombre"),
+    )
+
     # Usamos id_cliente como Primary Key
     id_cliente: Optional[int] = Field(default=None, primary_key=True)
 
     # Comercial propietario (FK a la tabla 'user', columna 'id_usuario')
     id_comercial_propietario: int = Field(foreign_key="user.id_usuario")
 
-    # Fecha de registro automática
-    fecha_registro: datetime = Field(default_factory=datetime.now)
+    # Fecha de registro automática (indexada: nuevos clientes del mes)
+    fecha_registro: datetime = Field(default_factory=datetime.now, index=True)
+
+    # Versión de la fila para ETag/Last-Modified y la sincronización
+    # incremental (se actualiza en cada UPDATE)
+    updated_at: datetime = Field(
+        default_factory=datetime.now,
+        index=True,
+        sa_column_kwargs={"onupdate": datetime.now},
+    )
 
     # --- ⚠️ ESTO ES LO QUE FALTABA ---
     # Relación inversa: Un Cliente tiene muchos Presupuestos.
@@ -47,6 +61,46 @@ class ClientRead(ClientBase):
     fecha_registro: datetime
 
 
+class ClientResumen(SQLModel):
+    """Actividad del cliente para el directorio (se pide con ?con_resumen=true)."""
+    num_presupuestos: int = 0
+    total_aprobado: float = 0.0
+    ultimo_presupuesto: Optional[date] = None
+    num_notas: int = 0
+
+
+class ClientReadConResumen(ClientRead):
+    """Cliente del listado, con su resumen de actividad si se ha pedido."""
+    resumen: Optional[ClientResumen] = None
+
+
+class ClientImportError(SQLModel):
+    """Fila del CSV que no se ha podido importar."""
+    fila: int                   # nº de línea en el fichero (la cabecera es la 1)
+    detalle: str
+
+
+class ClientImportResultado(SQLModel):
+    """Resultado de POST /clientes/import."""
+    creados: int = 0
+    duplicados: int = 0         # ya existían (mismo nombre o NIF) o repetidos en el fichero
+    invalidos: int = 0
+    errores: List[ClientImportError] = []  # detalle de los inválidos (los primeros)
+
+
+class ClientSync(SQLModel):
+    """Respuesta de GET /clientes/?updated_since=<token>."""
+    cambios: List[ClientRead] = []   # creados o modificados desde el token
+    borrados: List[int] = []         # ids eliminados desde el token
+    token: str                       # para la siguiente sincronización
+
+
+class ClientSugerencia(SQLModel):
+    """Sugerencia del autocompletado de clientes."""
+    id_cliente: int
+    nombre: str
+
+
 class ClientUpdate(SQLModel):
     """Esquema para actualizar cliente (todo opcional)."""
     nombre: Optional[str] = None
@@ -0,0 +1,61 @@
+# app/models/dashboard.py
+
+from datetime import date, datetime
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+
+class DashboardAgregado(SQLModel, table=True):
+    """
+    Contadores del dashboard mantenidos de forma incremental (clave -> valor).
+
+    Claves:
+    - "presupuestos:<ESTADO>"   -> nº de presupuestos en ese estado
+    - "ventas:<AAAA-MM>"        -> suma de `total` de los APROBADOS de ese mes
+    - "clientes"                -> nº de clientes
+    - "_inicializado"           -> marca de que la tabla se ha reconstruido alguna vez
+
+    Se actualiza en la misma transacción que el alta/edición/borrado de
+    presupuestos y clientes (ver app/crud/dashboard_crud.py).
+    """
+    __tablename__ = "dashboard_agregado"
+
+    clave: str = Field(primary_key=True)
+    valor: float = Field(default=0.0)
+
+
+class DashboardDiario(SQLModel, table=True):
+    """
+    Bucket diario de presupuestos: por fecha de presupuesto, estado y
+    comercial creador, cuántos hay y la suma de su importe bruto y neto.
+
+    Permite sacar las cifras de cualquier periodo (un trimestre, los últimos
+    90 días...) sumando como mucho unos cientos de filas, en lugar de
+    recorrer los presupuestos. Se mantiene igual que DashboardAgregado.
+    """
+    __tablename__ = "dashboard_diario"
+
+    fecha: date = Field(primary_key=True)
+    estado: str = Field(primary_key=True)
+    id_comercial: int = Field(primary_key=True)
+    num: int = Field(default=0)
+    bruto: float = Field(default=0.0)
+    neto: float = Field(default=0.0)
+
+
+class EventoDashboard(SQLModel, table=True):
+    """
+    Evento en vivo del dashboard (JSON ya serializado), para que lo lean los
+    WebSocket de todos los workers (ver app/core/eventos.py). Se escribe en
+    la misma transacción que el cambio; si se deshace, no queda. Solo se
+    guardan los últimos DASHBOARD_EVENTOS_RETENIDOS.
+    """
+    __tablename__ = "evento_dashboard"
+    # AUTOINCREMENT: los ids no se reutilizan aunque se borren los antiguos
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    id_propietario: Optional[int] = None   # comercial; solo lo ven él y los ADMIN
+    mensaje: str
+    creado_en: datetime = Field(default_factory=datetime.now)
@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING, Optional, List
-from datetime import date
+from datetime import date, datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 # ⚠️ OJO: Si obtienes un error de "ImportError: cannot import name..."
@@ -8,6 +9,8 @@ from .presupuesto_linea import (
     PresupuestoLinea,
     PresupuestoLineaCreate,
     PresupuestoLineaRead,
+    PresupuestoLineaUpsert,
+    CambiosLineas,
 )
 
 if TYPE_CHECKING:
@@ -57,8 +60,36 @@ class PresupuestoBase(SQLModel):
 # 2. ENTIDAD DE BD (Hereda de Base, añade ID y Relaciones)
 class Presupuesto(PresupuestoBase, table=True):
     """Entidad de BD: cabecera de presupuesto."""
+    # Índices compuestos para los filtros/ordenaciones del listado
+    # (en SQLite cada índice incluye además el id como desempate).
+    __table_args__ = (
+        Index("ix_presupuesto_cliente_fecha", "id_cliente", "fecha_presupuesto"),
+        Index("ix_presupuesto_comercial_fecha", "id_comercial_creador", "fecha_presupuesto"),
+        Index("ix_presupuesto_comercial_total", "id_comercial_creador", "total"),
+        Index("ix_presupuesto_fecha", "fecha_presupuesto"),
+        Index("ix_presupuesto_total", "total"),
+        # Filtro por estado + rango de fechas del listado, y cubre las series
+        # de ventas (desgloses por comercial/cliente) sin leer la tabla
+        Index(
+            "ix_presupuesto_ventas",
+            "estado", "fecha_presupuesto", "id_comercial_creador", "id_cliente", "total",
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
+    # --- TOTALES PERSISTIDOS ---
+    # Se calculan al crear/actualizar (ver presupuesto_crud) y `total` guarda el neto.
+    total_bruto: float = Field(default=0.0)
+    total_descuento: float = Field(default=0.0)
+
+    # Versión de la fila para ETag/Last-Modified (se actualiza en cada UPDATE;
+    # los cambios de líneas la tocan explícitamente, ver presupuesto_crud)
+    updated_at: datetime = Field(
+        default_factory=datetime.now,
+        sa_column_kwargs={"onupdate": datetime.now},
+    )
+
     # --- RELACIONES ---
     
     # Relación con Cliente
@@ -68,7 +99,10 @@ class Presupuesto(PresupuestoBase, table=True):
     # CORRECCIÓN AQUÍ: Añadido 'delete-orphan' para limpieza total
     lineas: List["PresupuestoLinea"] = Relationship(
         back_populates="presupuesto", 
-        sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+        sa_relationship_kwargs={
+            "cascade": "all, delete-orphan",
+            "order_by": "PresupuestoLinea.id",
+        }
     )
 
 
@@ -86,11 +120,34 @@ class PresupuestoRead(PresupuestoBase):
 class PresupuestoReadWithRelations(PresupuestoRead):
     cliente: Optional["Client"] = None
 
+class PresupuestoFiltros(SQLModel):
+    """Filtros del listado de presupuestos (todos opcionales)."""
+    estado: Optional[str] = None
+    id_cliente: Optional[int] = None
+    id_comercial_creador: Optional[int] = None
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    total_min: Optional[float] = None
+    total_max: Optional[float] = None
+
+
 class PresupuestoCompletoCreate(PresupuestoCreate):
     # Para crear presupuesto + líneas de golpe
     lineas: List[PresupuestoLineaCreate]
 
 
+class PresupuestoBulkError(SQLModel):
+    """Presupuesto de una importación masiva que no se pudo crear."""
+    indice: int
+    detalle: str
+
+
+class PresupuestoBulkResultado(SQLModel):
+    """Resultado de POST /presupuestos/bulk."""
+    creados: List[int] = []
+    errores: List[PresupuestoBulkError] = []
+
+
 class PresupuestoUpdate(SQLModel):
     """Todos los campos opcionales para PATCH."""
     numero_presupuesto: Optional[str] = None
@@ -114,16 +171,37 @@ class PresupuestoUpdate(SQLModel):
     id_comercial_creador: Optional[int] = None
     id_admin_revisor: Optional[int] = None
 
-    # Uso comillas en la lista para evitar problemas si el import falla, 
-    # aunque Pydantic prefiere el tipo real si es posible.
-    lineas: Optional[List[PresupuestoLineaCreate]] = None
+    # Si viene, es la lista completa de líneas: las que traen `id` se
+    # actualizan, las que no lo traen se crean y las que falten se borran.
+    lineas: Optional[List[PresupuestoLineaUpsert]] = None
+
+
+class PresupuestoResumen(SQLModel):
+    """
+    Fila compacta para tablas de listado: cabecera, totales guardados,
+    número de líneas y nombre del cliente (sin las líneas).
+    """
+    id: int
+    numero_presupuesto: Optional[str] = None
+    fecha_presupuesto: date
+    estado: str
+    id_cliente: int
+    cliente_nombre: Optional[str] = None
+    id_comercial_creador: int
+    total_bruto: float = 0.0
+    total_descuento: float = 0.0
+    total: float = 0.0
+    num_lineas: int = 0
 
 
 class PresupuestoCompletoRead(PresupuestoRead):
     """Para leer el presupuesto con todas sus líneas."""
     lineas: List[PresupuestoLineaRead] = []
 
-    # Campos calculados
+    # Totales (persistidos en la cabecera)
     total_bruto: float = 0.0
     total_descuento: float = 0.0
-    total_neto: float = 0.0
\ No newline at end of file
+    total_neto: float = 0.0
+
+    # Solo en la respuesta de una actualización que incluya líneas
+    cambios_lineas: Optional[CambiosLineas] = None
\ No newline at end of file
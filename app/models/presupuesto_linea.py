@@ -1,4 +1,5 @@
-from typing import Optional, TYPE_CHECKING
+from typing import List, Optional, TYPE_CHECKING
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 if TYPE_CHECKING:
@@ -12,11 +13,19 @@ class PresupuestoLineaBase(SQLModel):
     precio_unitario: float = Field(default=0.0)
     descuento: float = Field(default=0.0)
     
-    # Opcional: totales calculados (a veces conviene guardarlos, a veces no)
+    # Importe neto de la línea (cantidad * precio - descuento).
+    # Se calcula y guarda en el CRUD; lo que llegue en el body se ignora.
     total_linea: float = Field(default=0.0)
 
 # 2. TABLA: Definición de BD
 class PresupuestoLinea(PresupuestoLineaBase, table=True):
+    # Líneas de un presupuesto (empieza por id_presupuesto, así que sirve
+    # también para la FK) y cubre la serie de ventas por familia y el ranking
+    # de artículos más vendidos sin leer la tabla
+    __table_args__ = (
+        Index("ix_presupuesto_linea_ventas", "id_presupuesto", "id_articulo", "total_linea", "cantidad"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     id_presupuesto: int = Field(foreign_key="presupuesto.id")
     # Relación inversa (necesaria para que funcione el cascade delete y la lectura completa)
@@ -30,6 +39,20 @@ class PresupuestoLineaRead(PresupuestoLineaBase):
     id: int
     id_presupuesto: int
 
+class PresupuestoLineaUpsert(PresupuestoLineaBase):
+    """
+    Línea enviada al actualizar un presupuesto.
+    Con `id` de una línea existente se actualiza; sin `id` se crea nueva.
+    """
+    id: Optional[int] = None
+
+class CambiosLineas(SQLModel):
+    """Resumen de lo que cambió en las líneas al actualizar un presupuesto."""
+    insertadas: List[int] = []
+    actualizadas: List[int] = []
+    eliminadas: List[int] = []
+    sin_cambios: int = 0
+
 class PresupuestoLineaUpdate(SQLModel):
     id_articulo: Optional[str] = None
     descripcion: Optional[str] = None
@@ -42,5 +65,7 @@ __all__ = [
     "PresupuestoLinea",
     "PresupuestoLineaCreate",
     "PresupuestoLineaRead",
+    "PresupuestoLineaUpsert",
+    "CambiosLineas",
     "PresupuestoLineaUpdate",
 ]
\ No newline at end of file
@@ -1,11 +1,21 @@
+from datetime import date
+from typing import List, Optional
 from sqlmodel import SQLModel
 
+
+class ArticuloVendido(SQLModel):
+    """Una posición del ranking de artículos más vendidos."""
+    id_articulo: str
+    nombre: Optional[str] = None
+    cantidad: float              # unidades en presupuestos aprobados
+
+
 class DashboardStats(SQLModel):
     # --- Tarjetas Superiores ---
     ventas_mensuales: float = 0.0  # FALTABA ESTE: Para mostrar "€24,500"
     total_presupuestos_activos: int = 0
     nuevos_clientes_mes: int = 0
-    articulos_mas_vendidos: int = 0
+    articulos_mas_vendidos: List[ArticuloVendido] = []  # Ranking del mes (aprobados)
 
     # --- Desglose (opcional para gráficas o detalles internos) ---
     total_clientes: int
@@ -13,4 +23,16 @@ class DashboardStats(SQLModel):
     presupuestos_aprobados: int   # APROBADO
     presupuestos_denegados: int   # DENEGADO
     presupuestos_borrador: int    # Extra: útil para saber cuánto trabajo hay en curso
-    
\ No newline at end of file
+
+    # --- Solo con date_from/date_to: las cifras de arriba son del periodo ---
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    ventas_brutas: Optional[float] = None  # Bruto (sin descuentos) de los APROBADOS del periodo
+    
+
+class PuntoSerieVentas(SQLModel):
+    """Un punto de la serie de ventas aprobadas."""
+    periodo: str                 # "2025-03-14" (día), "2025-03-10" (lunes de la semana) o "2025-03" (mes)
+    grupo: Optional[str] = None  # comercial / provincia / familia, si se pide desglose
+    ventas: float                # suma de importes netos aprobados
+    presupuestos: int            # nº de presupuestos aprobados que aportan al punto
@@ -1,8 +1,6 @@
 from sqlmodel import SQLModel
 from typing import Optional
 from datetime import date
-from app.models.presupuesto import Presupuesto
-from app.models.client import Client
 
 # 1. Definimos qué parte del Cliente queremos ver (para no enviar contraseñas o datos internos)
 class ClientRead(SQLModel):
@@ -11,7 +9,14 @@ class ClientRead(SQLModel):
     provincia: Optional[str] = None
     # Añade aquí otros campos si los necesitas en la tabla
 
-# 2. Definimos el Presupuesto "completo" (con el cliente incrustado)
-class PresupuestoConCliente(Presupuesto):
+# 2. Definimos el Presupuesto "resumido" (con el cliente incrustado) para el historial
+# del dashboard. No hereda de la tabla Presupuesto: solo lleva las columnas del feed.
+class PresupuestoConCliente(SQLModel):
+    id: int
+    numero_presupuesto: Optional[str] = None
+    fecha_presupuesto: date
+    estado: str
+    total: float
+    id_comercial_creador: int
     # Esta es la clave: añadimos un campo 'cliente' que usa el esquema de arriba
-    cliente: Optional[ClientRead] = None
\ No newline at end of file
+    cliente: Optional[ClientRead] = None
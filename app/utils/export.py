@@ -0,0 +1,49 @@
+# app/utils/export.py
+"""
+Serialización en streaming de filas a CSV o NDJSON.
+
+Cada lote de filas se convierte en un único trozo de texto; el primero
+(con la cabecera, en CSV) sale antes de leer el segundo lote, así que el
+cliente empieza a recibir datos enseguida y la memoria solo depende del
+tamaño de lote.
+"""
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List, Sequence
+
+from app.core.pagination import json_default
+
+FORMATOS_EXPORT = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def lotes_a_csv(columnas: List[str], lotes: Iterable[Sequence[Sequence]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas)
+    yield buffer.getvalue()
+
+    for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(lote)
+        yield buffer.getvalue()
+
+
+def lotes_a_ndjson(columnas: List[str], lotes: Iterable[Sequence[Sequence]]) -> Iterator[str]:
+    for lote in lotes:
+        yield "".join(
+            json.dumps(dict(zip(columnas, fila)), default=json_default, ensure_ascii=False) + "\n"
+            for fila in lote
+        )
+
+
+def serializar(formato: str, columnas: List[str], lotes: Iterable[Sequence[Sequence]]) -> Iterator[str]:
+    """Generador de trozos de texto en el `formato` pedido (csv | ndjson)."""
+    if formato == "csv":
+        return lotes_a_csv(columnas, lotes)
+    return lotes_a_ndjson(columnas, lotes)
@@ -0,0 +1,371 @@
+# app/utils/pdf.py
+"""
+Generación de PDFs de presupuestos en el servidor.
+
+- El render (reportlab) se hace en un pool de procesos, para que el trabajo
+  de CPU no bloquee los workers de la API.
+- Cada PDF se guarda en disco con nombre `presupuesto_<id>_<version>.pdf`,
+  donde la versión es un hash del contenido que se imprime. Si el presupuesto
+  (o su cliente) cambia, cambia la versión y el PDF viejo deja de usarse;
+  si no cambia, la descarga es solo enviar el fichero.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+from app.core.config import settings
+
+# Súbelo si cambia el diseño del PDF: invalida todos los PDFs en caché
+PLANTILLA_VERSION = 1
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+logger = logging.getLogger(__name__)
+
+# Fichero del ZIP con los presupuestos que no se han podido generar
+NOMBRE_ERRORES_ZIP = "ERRORES.txt"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Renders en curso por ruta, para no renderizar dos veces el mismo PDF
+_en_curso: Dict[Path, Future] = {}
+_en_curso_lock = threading.Lock()
+
+
+# ============================
+#    DATOS Y VERSIÓN
+# ============================
+
+def preparar_datos(presupuesto, cliente=None) -> dict:
+    """
+    Reduce el presupuesto (PresupuestoCompletoRead) y su cliente a un dict
+    JSON plano: es lo que viaja al proceso de render y lo que se hashea.
+    """
+    datos = presupuesto.model_dump(mode="json", exclude={"cambios_lineas"})
+    datos["cliente"] = (
+        cliente.model_dump(mode="json", include={"nombre", "nif", "correo", "telefono", "direccion", "provincia"})
+        if cliente is not None
+        else None
+    )
+    return datos
+
+
+def version_contenido(datos: dict) -> str:
+    """Hash corto del contenido del PDF (y de la versión de la plantilla)."""
+    contenido = json.dumps([PLANTILLA_VERSION, datos], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:16]
+
+
+def _directorio_cache() -> Path:
+    directorio = Path(settings.PDF_CACHE_DIR)
+    if not directorio.is_absolute():
+        directorio = BASE_DIR / directorio
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def ruta_cache(presupuesto_id: int, version: str) -> Path:
+    return _directorio_cache() / f"presupuesto_{presupuesto_id}_{version}.pdf"
+
+
+def _borrar_versiones_antiguas(presupuesto_id: int, vigente: Path) -> None:
+    for ruta in _directorio_cache().glob(f"presupuesto_{presupuesto_id}_*.pdf"):
+        if ruta != vigente:
+            ruta.unlink(missing_ok=True)
+
+
+# ============================
+#    RENDER (PROCESO HIJO)
+# ============================
+
+def _texto(valor) -> str:
+    """Valor como texto para un Paragraph: los datos nunca se interpretan como marcado."""
+    return escape(str(valor)) if valor is not None else ""
+
+
+def _importe(valor) -> str:
+    return f"{valor or 0:,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def renderizar_pdf(datos: dict, destino: str) -> str:
+    """
+    Dibuja el PDF del presupuesto en `destino`.
+
+    Se ejecuta en el pool de procesos, así que solo recibe datos planos.
+    Escribe primero en un temporal y lo renombra, para que nunca se sirva
+    un PDF a medio escribir.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    estilos = getSampleStyleSheet()
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    doc = SimpleDocTemplate(
+        temporal,
+        pagesize=A4,
+        leftMargin=1.5 * cm,
+        rightMargin=1.5 * cm,
+        topMargin=1.5 * cm,
+        bottomMargin=1.5 * cm,
+        title=f"Presupuesto {datos.get('numero_presupuesto') or datos['id']}",
+    )
+    historia = []
+
+    # --- Cabecera ---
+    historia.append(Paragraph(
+        f"Presupuesto {_texto(datos.get('numero_presupuesto') or datos['id'])}", estilos["Title"]
+    ))
+    historia.append(Paragraph(f"Fecha: {_texto(datos.get('fecha_presupuesto'))}", estilos["Normal"]))
+    historia.append(Paragraph(f"Estado: {_texto(datos.get('estado'))}", estilos["Normal"]))
+    historia.append(Spacer(1, 0.4 * cm))
+
+    cliente = datos.get("cliente") or {}
+    filas_cliente = [
+        ("Cliente", cliente.get("nombre")),
+        ("NIF", cliente.get("nif")),
+        ("Dirección", cliente.get("direccion")),
+        ("Provincia", cliente.get("provincia")),
+        ("Lugar de suministro", datos.get("lugar_suministro")),
+        ("Persona de contacto", datos.get("persona_contacto")),
+    ]
+    for etiqueta, valor in filas_cliente:
+        if valor:
+            historia.append(Paragraph(f"<b>{etiqueta}:</b> {_texto(valor)}", estilos["Normal"]))
+    historia.append(Spacer(1, 0.5 * cm))
+
+    # --- Líneas ---
+    tabla = [["Artículo", "Descripción", "Cantidad", "Precio", "Dto. %", "Importe"]]
+    for linea in datos.get("lineas", []):
+        tabla.append([
+            linea.get("id_articulo", ""),
+            Paragraph(_texto(linea.get("descripcion")), estilos["BodyText"]),
+            f"{linea.get('cantidad') or 0:g}",
+            _importe(linea.get("precio_unitario")),
+            f"{linea.get('descuento') or 0:g}",
+            _importe(linea.get("total_linea")),
+        ])
+    tabla_lineas = Table(
+        tabla,
+        colWidths=[2.6 * cm, 6.4 * cm, 2 * cm, 2.4 * cm, 1.6 * cm, 2.6 * cm],
+        repeatRows=1,
+    )
+    tabla_lineas.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#7f1d1d")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+    historia.append(tabla_lineas)
+    historia.append(Spacer(1, 0.4 * cm))
+
+    # --- Totales ---
+    tabla_totales = Table(
+        [
+            ["Total bruto", _importe(datos.get("total_bruto"))],
+            ["Descuento", _importe(datos.get("total_descuento"))],
+            ["Total neto", _importe(datos.get("total_neto"))],
+        ],
+        colWidths=[4 * cm, 3 * cm],
+        hAlign="RIGHT",
+    )
+    tabla_totales.setStyle(TableStyle([
+        ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+        ("FONTNAME", (0, 2), (-1, 2), "Helvetica-Bold"),
+        ("LINEABOVE", (0, 2), (-1, 2), 0.5, colors.black),
+    ]))
+    historia.append(tabla_totales)
+    historia.append(Spacer(1, 0.6 * cm))
+
+    # --- Condiciones ---
+    condiciones = [
+        ("Forma de pago", datos.get("forma_pago")),
+        ("Validez", f"{datos['validez_dias']} días" if datos.get("validez_dias") else None),
+        ("Precio palet", _importe(datos.get("precio_palet")) if datos.get("precio_palet") else None),
+        ("Camión", datos.get("condiciones_camion")),
+        ("Descarga", datos.get("condiciones_descarga")),
+        ("Impuestos", datos.get("condiciones_impuestos")),
+        ("Observaciones", datos.get("observaciones")),
+    ]
+    for etiqueta, valor in condiciones:
+        if valor:
+            historia.append(Paragraph(f"<b>{etiqueta}:</b> {_texto(valor)}", estilos["Normal"]))
+
+    doc.build(historia)
+    os.replace(temporal, destino)
+    return destino
+
+
+# ============================
+#    POOL Y CACHÉ
+# ============================
+
+_METODO_INICIO = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Sin fork: el pool se crea desde un hilo de un proceso con más
+            # hilos, y un hijo "forkeado" heredaría locks cogidos (logging,
+            # SQLite, cachés) y podría quedarse bloqueado para siempre
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_WORKERS,
+                mp_context=multiprocessing.get_context(_METODO_INICIO),
+            )
+        return _pool
+
+
+def cerrar_pool() -> None:
+    """Apaga el pool de procesos (al parar la aplicación)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def enviar_render(datos: dict) -> "Future[Path]":
+    """
+    Devuelve un Future con la ruta del PDF del presupuesto.
+
+    Si ya está en caché el Future sale resuelto; si no, se encarga el render
+    al pool de procesos (una sola vez aunque lo pidan varias peticiones a la
+    vez) y, al terminar, se borran las versiones antiguas de ese presupuesto.
+    """
+    presupuesto_id = datos["id"]
+    ruta = ruta_cache(presupuesto_id, version_contenido(datos))
+
+    if ruta.exists():
+        hecho: Future = Future()
+        hecho.set_result(ruta)
+        return hecho
+
+    with _en_curso_lock:
+        futuro = _en_curso.get(ruta)
+        if futuro is not None:
+            return futuro
+
+        resultado: Future = Future()
+        _en_curso[ruta] = resultado
+
+    def _terminado(render: Future) -> None:
+        with _en_curso_lock:
+            _en_curso.pop(ruta, None)
+        error = render.exception()
+        if error is not None:
+            resultado.set_exception(error)
+            return
+        _borrar_versiones_antiguas(presupuesto_id, ruta)
+        resultado.set_result(ruta)
+
+    _get_pool().submit(renderizar_pdf, datos, str(ruta)).add_done_callback(_terminado)
+    return resultado
+
+
+async def obtener_pdf(datos: dict) -> Path:
+    """Versión async de enviar_render: espera sin ocupar el event loop."""
+    return await asyncio.wrap_future(enviar_render(datos))
+
+
+# ============================
+#    ZIP EN STREAMING
+# ============================
+
+class _BufferZip:
+    """
+    Destino de escritura del ZipFile que solo acumula bytes hasta que el
+    generador los recoge. No implementa seek/tell, así que zipfile escribe en
+    modo streaming (descriptores de datos tras cada fichero).
+    """
+
+    def __init__(self) -> None:
+        self._trozos: List[bytes] = []
+
+    def write(self, datos: bytes) -> int:
+        self._trozos.append(bytes(datos))
+        return len(datos)
+
+    def flush(self) -> None:
+        pass
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._trozos)
+        self._trozos.clear()
+        return datos
+
+
+def nombre_en_zip(datos: dict) -> str:
+    """Nombre del PDF dentro del ZIP: id + número de presupuesto (saneado)."""
+    numero = re.sub(r"[^\w.-]+", "_", datos.get("numero_presupuesto") or "").strip("_")
+    return f"{datos['id']}_{numero}.pdf" if numero else f"presupuesto_{datos['id']}.pdf"
+
+
+def zip_en_streaming(presupuestos: Iterable[dict], en_vuelo: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Genera un ZIP con el PDF de cada presupuesto (datos de preparar_datos)
+    a medida que se van renderizando.
+
+    Se mantienen como mucho `en_vuelo` renders encargados al pool a la vez
+    (por defecto el doble de workers) y los PDFs se escriben en el ZIP en el
+    orden de entrada, copiándolos desde la caché en bloques. Así la memoria
+    no depende del número de presupuestos; los que ya estaban en caché no se
+    vuelven a renderizar.
+
+    Las cabeceras ya se han enviado cuando se renderiza cada PDF, así que un
+    fallo no puede convertirse en un error HTTP: ese PDF se omite, se anota
+    en ERRORES.txt (al final del ZIP) y el ZIP se cierra igualmente.
+    """
+    en_vuelo = en_vuelo or settings.PDF_WORKERS * 2
+    buffer = _BufferZip()
+    pendientes: deque = deque()
+    errores: List[str] = []
+
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+
+        def _escribir_siguiente() -> bytes:
+            nombre, futuro = pendientes.popleft()
+            try:
+                # Se abre antes de escribir nada en el ZIP: si entretanto una
+                # edición ha generado otra versión y borrado esta, falla aquí.
+                # Ya abierto, aunque se borre se puede seguir leyendo.
+                origen = open(futuro.result(), "rb")
+            except Exception as error:
+                logger.exception("No se ha podido generar %s para el ZIP", nombre)
+                errores.append(f"{nombre}: {type(error).__name__}: {error}")
+                return buffer.vaciar()
+            with origen, zf.open(nombre, mode="w") as destino:
+                shutil.copyfileobj(origen, destino, 64 * 1024)
+            return buffer.vaciar()
+
+        for datos in presupuestos:
+            pendientes.append((nombre_en_zip(datos), enviar_render(datos)))
+            if len(pendientes) >= en_vuelo:
+                yield _escribir_siguiente()
+
+        while pendientes:
+            yield _escribir_siguiente()
+
+        if errores:
+            zf.writestr(NOMBRE_ERRORES_ZIP, "\n".join(errores) + "\n")
+
+    # Directorio central del ZIP
+    yield buffer.vaciar()
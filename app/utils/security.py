@@ -79,18 +79,22 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    user = usuario_desde_token(db, token)
+    if user is None:
+        raise credentials_exception
+        
+    return user
+
+
+def usuario_desde_token(db: Session, token: str) -> Optional[User]:
+    """Usuario del token JWT, o None si no es válido (para WebSockets, sin cabeceras)."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         token_sub: str = payload.get("sub")
         if token_sub is None:
-            raise credentials_exception
+            return None
     except JWTError:
-        raise credentials_exception
-    
+        return None
+
     # Buscamos al usuario por ID
-    user = db.query(User).filter(User.id_usuario == token_sub).first()
-    
-    if user is None:
-        raise credentials_exception
-        
-    return user
\ No newline at end of file
+    return db.query(User).filter(User.id_usuario == token_sub).first()
\ No newline at end of file
@@ -62,6 +62,7 @@ const Quotes = () => {
         const data = await response.json();
         setSelectedClientId(data.id_cliente);
         const itemsFormateados = data.lineas.map(linea => ({
+          id_linea: linea.id, // se reenvía al guardar: el servidor solo actualiza lo que cambia
           id_articulo: linea.id_articulo,
           nombre: linea.descripcion,
           descripcion: linea.descripcion,
@@ -128,6 +129,7 @@ const Quotes = () => {
           fecha_validez: new Date(Date.now() + 15 * 24 * 60 * 60 * 1000).toISOString().split('T')[0],
           total: total, 
           lineas: items.map(item => ({
+            id: item.id_linea,
             id_articulo: item.id_articulo || item.id,
             cantidad: parseInt(item.cantidad),
             precio_unitario: parseFloat(item.precio),
@@ -0,0 +1,34 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Configuración de rutas
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from sqlmodel import Session
+from app.db.session import engine, create_db_and_tables
+from app.crud import dashboard_crud, presupuesto_crud
+
+
+def recalcular(tamano_lote: int):
+    print("🧮 Recalculando totales de presupuestos...")
+
+    # Asegura que la BD tenga las columnas de totales (BDs antiguas)
+    create_db_and_tables()
+
+    with Session(engine) as session:
+        lineas, presupuestos = presupuesto_crud.recalcular_totales(session, tamano_lote=tamano_lote)
+        # Los UPDATE masivos no pasan por el ORM: las ventas del dashboard se recalculan aparte
+        if presupuestos:
+            dashboard_crud.reconstruir_agregados(session)
+
+    print(f"✅ Líneas corregidas: {lineas}")
+    print(f"✅ Presupuestos corregidos: {presupuestos}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula y repara los totales guardados de los presupuestos.")
+    parser.add_argument("--lote", type=int, default=1000, help="Presupuestos por lote (por defecto 1000)")
+    args = parser.parse_args()
+    recalcular(args.lote)
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+# Configuración de rutas
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from sqlmodel import Session
+from app.db.session import engine, create_db_and_tables
+from app.crud import dashboard_crud
+
+
+def reconstruir():
+    print("📊 Reconstruyendo los agregados y buckets diarios del dashboard...")
+
+    # Asegura que exista la tabla de agregados (BDs antiguas)
+    create_db_and_tables()
+
+    with Session(engine) as session:
+        valores = dashboard_crud.reconstruir_agregados(session)
+
+    for clave in sorted(valores):
+        if clave not in (dashboard_crud.CLAVE_INICIALIZADO, dashboard_crud.CLAVE_DIARIO_INICIALIZADO):
+            print(f"   {clave}: {valores[clave]:g}")
+    print("✅ Agregados reconstruidos")
+
+
+if __name__ == "__main__":
+    reconstruir()
@@ -1,6 +1,5 @@
 import sys
 import os
-import csv
 from pathlib import Path
 
 # Configuración de rutas
@@ -8,11 +7,12 @@ ROOT_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(ROOT_DIR))
 
 # Importaciones
-from sqlmodel import Session, SQLModel, select
-from app.db.session import engine
+from sqlmodel import Session, select
+from app.db.session import create_db_and_tables, engine
 from app.models.user import User
 from app.models.client import Client
 from app.models.nota import Nota
+from app.crud import import_crud
 from app.utils.security import get_password_hash 
 
 # Ruta del CSV de clientes
@@ -22,7 +22,7 @@ def inicializar_sistema():
     print("🚀 INICIANDO RESET DEL SISTEMA (Modo Local)...")
     
     # 1. BORRÓN Y CUENTA NUEVA (Crea tablas)
-    SQLModel.metadata.create_all(engine)
+    create_db_and_tables()
     print("✅ Tablas de base de datos listas.")
 
     with Session(engine) as session:
@@ -57,41 +57,16 @@ def inicializar_sistema():
             admin = session.exec(select(User).where(User.email == "informatica@ceramicasmora.com")).first()
             
             if admin:
-                with open(ARCHIVO_CLIENTES, mode='r', encoding='utf-8-sig') as f:
-                    # Detecta automáticamente si usa ; o ,
-                    sample = f.read(1024)
-                    f.seek(0)
-                    dialect = csv.Sniffer().sniff(sample)
-                    
-                    reader = csv.DictReader(f, dialect=dialect)
-                    
-                    # Normalizamos cabeceras a minúsculas y sin espacios
-                    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+                # Mismo importador que POST /clientes/import: lectura en
+                # streaming, duplicados por nombre/NIF en memoria e
+                # inserción por lotes en una transacción
+                with open(ARCHIVO_CLIENTES, mode='r', encoding='utf-8-sig', newline='') as f:
+                    resultado = import_crud.importar_clients(session, f, id_comercial=admin.id_usuario)
 
-                    # --- 🕵️‍♂️ NUEVO: CHIVATO DE COLUMNAS ---
-                    print(f"\n🔍 DEBUG: Las columnas detectadas en el CSV son: {reader.fieldnames}")
-                    if 'provincia' not in reader.fieldnames:
-                        print("⚠️ ¡ALERTA! No encuentro la columna 'provincia'. Revisa el nombre en el Excel.")
-                    # -------------------------------------
-
-                    count = 0
-                    for row in reader:
-                        if not row.get('nombre'): continue
-                        # Evita duplicados
-                        if not session.exec(select(Client).where(Client.nombre == row['nombre'])).first():
-                            cli = Client(
-                                nombre=row.get('nombre'),
-                                nif=row.get('nif', ''),
-                                correo=row.get('correo', ''),
-                                telefono=row.get('telefono', ''),
-                                direccion=row.get('direccion', ''),
-                                provincia=row.get('provincia', ''),
-                                id_comercial_propietario=admin.id_usuario
-                            )
-                            session.add(cli)
-                            count += 1
-                session.commit()
-                print(f"✅ {count} clientes importados correctamente.")
+                print(f"   -> {resultado.duplicados} ya existían, {resultado.invalidos} filas no válidas")
+                for error in resultado.errores:
+                    print(f"   ⚠️ Fila {error.fila}: {error.detalle}")
+                print(f"✅ {resultado.creados} clientes importados correctamente.")
         else:
             print("⚠️ No se encontró el archivo 'datos/clientes.csv'. Se omiten clientes.")
 
@@ -0,0 +1,554 @@
+import os
+import tempfile
+from datetime import date, datetime
+
+# Set testing mode before importing the app
+os.environ["TESTING"] = "1"
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from sqlalchemy import event
+from sqlmodel import create_engine, SQLModel, Session, select
+
+from app.main import app as fastapi_app
+from app.db.session import get_session
+from app.crud import dashboard_crud, presupuesto_crud
+from app.models.user import User
+from app.models.client import Client
+from app.models.articulo import Articulo
+from app.models.dashboard import DashboardAgregado
+from app.models.presupuesto import Presupuesto, PresupuestoCompletoCreate
+from app.models.presupuesto_linea import PresupuestoLineaCreate
+from app.utils.security import create_access_token
+
+# Import all models so SQLModel knows about them
+import app.models
+
+_temp_db_file = None
+_test_engine = None
+_ids = {}
+
+
+def setup_module(module):
+    global _temp_db_file, _test_engine
+    fd, _temp_db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+
+    _test_engine = create_engine(
+        f"sqlite:///{_temp_db_file}",
+        connect_args={"check_same_thread": False}
+    )
+    SQLModel.metadata.create_all(_test_engine)
+
+    def override_get_session():
+        with Session(_test_engine) as session:
+            yield session
+
+    fastapi_app.dependency_overrides[get_session] = override_get_session
+    # La caché del dashboard es global al proceso: que no arrastre otra BD
+    dashboard_crud.cache_dashboard.invalidar()
+
+    with Session(_test_engine) as session:
+        admin = User(
+            nombre="Admin", apellidos="Dashboard", email="admin_dashboard@example.com",
+            rol="ADMIN", password_hash="x",
+        )
+        session.add(admin)
+        session.commit()
+        session.refresh(admin)
+
+        session.add(Articulo(
+            id="ART-D", nombre="ART-D", descripcion="ART-D", categoria="Fachadas",
+            familia="Clinker", precio=1.0, stock=100,
+        ))
+        session.add(Articulo(
+            id="ART-G", nombre="ART-G", descripcion="ART-G", categoria="Pavimentos",
+            familia="Gres", precio=1.0, stock=100,
+        ))
+        session.commit()
+        _ids["admin"] = admin.id_usuario
+
+
+def teardown_module(module):
+    global _temp_db_file, _test_engine
+    fastapi_app.dependency_overrides.pop(get_session, None)
+    if _test_engine:
+        _test_engine.dispose()
+    if _temp_db_file and os.path.exists(_temp_db_file):
+        try:
+            os.remove(_temp_db_file)
+        except Exception:
+            pass
+
+
+def _auth_headers():
+    token = create_access_token(subject=_ids["admin"])
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _crear_cliente(nombre: str, **campos) -> int:
+    with Session(_test_engine) as session:
+        cliente = Client(nombre=nombre, id_comercial_propietario=_ids["admin"], **campos)
+        session.add(cliente)
+        session.commit()
+        return cliente.id_cliente
+
+
+def _crear_presupuesto(id_cliente: int, estado: str, importe: float, fecha: date = None) -> int:
+    with Session(_test_engine) as session:
+        presupuesto = presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                id_cliente=id_cliente,
+                id_comercial_creador=_ids["admin"],
+                estado=estado,
+                fecha_presupuesto=fecha or date.today(),
+                lineas=[PresupuestoLineaCreate(id_articulo="ART-D", descripcion="x", cantidad=1, precio_unitario=importe)],
+            ),
+        )
+        return presupuesto.id
+
+
+def _agregados():
+    with Session(_test_engine) as session:
+        return dict(session.exec(select(DashboardAgregado.clave, DashboardAgregado.valor)).all())
+
+
+def test_agregados_se_mantienen_al_escribir():
+    client = TestClient(fastapi_app)
+    # Primera lectura: la tabla se inicializa desde los datos existentes
+    stats = client.get("/v1/dashboard/stats", headers=_auth_headers()).json()
+    base_clientes = stats["total_clientes"]
+    base_aprobados = stats["presupuestos_aprobados"]
+    base_ventas = stats["ventas_mensuales"]
+
+    id_cliente = _crear_cliente("Cliente Agregados")
+    aprobado = _crear_presupuesto(id_cliente, "APROBADO", 100.0)
+    borrador = _crear_presupuesto(id_cliente, "BORRADOR", 40.0)
+
+    # Borrador -> aprobado, y cambio de importe del aprobado
+    body = {"estado": "APROBADO"}
+    assert client.put(f"/v1/presupuestos/{borrador}", json=body, headers=_auth_headers()).status_code == 200
+    with Session(_test_engine) as session:
+        linea_id = session.get(Presupuesto, aprobado).lineas[0].id
+    body = {"lineas": [{"id": linea_id, "id_articulo": "ART-D", "descripcion": "x", "cantidad": 2, "precio_unitario": 100}]}
+    assert client.put(f"/v1/presupuestos/{aprobado}", json=body, headers=_auth_headers()).status_code == 200
+
+    # Lectura: los contadores salen de una sola consulta a la tabla de agregados
+    sentencias = []
+    escuchar = lambda conn, cursor, sql, *args: sentencias.append(sql)
+    event.listen(_test_engine, "before_cursor_execute", escuchar)
+    try:
+        stats = client.get("/v1/dashboard/stats", headers=_auth_headers()).json()
+    finally:
+        event.remove(_test_engine, "before_cursor_execute", escuchar)
+    assert len([s for s in sentencias if "dashboard_agregado" in s]) == 1
+    assert not any("GROUP BY presupuesto.estado" in s for s in sentencias)
+
+    assert stats["total_clientes"] == base_clientes + 1
+    assert stats["presupuestos_aprobados"] == base_aprobados + 2
+    assert stats["ventas_mensuales"] == base_ventas + 200.0 + 40.0
+
+    # Borrar resta su aportación
+    assert client.delete(f"/v1/presupuestos/{aprobado}", headers=_auth_headers()).status_code == 200
+    stats = client.get("/v1/dashboard/stats", headers=_auth_headers()).json()
+    assert stats["presupuestos_aprobados"] == base_aprobados + 1
+    assert stats["ventas_mensuales"] == base_ventas + 40.0
+
+
+def test_reconstruir_coincide_con_lo_incremental():
+    id_cliente = _crear_cliente("Cliente Reconstruir")
+    _crear_presupuesto(id_cliente, "APROBADO", 10.0, fecha=date(2030, 5, 3))
+    _crear_presupuesto(id_cliente, "DENEGADO", 5.0, fecha=date(2030, 5, 4))
+
+    incremental = {k: v for k, v in _agregados().items() if v}
+    with Session(_test_engine) as session:
+        reconstruido = dashboard_crud.reconstruir_agregados(session)
+    assert incremental == {k: v for k, v in reconstruido.items() if v}
+    assert reconstruido["ventas:2030-05"] == 10.0
+
+
+def test_cache_coalesce_fallos_concurrentes():
+    import threading
+    import time
+    from app.core.cache import CacheTTL
+
+    cache = CacheTTL(ttl=60)
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        time.sleep(0.05)
+        return "valor"
+
+    hilos = [threading.Thread(target=cache.obtener, args=("stats", calcular)) for _ in range(20)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(llamadas) == 1
+    stats = cache.estadisticas()
+    assert stats.misses == 1 and stats.hits == 19
+
+
+def test_cache_caduca():
+    from app.core.cache import CacheTTL
+
+    ahora = [0.0]
+    cache = CacheTTL(ttl=10, reloj=lambda: ahora[0])
+    assert cache.obtener("k", lambda: 1) == 1
+    assert cache.obtener("k", lambda: 2) == 1
+    ahora[0] = 11
+    assert cache.obtener("k", lambda: 3) == 3
+
+
+def test_cache_limita_entradas_y_locks():
+    from app.core.cache import CacheTTL
+
+    ahora = [0.0]
+    cache = CacheTTL(ttl=10, max_entradas=3, reloj=lambda: ahora[0])
+    for i in range(3):
+        cache.obtener(("stats", i), lambda: i)
+    cache.obtener(("stats", 0), lambda: "no")  # acierto: pasa a ser la más reciente
+    cache.obtener(("stats", 3), lambda: 3)
+    assert cache.estadisticas().entradas == 3
+    assert cache.obtener(("stats", 0), lambda: "no") == 0
+    assert cache.obtener(("stats", 1), lambda: "recalculado") == "recalculado"  # la menos usada, fuera
+    assert not cache._locks
+
+    # Al guardar se purgan las caducadas
+    ahora[0] = 11
+    cache.obtener("nueva", lambda: 1)
+    assert cache.estadisticas().entradas == 1
+
+
+def test_cache_dashboard_se_invalida_al_escribir():
+    client = TestClient(fastapi_app)
+    client.get("/v1/dashboard/stats", headers=_auth_headers())
+    antes = client.get("/v1/dashboard/cache").json()
+
+    # Sin escrituras: acierto
+    stats = client.get("/v1/dashboard/stats", headers=_auth_headers()).json()
+    despues = client.get("/v1/dashboard/cache").json()
+    assert despues["hits"] == antes["hits"] + 1
+
+    # Un cliente nuevo invalida y el siguiente /stats ya lo cuenta
+    _crear_cliente("Cliente Cache")
+    assert client.get("/v1/dashboard/cache").json()["invalidaciones"] > despues["invalidaciones"]
+    nuevo = client.get("/v1/dashboard/stats", headers=_auth_headers()).json()
+    assert nuevo["total_clientes"] == stats["total_clientes"] + 1
+
+    historial = client.get("/v1/dashboard/history", headers=_auth_headers())
+    assert historial.status_code == 200
+    assert client.get("/v1/dashboard/history", headers=_auth_headers()).json() == historial.json()
+
+
+def test_series_de_ventas_con_desgloses():
+    madrid = _crear_cliente("Cliente Madrid", provincia="Madrid")
+    toledo = _crear_cliente("Cliente Toledo", provincia="Toledo")
+    _crear_presupuesto(madrid, "APROBADO", 100.0, fecha=date(2029, 3, 5))   # lunes
+    _crear_presupuesto(madrid, "APROBADO", 50.0, fecha=date(2029, 3, 11))  # domingo, misma semana
+    _crear_presupuesto(toledo, "APROBADO", 30.0, fecha=date(2029, 4, 2))
+    _crear_presupuesto(toledo, "DENEGADO", 999.0, fecha=date(2029, 4, 2))   # no cuenta
+    with Session(_test_engine) as session:
+        presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                id_cliente=toledo,
+                id_comercial_creador=_ids["admin"],
+                estado="APROBADO",
+                fecha_presupuesto=date(2029, 4, 3),
+                lineas=[
+                    PresupuestoLineaCreate(id_articulo="ART-D", descripcion="x", cantidad=1, precio_unitario=5),
+                    PresupuestoLineaCreate(id_articulo="ART-G", descripcion="y", cantidad=1, precio_unitario=7),
+                ],
+            ),
+        )
+
+    client = TestClient(fastapi_app)
+    rango = {"fecha_desde": "2029-01-01", "fecha_hasta": "2029-12-31"}
+
+    mensual = client.get("/v1/dashboard/series", params=rango).json()
+    assert [(p["periodo"], p["ventas"], p["presupuestos"]) for p in mensual] == [
+        ("2029-03", 150.0, 2),
+        ("2029-04", 42.0, 2),
+    ]
+
+    semanal = client.get("/v1/dashboard/series", params={**rango, "periodo": "semana"}).json()
+    assert semanal[0] == {"periodo": "2029-03-05", "grupo": None, "ventas": 150.0, "presupuestos": 2}
+
+    provincias = client.get("/v1/dashboard/series", params={**rango, "desglose": "provincia"}).json()
+    assert [(p["periodo"], p["grupo"], p["ventas"]) for p in provincias] == [
+        ("2029-03", "Madrid", 150.0),
+        ("2029-04", "Toledo", 42.0),
+    ]
+
+    familias = client.get("/v1/dashboard/series", params={**rango, "desglose": "familia"}).json()
+    assert [(p["periodo"], p["grupo"], p["ventas"]) for p in familias] == [
+        ("2029-03", "Clinker", 150.0),
+        ("2029-04", "Clinker", 35.0),
+        ("2029-04", "Gres", 7.0),
+    ]
+
+    comerciales = client.get("/v1/dashboard/series", params={**rango, "desglose": "comercial"}).json()
+    assert {p["grupo"] for p in comerciales} == {str(_ids["admin"])}
+
+    assert client.get("/v1/dashboard/series", params={"periodo": "anual"}).status_code == 422
+
+
+def test_series_usan_indices_de_cobertura():
+    from sqlalchemy import text
+
+    with Session(_test_engine) as session:
+        plan = " ".join(str(fila[-1]) for fila in session.exec(text(
+            "EXPLAIN QUERY PLAN SELECT strftime('%Y-%m', fecha_presupuesto), sum(total) FROM presupuesto "
+            "WHERE estado = 'APROBADO' AND fecha_presupuesto BETWEEN '2029-01-01' AND '2029-12-31' "
+            "GROUP BY 1"
+        )).all())
+    assert "COVERING INDEX ix_presupuesto_ventas" in plan
+
+
+def test_nuevos_clientes_y_articulos_mas_vendidos():
+    from datetime import datetime
+    from sqlalchemy import text
+
+    hoy = date.today()
+    with Session(_test_engine) as session:
+        # Registrado el mes pasado: no cuenta como nuevo
+        antiguo = Client(
+            nombre="Cliente Antiguo", id_comercial_propietario=_ids["admin"],
+            fecha_registro=datetime(2000, 1, 1),
+        )
+        session.add(antiguo)
+        session.commit()
+
+    client = TestClient(fastapi_app)
+    antes = client.get("/v1/dashboard/stats").json()
+    id_cliente = _crear_cliente("Cliente Nuevo Mes")
+    with Session(_test_engine) as session:
+        for articulo, cantidad, estado in (("ART-D", 3, "APROBADO"), ("ART-G", 8, "APROBADO"), ("ART-D", 50, "DENEGADO")):
+            presupuesto_crud.create_presupuesto_completo(
+                session=session,
+                presupuesto_in=PresupuestoCompletoCreate(
+                    id_cliente=id_cliente,
+                    id_comercial_creador=_ids["admin"],
+                    estado=estado,
+                    fecha_presupuesto=hoy,
+                    lineas=[PresupuestoLineaCreate(id_articulo=articulo, descripcion="x", cantidad=cantidad)],
+                ),
+            )
+
+    stats = client.get("/v1/dashboard/stats").json()
+    assert stats["nuevos_clientes_mes"] == antes["nuevos_clientes_mes"] + 1
+
+    ranking = {a["id_articulo"]: a["cantidad"] for a in stats["articulos_mas_vendidos"]}
+    anteriores = {a["id_articulo"]: a["cantidad"] for a in antes["articulos_mas_vendidos"]}
+    assert ranking["ART-G"] == anteriores.get("ART-G", 0) + 8
+    assert ranking["ART-D"] == anteriores.get("ART-D", 0) + 3
+    cantidades = [a["cantidad"] for a in stats["articulos_mas_vendidos"]]
+    assert cantidades == sorted(cantidades, reverse=True)
+    assert stats["articulos_mas_vendidos"][0]["nombre"]
+
+    with Session(_test_engine) as session:
+        plan = " ".join(str(fila[-1]) for fila in session.exec(text(
+            "EXPLAIN QUERY PLAN SELECT count(*) FROM client WHERE fecha_registro >= '2030-01-01'"
+        )).all())
+    assert "ix_client_fecha_registro" in plan
+
+
+def test_historial_compacto_paginado_y_since():
+    id_cliente = _crear_cliente("Cliente Historial", provincia="Cuenca")
+    ids = [_crear_presupuesto(id_cliente, "BORRADOR", 1.0, fecha=date(2040, 1, i + 1)) for i in range(3)]
+
+    client = TestClient(fastapi_app)
+    sentencias = []
+    escuchar = lambda conn, cursor, sql, *args: sentencias.append(sql)
+    event.listen(_test_engine, "before_cursor_execute", escuchar)
+    try:
+        resp = client.get("/v1/dashboard/history", params={"limit": 2})
+    finally:
+        event.remove(_test_engine, "before_cursor_execute", escuchar)
+    assert len(sentencias) == 1 and "JOIN client" in sentencias[0]
+
+    primera = resp.json()
+    assert [p["id"] for p in primera] == [ids[2], ids[1]]
+    assert primera[0]["cliente"] == {"id_cliente": id_cliente, "nombre": "Cliente Historial", "provincia": "Cuenca"}
+    assert "lineas" not in primera[0] and "observaciones" not in primera[0]
+    assert resp.headers["X-Has-More"] == "true"
+
+    segunda = client.get(
+        "/v1/dashboard/history", params={"limit": 2, "cursor": resp.headers["X-Next-Cursor"]}
+    ).json()
+    assert segunda[0]["id"] == ids[0]
+
+    # Polling: solo lo posterior al último id conocido
+    assert client.get("/v1/dashboard/history", params={"since_id": ids[2]}).json() == []
+    nuevo = _crear_presupuesto(id_cliente, "BORRADOR", 1.0, fecha=date(2001, 1, 1))
+    assert [p["id"] for p in client.get("/v1/dashboard/history", params={"since_id": ids[2]}).json()] == [nuevo]
+
+
+def test_eventos_en_vivo_por_websocket():
+    from app.core.eventos import Suscripcion, difusor_dashboard
+
+    client = TestClient(fastapi_app)
+    token = create_access_token(subject=_ids["admin"])
+    with client.websocket_connect(f"/v1/dashboard/ws?token={token}") as ws:
+        assert ws.receive_json() == {"tipo": "conectado"}
+        assert difusor_dashboard.conexiones == 1
+
+        id_cliente = _crear_cliente("Cliente En Vivo")
+        assert ws.receive_json() == {
+            "tipo": "cliente_creado",
+            "id_cliente": id_cliente,
+            "nombre": "Cliente En Vivo",
+            "id_comercial_propietario": _ids["admin"],
+        }
+
+        # Creación con líneas: un único evento, con el total ya calculado
+        id_presupuesto = _crear_presupuesto(id_cliente, "BORRADOR", 25.0)
+        creado = ws.receive_json()
+        assert creado["tipo"] == "presupuesto_creado"
+        assert (creado["id"], creado["estado"], creado["total"]) == (id_presupuesto, "BORRADOR", 25.0)
+
+        with Session(_test_engine) as session:
+            presupuesto = session.get(Presupuesto, id_presupuesto)
+            presupuesto.estado = "APROBADO"
+            session.add(presupuesto)
+            session.commit()
+        cambio = ws.receive_json()
+        assert (cambio["tipo"], cambio["estado_anterior"], cambio["estado"]) == (
+            "presupuesto_actualizado", "BORRADOR", "APROBADO",
+        )
+
+        # Lo que se deshace no se publica
+        with Session(_test_engine) as session:
+            session.add(Client(nombre="Nunca", id_comercial_propietario=_ids["admin"]))
+            session.flush()
+            session.rollback()
+        _crear_cliente("Cliente Siguiente")
+        assert ws.receive_json()["nombre"] == "Cliente Siguiente"
+
+        # Varios objetos nuevos en el mismo flush: un evento por cada uno
+        with Session(_test_engine) as session:
+            session.add_all([
+                Client(nombre=nombre, id_comercial_propietario=_ids["admin"])
+                for nombre in ("Alta Uno", "Alta Dos")
+            ])
+            session.commit()
+        assert {ws.receive_json()["nombre"] for _ in range(2)} == {"Alta Uno", "Alta Dos"}
+
+    assert difusor_dashboard.conexiones == 0
+
+    # Un comercial solo recibe los eventos de lo suyo
+    with Session(_test_engine) as session:
+        comercial = User(
+            nombre="Comercial", apellidos="En Vivo", email="comercial_envivo@example.com",
+            rol="COMERCIAL", password_hash="x",
+        )
+        session.add(comercial)
+        session.commit()
+        id_comercial = comercial.id_usuario
+    token_comercial = create_access_token(subject=id_comercial)
+    with client.websocket_connect(f"/v1/dashboard/ws?token={token_comercial}") as ws_comercial, \
+            client.websocket_connect(f"/v1/dashboard/ws?token={token}") as ws_admin:
+        assert ws_comercial.receive_json() == ws_admin.receive_json() == {"tipo": "conectado"}
+        _crear_cliente("Cliente Ajeno")
+        with Session(_test_engine) as session:
+            session.add(Client(nombre="Cliente Propio", id_comercial_propietario=id_comercial))
+            session.commit()
+        assert [ws_admin.receive_json()["nombre"] for _ in range(2)] == ["Cliente Ajeno", "Cliente Propio"]
+        assert ws_comercial.receive_json()["nombre"] == "Cliente Propio"
+
+    # Evento confirmado por otro worker: no hay aviso en este proceso, llega
+    # porque se lee la tabla cada DASHBOARD_EVENTOS_INTERVALO segundos
+    from app.models.dashboard import EventoDashboard
+
+    with client.websocket_connect(f"/v1/dashboard/ws?token={token}") as ws:
+        assert ws.receive_json() == {"tipo": "conectado"}
+        with _test_engine.begin() as conexion:
+            conexion.execute(EventoDashboard.__table__.insert().values(
+                id_propietario=id_comercial,
+                mensaje='{"tipo": "cliente_creado", "nombre": "Otro Worker"}',
+                creado_en=datetime.now(),
+            ))
+        assert ws.receive_json()["nombre"] == "Otro Worker"
+
+    with pytest.raises(WebSocketDisconnect) as cierre:
+        with client.websocket_connect("/v1/dashboard/ws?token=malo"):
+            pass
+    assert cierre.value.code == 1008
+
+    # Cliente lento: la cola no crece, se vacía y se pide resincronizar
+    import asyncio
+
+    async def llenar():
+        suscripcion = Suscripcion(tamano=3)
+        for i in range(5):
+            suscripcion.entregar(str(i))
+        return [suscripcion.cola.get_nowait() for _ in range(suscripcion.cola.qsize())]
+
+    assert asyncio.run(llenar()) == ['{"tipo": "resync"}', "4"]
+
+
+def test_stats_de_un_periodo_desde_buckets_diarios():
+    from app.models.dashboard import DashboardDiario
+
+    def buckets():
+        with Session(_test_engine) as session:
+            return {
+                (d.fecha, d.estado, d.id_comercial): (d.num, d.bruto, d.neto)
+                for d in session.exec(select(DashboardDiario)).all() if d.num
+            }
+
+    id_cliente = _crear_cliente("Cliente Periodo")
+    with Session(_test_engine) as session:
+        presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                id_cliente=id_cliente,
+                id_comercial_creador=_ids["admin"],
+                estado="APROBADO",
+                fecha_presupuesto=date(2050, 2, 10),
+                lineas=[PresupuestoLineaCreate(id_articulo="ART-D", descripcion="x", cantidad=1, precio_unitario=100, descuento=10)],
+            ),
+        )
+    _crear_presupuesto(id_cliente, "APROBADO", 50.0, fecha=date(2050, 3, 31))
+    _crear_presupuesto(id_cliente, "BORRADOR", 7.0, fecha=date(2050, 3, 1))
+    _crear_presupuesto(id_cliente, "APROBADO", 999.0, fecha=date(2050, 4, 1))  # fuera del trimestre
+
+    client = TestClient(fastapi_app)
+
+    sentencias = []
+    escuchar = lambda conn, cursor, sql, *args: sentencias.append(sql)
+    event.listen(_test_engine, "before_cursor_execute", escuchar)
+    try:
+        stats = client.get(
+            "/v1/dashboard/stats", params={"date_from": "2050-01-01", "date_to": "2050-03-31"},
+            headers=_auth_headers(),
+        ).json()
+    finally:
+        event.remove(_test_engine, "before_cursor_execute", escuchar)
+
+    assert stats["fecha_desde"] == "2050-01-01" and stats["fecha_hasta"] == "2050-03-31"
+    assert stats["presupuestos_aprobados"] == 2 and stats["presupuestos_borrador"] == 1
+    assert stats["ventas_brutas"] == 150.0
+    assert stats["ventas_mensuales"] == 140.0  # 90 + 50 tras el descuento
+    assert not any("FROM presupuesto " in sql and "GROUP BY presupuesto.estado" in sql for sql in sentencias)
+
+    # Los buckets mantenidos al escribir coinciden con los reconstruidos
+    incremental = buckets()
+    with Session(_test_engine) as session:
+        dashboard_crud.reconstruir_agregados(session)
+    assert buckets() == incremental
+
+    assert client.get(
+        "/v1/dashboard/stats", params={"date_from": "2050-04-01", "date_to": "2050-01-01"},
+        headers=_auth_headers(),
+    ).status_code == 400
+    solo_hasta = client.get(
+        "/v1/dashboard/stats", params={"date_to": "2050-03-31"}, headers=_auth_headers()
+    )
+    assert solo_hasta.status_code == 400
+    assert solo_hasta.json()["detail"] == "date_to requiere date_from"
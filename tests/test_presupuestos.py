@@ -0,0 +1,1127 @@
+import os
+import shutil
+import tempfile
+from datetime import date
+
+# Set testing mode before importing the app
+os.environ["TESTING"] = "1"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, update
+from sqlmodel import create_engine, SQLModel, Session, select
+
+from app.main import app as fastapi_app
+from app.core.config import settings
+from app.db.session import get_session
+from app.crud import presupuesto_crud
+from app.models.user import User
+from app.models.client import Client
+from app.models.articulo import Articulo
+from app.models.presupuesto import Presupuesto, PresupuestoCompletoCreate
+from app.models.presupuesto_linea import PresupuestoLinea, PresupuestoLineaCreate
+from app.core.sugerencias import indice_clientes
+from app.utils.security import create_access_token
+
+# Import all models so SQLModel knows about them
+import app.models
+
+_temp_db_file = None
+_test_engine = None
+_pdf_dir = None
+_pdf_dir_original = None
+_ids = {}
+
+
+class QueryCounter:
+    """Cuenta las sentencias SQL que se ejecutan contra el engine de test."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def setup_module(module):
+    global _temp_db_file, _test_engine, _pdf_dir, _pdf_dir_original
+    _pdf_dir = tempfile.mkdtemp()
+    _pdf_dir_original = settings.PDF_CACHE_DIR
+    settings.PDF_CACHE_DIR = _pdf_dir
+
+    fd, _temp_db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+
+    _test_engine = create_engine(
+        f"sqlite:///{_temp_db_file}",
+        connect_args={"check_same_thread": False}
+    )
+    SQLModel.metadata.create_all(_test_engine)
+
+    def override_get_session():
+        with Session(_test_engine) as session:
+            yield session
+
+    fastapi_app.dependency_overrides[get_session] = override_get_session
+    # El índice de sugerencias es global al proceso: que no arrastre otra BD
+    indice_clientes.invalidar()
+
+    # Datos base: un admin, un cliente y dos artículos
+    with Session(_test_engine) as session:
+        admin = User(
+            nombre="Admin", apellidos="Test", email="admin_presupuestos@example.com",
+            rol="ADMIN", password_hash="x",
+        )
+        session.add(admin)
+        session.commit()
+        session.refresh(admin)
+
+        cliente = Client(nombre="Construcciones Test S.L.", id_comercial_propietario=admin.id_usuario)
+        session.add(cliente)
+        for codigo in ("ART-1", "ART-2"):
+            session.add(Articulo(
+                id=codigo, nombre=codigo, descripcion=codigo, categoria="Fachadas",
+                precio=1.0, stock=100,
+            ))
+        session.commit()
+        session.refresh(cliente)
+
+        _ids["admin"] = admin.id_usuario
+        _ids["admin_email"] = admin.email
+        _ids["cliente"] = cliente.id_cliente
+
+
+def teardown_module(module):
+    global _temp_db_file, _test_engine
+    fastapi_app.dependency_overrides.pop(get_session, None)
+    settings.PDF_CACHE_DIR = _pdf_dir_original
+    shutil.rmtree(_pdf_dir, ignore_errors=True)
+    if _test_engine:
+        _test_engine.dispose()
+    if _temp_db_file and os.path.exists(_temp_db_file):
+        try:
+            os.remove(_temp_db_file)
+        except Exception:
+            pass
+
+
+def _auth_headers():
+    token = create_access_token(subject=_ids["admin"])
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _crear_presupuestos(n: int, lineas_por_presupuesto: int = 3):
+    with Session(_test_engine) as session:
+        for i in range(n):
+            presupuesto_crud.create_presupuesto_completo(
+                session=session,
+                presupuesto_in=PresupuestoCompletoCreate(
+                    numero_presupuesto=f"P-{i}",
+                    id_cliente=_ids["cliente"],
+                    id_comercial_creador=_ids["admin"],
+                    lineas=[
+                        PresupuestoLineaCreate(
+                            id_articulo="ART-1" if j % 2 == 0 else "ART-2",
+                            descripcion=f"Línea {j}",
+                            cantidad=2,
+                            precio_unitario=100,
+                            descuento=10,
+                        )
+                        for j in range(lineas_por_presupuesto)
+                    ],
+                ),
+            )
+
+
+def test_listado_completo_usa_numero_fijo_de_consultas():
+    """El número de consultas de un listado no depende del tamaño de la página."""
+    _crear_presupuestos(12)
+
+    def contar(limit: int) -> int:
+        with Session(_test_engine) as session:
+            with QueryCounter(_test_engine) as counter:
+                resultado = presupuesto_crud.get_presupuestos_completos(session, limit=limit).items
+            assert len(resultado) == limit
+            assert all(len(p.lineas) == 3 for p in resultado)
+            return counter.count
+
+    consultas_pagina_pequena = contar(2)
+    consultas_pagina_grande = contar(12)
+    assert consultas_pagina_pequena == consultas_pagina_grande
+    assert consultas_pagina_grande <= 2
+
+
+def test_listado_por_cliente_usa_numero_fijo_de_consultas():
+    with Session(_test_engine) as session:
+        with QueryCounter(_test_engine) as counter:
+            resultado = presupuesto_crud.get_presupuestos_completos_by_client(
+                session, client_id=_ids["cliente"]
+            )
+    assert len(resultado) >= 12
+    assert counter.count <= 2
+
+
+def test_endpoint_listado_devuelve_lineas():
+    client = TestClient(fastapi_app)
+    resp = client.get("/v1/presupuestos/?limit=5", headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert len(data) == 5
+    assert all(len(p["lineas"]) == 3 for p in data)
+
+
+def test_totales_se_guardan_al_crear():
+    with Session(_test_engine) as session:
+        presupuesto = presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                id_cliente=_ids["cliente"],
+                id_comercial_creador=_ids["admin"],
+                total=999.0,  # Se ignora: el total lo calcula el servidor
+                lineas=[
+                    PresupuestoLineaCreate(id_articulo="ART-1", descripcion="A", cantidad=2, precio_unitario=100, descuento=10),
+                    PresupuestoLineaCreate(id_articulo="ART-2", descripcion="B", cantidad=1, precio_unitario=50),
+                ],
+            ),
+        )
+        assert presupuesto.total_bruto == 250.0
+        assert presupuesto.total_descuento == 20.0
+        assert presupuesto.total == 230.0
+        assert [linea.total_linea for linea in presupuesto.lineas] == [180.0, 50.0]
+
+        leido = presupuesto_crud.build_presupuesto_completo_read(presupuesto)
+        assert leido.total_neto == 230.0
+        assert leido.lineas[0].total_linea == 180.0
+
+
+def test_recalcular_totales_repara_valores_guardados():
+    _crear_presupuestos(3, lineas_por_presupuesto=2)
+    with Session(_test_engine) as session:
+        # Simulamos datos antiguos sin totales
+        session.execute(update(PresupuestoLinea).values(total_linea=0.0))
+        session.execute(update(Presupuesto).values(total=0.0, total_bruto=0.0, total_descuento=0.0))
+        session.commit()
+
+        lineas, presupuestos = presupuesto_crud.recalcular_totales(session, tamano_lote=2)
+        assert lineas > 0
+        assert presupuestos > 0
+
+        # Una segunda pasada no encuentra nada que corregir
+        assert presupuesto_crud.recalcular_totales(session, tamano_lote=2) == (0, 0)
+
+        for presupuesto in session.exec(select(Presupuesto)).all():
+            if not presupuesto.lineas:
+                continue
+            assert presupuesto.total == sum(linea.total_linea for linea in presupuesto.lineas)
+        # 2 x 100 con 10% de descuento
+        assert session.exec(select(PresupuestoLinea.total_linea)).first() == 180.0
+
+
+def test_paginacion_por_cursor_recorre_todo_sin_repetir():
+    client = TestClient(fastapi_app)
+    headers = _auth_headers()
+
+    vistos = []
+    cursor = None
+    while True:
+        url = "/v1/presupuestos/?limit=4" + (f"&cursor={cursor}" if cursor else "")
+        resp = client.get(url, headers=headers)
+        assert resp.status_code == 200, resp.text
+        vistos.extend(p["id"] for p in resp.json())
+        if resp.headers["X-Has-More"] != "true":
+            assert "X-Next-Cursor" not in resp.headers
+            break
+        cursor = resp.headers["X-Next-Cursor"]
+
+    with Session(_test_engine) as session:
+        todos = session.exec(select(Presupuesto.id).order_by(Presupuesto.id)).all()
+    assert vistos == list(todos)
+
+
+def test_paginacion_clientes_con_nombres_repetidos():
+    with Session(_test_engine) as session:
+        for _ in range(3):
+            session.add(Client(nombre="Repetido S.A.", id_comercial_propietario=_ids["admin"]))
+        session.commit()
+
+    client = TestClient(fastapi_app)
+    primera = client.get("/v1/clientes/?limit=2", headers=_auth_headers())
+    assert primera.status_code == 200
+    assert primera.headers["X-Has-More"] == "true"
+    segunda = client.get(
+        f"/v1/clientes/?limit=2&cursor={primera.headers['X-Next-Cursor']}", headers=_auth_headers()
+    )
+    ids = [c["id_cliente"] for c in primera.json() + segunda.json()]
+    assert len(ids) == len(set(ids)) == 4
+
+    # Sin limit se devuelven todos, como antes
+    todos = client.get("/v1/clientes/", headers=_auth_headers()).json()
+    assert [c["nombre"] for c in todos] == sorted(c["nombre"] for c in todos)
+
+
+def test_cursor_invalido_devuelve_400():
+    client = TestClient(fastapi_app)
+    resp = client.get("/v1/presupuestos/?cursor=no-es-un-cursor", headers=_auth_headers())
+    assert resp.status_code == 400
+
+    # Base64 válido pero con valores manipulados
+    from app.core.pagination import encode_cursor
+
+    for orden, valores in (
+        ("fecha", ["abc", 1]),
+        ("fecha", [3.5, 1]),
+        ("total", [{"a": 1}, 1]),
+        ("total", ["mucho", 1]),
+        ("id", [[1, 2]]),
+    ):
+        resp = client.get(
+            "/v1/presupuestos/",
+            params={"orden": orden, "cursor": encode_cursor(valores)},
+            headers=_auth_headers(),
+        )
+        assert resp.status_code == 400, (orden, valores, resp.text)
+    resp = client.get("/v1/dashboard/history", params={"cursor": encode_cursor(["ayer", 1])})
+    assert resp.status_code == 400
+
+
+def test_filtros_y_orden_en_servidor():
+    with Session(_test_engine) as session:
+        for i, (estado, cantidad) in enumerate([("APROBADO", 1), ("APROBADO", 5), ("DENEGADO", 3)]):
+            presupuesto_crud.create_presupuesto_completo(
+                session=session,
+                presupuesto_in=PresupuestoCompletoCreate(
+                    numero_presupuesto=f"F-{i}",
+                    estado=estado,
+                    fecha_presupuesto=date(2020, 1, 10 + i),
+                    id_cliente=_ids["cliente"],
+                    id_comercial_creador=_ids["admin"],
+                    lineas=[PresupuestoLineaCreate(
+                        id_articulo="ART-1", descripcion="x", cantidad=cantidad, precio_unitario=100,
+                    )],
+                ),
+            )
+
+    client = TestClient(fastapi_app)
+    resp = client.get(
+        "/v1/presupuestos/?estado=APROBADO&fecha_desde=2020-01-01&fecha_hasta=2020-01-31&orden=-total",
+        headers=_auth_headers(),
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert [p["numero_presupuesto"] for p in data] == ["F-1", "F-0"]
+
+    resp = client.get("/v1/presupuestos/?total_min=250&fecha_hasta=2020-12-31", headers=_auth_headers())
+    assert [p["numero_presupuesto"] for p in resp.json()] == ["F-1", "F-2"]
+
+    # Paginación por fecha descendente con cursor
+    resp = client.get("/v1/presupuestos/?fecha_hasta=2020-12-31&orden=-fecha&limit=2", headers=_auth_headers())
+    siguiente = client.get(
+        f"/v1/presupuestos/?fecha_hasta=2020-12-31&orden=-fecha&limit=2&cursor={resp.headers['X-Next-Cursor']}",
+        headers=_auth_headers(),
+    )
+    assert [p["numero_presupuesto"] for p in resp.json() + siguiente.json()] == ["F-2", "F-1", "F-0"]
+
+    assert client.get("/v1/presupuestos/?orden=cliente", headers=_auth_headers()).status_code == 422
+
+
+def test_filtro_por_estado_usa_indice():
+    with _test_engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM presupuesto "
+            "WHERE estado = 'APROBADO' AND fecha_presupuesto >= '2020-01-01' ORDER BY fecha_presupuesto"
+        ).fetchall()
+    assert any("ix_presupuesto_ventas" in fila[-1] for fila in plan)
+
+
+def test_arranque_pone_al_dia_una_bd_anterior():
+    from app.db.session import create_db_and_tables
+
+    fd, ruta = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine_viejo = create_engine(f"sqlite:///{ruta}")
+    try:
+        # Tablas como estaban antes de updated_at, los totales y la búsqueda
+        with engine_viejo.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE TABLE user (nombre VARCHAR NOT NULL, apellidos VARCHAR NOT NULL, email VARCHAR NOT NULL, "
+                "rol VARCHAR NOT NULL, activo BOOLEAN NOT NULL, id_usuario INTEGER NOT NULL, "
+                "password_hash VARCHAR NOT NULL, PRIMARY KEY (id_usuario))"
+            )
+            conn.exec_driver_sql(
+                "CREATE TABLE client (nombre VARCHAR NOT NULL, nif VARCHAR, correo VARCHAR, provincia VARCHAR, "
+                "direccion VARCHAR, telefono VARCHAR, id_cliente INTEGER NOT NULL, "
+                "id_comercial_propietario INTEGER NOT NULL, fecha_registro DATETIME NOT NULL, PRIMARY KEY (id_cliente))"
+            )
+            conn.exec_driver_sql("INSERT INTO user VALUES ('A', 'B', 'a@b.c', 'ADMIN', 1, 1, 'x')")
+            conn.exec_driver_sql("INSERT INTO client (nombre, id_cliente, id_comercial_propietario, fecha_registro) "
+                                 "VALUES ('Cliente Antiguo', 1, 1, '2020-01-01 00:00:00')")
+
+        create_db_and_tables(engine_viejo)
+        create_db_and_tables(engine_viejo)  # la segunda vez no queda nada por hacer
+
+        with Session(engine_viejo) as session:
+            cliente = session.get(Client, 1)
+            assert cliente.updated_at is not None
+            assert session.exec(select(Presupuesto)).all() == []
+            from app.crud import client_crud
+            assert [c.id_cliente for c in client_crud.buscar_clients(session, "antiguo").items] == [1]
+    finally:
+        engine_viejo.dispose()
+        os.remove(ruta)
+
+
+def test_sincronizar_esquema_borra_indices_obsoletos():
+    from app.db.session import INDICES_OBSOLETOS, sincronizar_esquema
+
+    with _test_engine.begin() as conn:
+        conn.exec_driver_sql("CREATE INDEX ix_presupuesto_estado_fecha ON presupuesto (estado, fecha_presupuesto)")
+        conn.exec_driver_sql("CREATE INDEX ix_presupuestolinea_id_presupuesto ON presupuestolinea (id_presupuesto)")
+    sincronizar_esquema(_test_engine)
+    with _test_engine.connect() as conn:
+        indices = {fila[0] for fila in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert not indices & set(INDICES_OBSOLETOS)
+    assert {"ix_presupuesto_ventas", "ix_presupuesto_linea_ventas"} <= indices
+
+    # Las líneas de un presupuesto salen del índice ancho
+    with _test_engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM presupuestolinea WHERE id_presupuesto = 1"
+        ).fetchall()
+    assert any("ix_presupuesto_linea_ventas" in fila[-1] for fila in plan)
+
+
+def test_resumen_en_una_sola_consulta():
+    with Session(_test_engine) as session:
+        with QueryCounter(_test_engine) as counter:
+            pagina = presupuesto_crud.get_presupuestos_resumen(session, orden="-total", limit=10)
+    assert counter.count == 1
+    assert pagina.has_more
+    primero = pagina.items[0]
+    assert primero.cliente_nombre == "Construcciones Test S.L."
+    assert primero.num_lineas >= 1
+    assert [p.total for p in pagina.items] == sorted((p.total for p in pagina.items), reverse=True)
+
+    client = TestClient(fastapi_app)
+    resp = client.get("/v1/presupuestos/resumen?estado=DENEGADO", headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data and all(p["estado"] == "DENEGADO" for p in data)
+    assert "lineas" not in data[0]
+    assert data[0]["num_lineas"] == 1
+
+
+def test_actualizar_lineas_por_diferencias():
+    with Session(_test_engine) as session:
+        presupuesto = presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                id_cliente=_ids["cliente"],
+                id_comercial_creador=_ids["admin"],
+                lineas=[
+                    PresupuestoLineaCreate(id_articulo="ART-1", descripcion=f"L{i}", cantidad=1, precio_unitario=10)
+                    for i in range(3)
+                ],
+            ),
+        )
+        presupuesto_id = presupuesto.id
+        ids = [linea.id for linea in presupuesto.lineas]
+
+    body = {
+        "lineas": [
+            # sin cambios
+            {"id": ids[0], "id_articulo": "ART-1", "descripcion": "L0", "cantidad": 1, "precio_unitario": 10},
+            # cambia la cantidad
+            {"id": ids[1], "id_articulo": "ART-1", "descripcion": "L1", "cantidad": 4, "precio_unitario": 10},
+            # nueva (ids[2] no viene => se borra)
+            {"id_articulo": "ART-2", "descripcion": "Nueva", "cantidad": 2, "precio_unitario": 5},
+        ]
+    }
+    client = TestClient(fastapi_app)
+    resp = client.put(f"/v1/presupuestos/{presupuesto_id}", json=body, headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+
+    cambios = data["cambios_lineas"]
+    assert cambios["actualizadas"] == [ids[1]]
+    assert cambios["eliminadas"] == [ids[2]]
+    assert len(cambios["insertadas"]) == 1
+    assert cambios["sin_cambios"] == 1
+
+    assert [linea["id"] for linea in data["lineas"]] == [ids[0], ids[1], cambios["insertadas"][0]]
+    assert data["lineas"][1]["total_linea"] == 40.0
+    assert data["total_neto"] == 10.0 + 40.0 + 10.0
+
+    # Solo cabecera: las líneas no se tocan
+    resp = client.put(f"/v1/presupuestos/{presupuesto_id}", json={"observaciones": "ok"}, headers=_auth_headers())
+    assert resp.json()["cambios_lineas"] is None
+    assert len(resp.json()["lineas"]) == 3
+
+
+def test_actualizar_lineas_sin_id_las_empareja():
+    with Session(_test_engine) as session:
+        presupuesto = presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                id_cliente=_ids["cliente"],
+                id_comercial_creador=_ids["admin"],
+                lineas=[
+                    PresupuestoLineaCreate(id_articulo="ART-1", descripcion="Ladrillo", cantidad=1, precio_unitario=10),
+                    PresupuestoLineaCreate(id_articulo="ART-1", descripcion="Ladrillo", cantidad=2, precio_unitario=10),
+                    PresupuestoLineaCreate(id_articulo="ART-2", descripcion="Plaqueta", cantidad=1, precio_unitario=5),
+                ],
+            ),
+        )
+        presupuesto_id = presupuesto.id
+        ids = [linea.id for linea in presupuesto.lineas]
+
+    # Como las envía el formulario: sin id
+    body = {"lineas": [
+        {"id_articulo": "ART-1", "descripcion": "Ladrillo", "cantidad": 1, "precio_unitario": 10},
+        {"id_articulo": "ART-1", "descripcion": "Ladrillo", "cantidad": 5, "precio_unitario": 10},
+        {"id_articulo": "ART-2", "descripcion": "Otra", "cantidad": 1, "precio_unitario": 5},
+    ]}
+    client = TestClient(fastapi_app)
+    resp = client.put(f"/v1/presupuestos/{presupuesto_id}", json=body, headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    cambios = resp.json()["cambios_lineas"]
+    assert cambios["sin_cambios"] == 1
+    assert cambios["actualizadas"] == [ids[1]]
+    assert cambios["eliminadas"] == [ids[2]]
+    assert len(cambios["insertadas"]) == 1
+
+
+def test_crear_con_articulos_inexistentes_los_lista_todos():
+    body = {
+        "id_cliente": _ids["cliente"],
+        "id_comercial_creador": _ids["admin"],
+        "lineas": [
+            {"id_articulo": "NO-1", "descripcion": "x"},
+            {"id_articulo": "ART-1", "descripcion": "x"},
+            {"id_articulo": "NO-2", "descripcion": "x"},
+        ],
+    }
+    client = TestClient(fastapi_app)
+    resp = client.post("/v1/presupuestos/", json=body, headers=_auth_headers())
+    assert resp.status_code == 400
+    assert "NO-1" in resp.json()["detail"] and "NO-2" in resp.json()["detail"]
+
+
+def test_importacion_masiva_con_errores_por_elemento():
+    def presupuesto(id_cliente, articulo):
+        return {
+            "id_cliente": id_cliente,
+            "id_comercial_creador": _ids["admin"],
+            "lineas": [{"id_articulo": articulo, "descripcion": "x", "cantidad": 2, "precio_unitario": 3}] * 50,
+        }
+
+    body = [
+        presupuesto(_ids["cliente"], "ART-1"),
+        presupuesto(999999, "ART-1"),
+        presupuesto(_ids["cliente"], "NO-EXISTE"),
+        presupuesto(_ids["cliente"], "ART-2"),
+    ]
+    client = TestClient(fastapi_app)
+    with QueryCounter(_test_engine) as counter:
+        resp = client.post("/v1/presupuestos/bulk", json=body, headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert len(data["creados"]) == 2
+    assert [e["indice"] for e in data["errores"]] == [1, 2]
+    assert "NO-EXISTE" in data["errores"][1]["detalle"]
+    # Validación + cabeceras + líneas (+ eventos del dashboard) no dependen
+    # del número de líneas
+    assert counter.count < 11
+
+    with Session(_test_engine) as session:
+        creado = session.get(Presupuesto, data["creados"][0])
+        assert len(creado.lineas) == 50
+        assert creado.total == 300.0
+
+
+def test_pdf_se_cachea_y_se_invalida_al_editar():
+    with Session(_test_engine) as session:
+        presupuesto = presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                numero_presupuesto="PDF-1",
+                id_cliente=_ids["cliente"],
+                id_comercial_creador=_ids["admin"],
+                lineas=[PresupuestoLineaCreate(id_articulo="ART-1", descripcion="Panel", cantidad=3, precio_unitario=7)],
+            ),
+        )
+        presupuesto_id = presupuesto.id
+
+    client = TestClient(fastapi_app)
+    url = f"/v1/presupuestos/{presupuesto_id}/pdf"
+
+    resp = client.get(url, headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"] == "application/pdf"
+    assert resp.content.startswith(b"%PDF")
+    ficheros = os.listdir(_pdf_dir)
+    assert [f for f in ficheros if f.startswith(f"presupuesto_{presupuesto_id}_")]
+    cacheado = os.path.join(_pdf_dir, [f for f in ficheros if f.startswith(f"presupuesto_{presupuesto_id}_")][0])
+    mtime = os.path.getmtime(cacheado)
+
+    # Sin cambios: mismo fichero, no se vuelve a generar
+    resp = client.get(url, headers=_auth_headers())
+    assert resp.status_code == 200
+    assert os.path.getmtime(cacheado) == mtime
+
+    # Al editar cambia la versión y la anterior se borra
+    client.put(f"/v1/presupuestos/{presupuesto_id}", json={"observaciones": "Portes incluidos"}, headers=_auth_headers())
+    resp = client.get(url, headers=_auth_headers())
+    assert resp.status_code == 200
+    propios = [f for f in os.listdir(_pdf_dir) if f.startswith(f"presupuesto_{presupuesto_id}_")]
+    assert len(propios) == 1
+    assert os.path.join(_pdf_dir, propios[0]) != cacheado
+
+    assert client.get("/v1/presupuestos/999999/pdf", headers=_auth_headers()).status_code == 404
+
+
+def test_pdf_con_caracteres_de_marcado_en_los_datos():
+    with Session(_test_engine) as session:
+        presupuesto = presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                numero_presupuesto="PDF-<2>",
+                id_cliente=_ids["cliente"],
+                id_comercial_creador=_ids["admin"],
+                observaciones="Portes & descarga</b> a cargo <i>del cliente",
+                lineas=[PresupuestoLineaCreate(
+                    id_articulo="ART-1", descripcion="linea1<br>linea2 & a<i>b</b>", cantidad=1, precio_unitario=1,
+                )],
+            ),
+        )
+        presupuesto_id = presupuesto.id
+
+    client = TestClient(fastapi_app)
+    resp = client.get(f"/v1/presupuestos/{presupuesto_id}/pdf", headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    assert resp.content.startswith(b"%PDF")
+
+
+def test_exportar_pdfs_en_zip():
+    import io
+    import zipfile
+
+    with Session(_test_engine) as session:
+        ids = []
+        for i in range(3):
+            presupuesto = presupuesto_crud.create_presupuesto_completo(
+                session=session,
+                presupuesto_in=PresupuestoCompletoCreate(
+                    numero_presupuesto=f"ZIP/{i}",
+                    fecha_presupuesto=date(2031, 1, 10 + i),
+                    estado="APROBADO",
+                    id_cliente=_ids["cliente"],
+                    id_comercial_creador=_ids["admin"],
+                    lineas=[PresupuestoLineaCreate(id_articulo="ART-2", descripcion="x", cantidad=1, precio_unitario=1)],
+                ),
+            )
+            ids.append(presupuesto.id)
+
+    client = TestClient(fastapi_app)
+    # Uno ya renderizado: se reutiliza desde la caché
+    assert client.get(f"/v1/presupuestos/{ids[0]}/pdf", headers=_auth_headers()).status_code == 200
+
+    resp = client.get(
+        "/v1/presupuestos/exportar/pdf",
+        params={"estado": "APROBADO", "fecha_desde": "2031-01-01", "fecha_hasta": "2031-01-31"},
+        headers=_auth_headers(),
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        nombres = zf.namelist()
+        assert nombres == [f"{ids[i]}_ZIP_{i}.pdf" for i in range(3)]
+        assert all(zf.read(n).startswith(b"%PDF") for n in nombres)
+
+
+def test_zip_se_cierra_aunque_falle_un_pdf(monkeypatch):
+    import io
+    import zipfile
+    from concurrent.futures import Future
+    from app.utils import pdf
+
+    enviar_render = pdf.enviar_render
+
+    def _falla_el_segundo(datos):
+        futuro = Future()
+        if datos["id"] == 9002:
+            futuro.set_exception(RuntimeError("worker caído"))
+        elif datos["id"] == 9004:
+            # Una edición ha generado otra versión y ha borrado esta
+            futuro.set_result(pdf.ruta_cache(9004, "borrada"))
+        else:
+            return enviar_render(datos)
+        return futuro
+
+    monkeypatch.setattr(pdf, "enviar_render", _falla_el_segundo)
+    presupuestos = [{"id": i, "numero_presupuesto": f"E-{i}", "lineas": []} for i in (9001, 9002, 9003, 9004)]
+    contenido = b"".join(pdf.zip_en_streaming(presupuestos))
+
+    with zipfile.ZipFile(io.BytesIO(contenido)) as zf:
+        assert zf.namelist() == ["9001_E-9001.pdf", "9003_E-9003.pdf", pdf.NOMBRE_ERRORES_ZIP]
+        assert zf.read("9003_E-9003.pdf").startswith(b"%PDF")
+        errores = zf.read(pdf.NOMBRE_ERRORES_ZIP).decode()
+    assert "9002_E-9002.pdf" in errores and "worker caído" in errores
+    assert "9004_E-9004.pdf: FileNotFoundError" in errores
+
+
+def test_get_condicional_con_etag():
+    with Session(_test_engine) as session:
+        presupuesto = presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                id_cliente=_ids["cliente"],
+                id_comercial_creador=_ids["admin"],
+                lineas=[PresupuestoLineaCreate(id_articulo="ART-1", descripcion="x", cantidad=1, precio_unitario=2)],
+            ),
+        )
+        presupuesto_id = presupuesto.id
+        linea_id = presupuesto.lineas[0].id
+
+    client = TestClient(fastapi_app)
+    url = f"/v1/presupuestos/{presupuesto_id}"
+    resp = client.get(url, headers=_auth_headers())
+    etag = resp.headers["etag"]
+    assert resp.headers["last-modified"]
+
+    # Misma versión: 304 con una sola consulta (solo updated_at)
+    with QueryCounter(_test_engine) as counter:
+        resp = client.get(url, headers={**_auth_headers(), "If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+    assert counter.count <= 2  # usuario del token + versión
+
+    # Cambiar solo una línea (totales iguales) también cambia la versión
+    body = {"lineas": [{"id": linea_id, "id_articulo": "ART-1", "descripcion": "y", "cantidad": 1, "precio_unitario": 2}]}
+    client.put(url, json=body, headers=_auth_headers())
+    resp = client.get(url, headers={**_auth_headers(), "If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+
+    # Clientes y artículos
+    url_cliente = f"/v1/clientes/{_ids['cliente']}"
+    etag_cliente = client.get(url_cliente, headers=_auth_headers()).headers["etag"]
+    assert client.get(url_cliente, headers={**_auth_headers(), "If-None-Match": etag_cliente}).status_code == 304
+    client.put(url_cliente, json={"telefono": "600000000"}, headers=_auth_headers())
+    assert client.get(url_cliente, headers={**_auth_headers(), "If-None-Match": etag_cliente}).status_code == 200
+
+    resp = client.get("/v1/articulos/ART-1", headers=_auth_headers())
+    last_modified = resp.headers["last-modified"]
+    resp = client.get("/v1/articulos/ART-1", headers={**_auth_headers(), "If-Modified-Since": last_modified})
+    assert resp.status_code == 304
+    assert client.get("/v1/articulos/NO-EXISTE", headers=_auth_headers()).status_code == 404
+
+
+def test_export_csv_y_ndjson_en_streaming():
+    import csv
+    import io
+    import json
+    from app.crud import export_crud
+    from app.models.presupuesto import PresupuestoFiltros
+
+    _crear_presupuestos(3, lineas_por_presupuesto=2)
+    client = TestClient(fastapi_app)
+
+    resp = client.get("/v1/export/presupuestos", params={"estado": "BORRADOR"}, headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"].startswith("text/csv")
+    filas = list(csv.DictReader(io.StringIO(resp.text)))
+    assert filas and all(f["estado"] == "BORRADOR" for f in filas)
+    assert {"id", "cliente_nombre", "total_neto"} <= set(filas[0])
+
+    resp = client.get(
+        "/v1/export/lineas",
+        params={"formato": "ndjson", "fecha_desde": "2000-01-01"},
+        headers=_auth_headers(),
+    )
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lineas = [json.loads(l) for l in resp.text.splitlines()]
+    with Session(_test_engine) as session:
+        assert len(lineas) == len(session.exec(select(PresupuestoLinea)).all())
+    assert {"id_presupuesto", "id_articulo", "total_linea", "fecha_presupuesto"} <= set(lineas[0])
+
+    # El cursor entrega las filas por lotes
+    statement = export_crud.consulta_lineas(PresupuestoFiltros())
+    lotes = list(export_crud.iterar_lotes(_test_engine, statement, tamano_lote=2))
+    assert len(lotes) > 1 and all(len(lote) <= 2 for lote in lotes)
+
+    assert client.get("/v1/export/lineas", params={"formato": "xml"}, headers=_auth_headers()).status_code == 422
+
+
+def test_listado_clientes_con_resumen_en_una_consulta():
+    from app.models.nota import Nota
+
+    with Session(_test_engine) as session:
+        cliente = Client(nombre="AAA Resumen", id_comercial_propietario=_ids["admin"])
+        vacio = Client(nombre="AAB Sin actividad", id_comercial_propietario=_ids["admin"])
+        session.add_all([cliente, vacio])
+        session.commit()
+        for estado, fecha, precio in (("APROBADO", date(2030, 1, 1), 10), ("APROBADO", date(2030, 3, 1), 5), ("DENEGADO", date(2030, 6, 1), 99)):
+            presupuesto_crud.create_presupuesto_completo(
+                session=session,
+                presupuesto_in=PresupuestoCompletoCreate(
+                    id_cliente=cliente.id_cliente,
+                    id_comercial_creador=_ids["admin"],
+                    estado=estado,
+                    fecha_presupuesto=fecha,
+                    lineas=[PresupuestoLineaCreate(id_articulo="ART-1", descripcion="x", cantidad=1, precio_unitario=precio)],
+                ),
+            )
+        session.add(Nota(contenido="llamar", id_cliente=cliente.id_cliente, id_usuario=_ids["admin"]))
+        session.commit()
+        id_cliente, id_vacio = cliente.id_cliente, vacio.id_cliente
+
+    client = TestClient(fastapi_app)
+    with QueryCounter(_test_engine) as counter:
+        resp = client.get("/v1/clientes/", params={"limit": 50, "con_resumen": "true"}, headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    assert counter.count == 3  # usuario + página + resumen agrupado
+
+    por_id = {c["id_cliente"]: c for c in resp.json()}
+    assert por_id[id_cliente]["resumen"] == {
+        "num_presupuestos": 3,
+        "total_aprobado": 15.0,
+        "ultimo_presupuesto": "2030-06-01",
+        "num_notas": 1,
+    }
+    assert por_id[id_vacio]["resumen"]["num_presupuestos"] == 0
+
+    sin_resumen = client.get("/v1/clientes/", params={"limit": 5}, headers=_auth_headers()).json()
+    assert sin_resumen[0]["resumen"] is None
+
+
+def test_comercial_solo_ve_sus_clientes_y_presupuestos():
+    with Session(_test_engine) as session:
+        comercial = User(
+            nombre="Comercial", apellidos="Ámbito", email="comercial_ambito@example.com",
+            rol="COMERCIAL", password_hash="x",
+        )
+        session.add(comercial)
+        session.commit()
+        propio = Client(nombre="Cliente Propio", id_comercial_propietario=comercial.id_usuario)
+        session.add(propio)
+        session.commit()
+        presupuesto_crud.create_presupuesto_completo(
+            session=session,
+            presupuesto_in=PresupuestoCompletoCreate(
+                id_cliente=propio.id_cliente,
+                id_comercial_creador=comercial.id_usuario,
+                lineas=[PresupuestoLineaCreate(id_articulo="ART-1", descripcion="x", cantidad=1, precio_unitario=1)],
+            ),
+        )
+        id_comercial, id_propio = comercial.id_usuario, propio.id_cliente
+
+    client = TestClient(fastapi_app)
+    headers = {"Authorization": f"Bearer {create_access_token(subject=id_comercial)}"}
+
+    clientes = client.get("/v1/clientes/", headers=headers).json()
+    assert [c["id_cliente"] for c in clientes] == [id_propio]
+
+    # Aunque pida los de otro comercial, solo recibe los suyos
+    for ruta in ("/v1/presupuestos/", "/v1/presupuestos/resumen"):
+        resp = client.get(ruta, params={"id_comercial_creador": _ids["admin"]}, headers=headers)
+        assert resp.status_code == 200
+        assert {p["id_comercial_creador"] for p in resp.json()} == {id_comercial}
+
+    # El ADMIN sigue viendo todo
+    todos = client.get("/v1/clientes/", headers=_auth_headers()).json()
+    assert id_propio in {c["id_cliente"] for c in todos} and len(todos) > 1
+
+    with _test_engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM client "
+            "WHERE id_comercial_propietario = 1 ORDER BY nombre, id_cliente"
+        ).all()
+    assert any("ix_client_comercial_nombre" in str(fila) for fila in plan)
+
+
+def test_busqueda_de_clientes_por_texto_completo():
+    with Session(_test_engine) as session:
+        nombre = Client(nombre="Construcciones Peñalara", provincia="Madrid", id_comercial_propietario=_ids["admin"])
+        direccion = Client(nombre="Reformas Sur", direccion="Calle Peñalara 3", provincia="Cádiz",
+                           id_comercial_propietario=_ids["admin"])
+        session.add_all([nombre, direccion])
+        session.commit()
+        id_nombre, id_direccion = nombre.id_cliente, direccion.id_cliente
+
+    client = TestClient(fastapi_app)
+
+    def buscar(q, **params):
+        resp = client.get("/v1/clientes/", params={"q": q, **params}, headers=_auth_headers())
+        assert resp.status_code == 200, resp.text
+        return [c["id_cliente"] for c in resp.json()]
+
+    # Prefijo y sin tildes; pesa más el nombre que la dirección
+    assert buscar("penal") == [id_nombre, id_direccion]
+    assert buscar("penal cadiz") == [id_direccion]
+    assert buscar('"OR (') == []
+
+    # Los triggers mantienen el índice al editar y borrar
+    with Session(_test_engine) as session:
+        cliente = session.get(Client, id_nombre)
+        cliente.nombre = "Construcciones Guadarrama"
+        session.add(cliente)
+        session.commit()
+    assert buscar("penal") == [id_direccion]
+    assert buscar("guadarr") == [id_nombre]
+
+    resp = client.get("/v1/clientes/", params={"q": "penal", "limit": 1}, headers=_auth_headers())
+    assert resp.headers["X-Has-More"] == "false"
+    assert buscar("calle", limit=1) == [id_direccion]
+
+
+def test_sugerencias_de_clientes_sin_tildes_ni_forma_juridica():
+    with Session(_test_engine) as session:
+        portugues = Client(nombre="METALOMECÂNICA SANDIÃES, LDA", id_comercial_propietario=_ids["admin"])
+        espanol = Client(nombre="Sandía Hermanos S.L.", id_comercial_propietario=_ids["admin"])
+        session.add_all([portugues, espanol])
+        session.commit()
+        id_portugues, id_espanol = portugues.id_cliente, espanol.id_cliente
+
+    client = TestClient(fastapi_app)
+
+    def sugerir(q, **params):
+        resp = client.get("/v1/clientes/sugerencias", params={"q": q, **params}, headers=_auth_headers())
+        assert resp.status_code == 200, resp.text
+        return [s["id_cliente"] for s in resp.json()]
+
+    # Hasta completar `limit` se añaden los parecidos: importa el orden
+    assert sugerir("metalomecanica")[0] == id_portugues
+    assert sugerir("SANDIA")[:2] == [id_espanol, id_portugues]  # nombre que empieza así, luego palabra
+    assert sugerir("sandiaes metal")[0] == id_portugues
+    assert sugerir("metalomecanika")[0] == id_portugues         # parecido por trigramas
+    assert id_espanol not in sugerir("sl")
+
+    # Se actualiza con las escrituras, sin volver a la BD
+    with Session(_test_engine) as session:
+        cliente = session.get(Client, id_espanol)
+        cliente.nombre = "Melones del Sur SA"
+        session.add(cliente)
+        session.commit()
+    with QueryCounter(_test_engine) as counter:
+        assert sugerir("melon", limit=1) == [id_espanol]
+    assert counter.count == 1  # solo el usuario del token
+    assert id_espanol not in sugerir("sandia")
+
+    # Por trigramas, el filtro de comercial va antes de quedarse con los
+    # mejores: 300 parecidos de otro comercial no tapan el suyo
+    from app.core.sugerencias import IndiceSugerencias
+
+    indice = IndiceSugerencias()
+    indice.cargar(
+        [(i, f"Ferreteria Garcia {i}", 1) for i in range(300)] + [(999, "Ferreteira Garsia", 2)]
+    )
+    sugeridos = indice.buscar("ferreteria garcia x", filtro=lambda e: e.id_comercial == 2)
+    assert [e.id_cliente for e in sugeridos] == [999]
+
+
+def test_importar_clientes_desde_csv():
+    from app.crud import dashboard_crud
+
+    csv_texto = (
+        "Nombre;NIF;Email;Provincia\n"
+        "Importada Uno, S.L.;B-11.111.111;uno@example.com;Toledo\n"
+        "IMPORTADA UNO SL;;;\n"                    # repetida en el fichero (nombre)
+        "Importada Dos;b11111111;;\n"              # repetida en el fichero (NIF)
+        "construcciones test;;;\n"                 # ya existe (setup)
+        ";B22222222;;\n"                           # sin nombre
+        "Importada Tres;;;Soria;extra\n"           # campos de más
+        "\n"
+        "Importadora Ñandú, Lda;;;Porto\n"
+    ).encode("utf-8")
+
+    with Session(_test_engine) as session:
+        clientes_antes = dashboard_crud.leer_agregados(session, ["clientes"])["clientes"]
+
+    client = TestClient(fastapi_app)
+    with QueryCounter(_test_engine) as counter:
+        resp = client.post(
+            "/v1/clientes/import",
+            files={"fichero": ("clientes.csv", csv_texto, "text/csv")},
+            headers=_auth_headers(),
+        )
+    assert resp.status_code == 200, resp.text
+    resultado = resp.json()
+    assert (resultado["creados"], resultado["duplicados"], resultado["invalidos"]) == (2, 3, 2)
+    assert [e["fila"] for e in resultado["errores"]] == [6, 7]
+    assert counter.count < 10  # sin un SELECT por fila
+
+    with Session(_test_engine) as session:
+        uno = session.exec(select(Client).where(Client.nombre == "Importada Uno, S.L.")).one()
+        assert (uno.correo, uno.provincia, uno.id_comercial_propietario) == ("uno@example.com", "Toledo", _ids["admin"])
+        assert dashboard_crud.leer_agregados(session, ["clientes"])["clientes"] == clientes_antes + 2
+
+    # Visibles en la búsqueda y en las sugerencias
+    encontrados = client.get("/v1/clientes/", params={"q": "nandu"}, headers=_auth_headers()).json()
+    assert [c["nombre"] for c in encontrados] == ["Importadora Ñandú, Lda"]
+    sugeridos = client.get("/v1/clientes/sugerencias", params={"q": "importad"}, headers=_auth_headers()).json()
+    assert {s["nombre"] for s in sugeridos} >= {"Importada Uno, S.L.", "Importadora Ñandú, Lda"}
+
+    # Reimportar no crea nada
+    resp = client.post(
+        "/v1/clientes/import",
+        files={"fichero": ("clientes.csv", csv_texto, "text/csv")},
+        headers=_auth_headers(),
+    )
+    assert resp.json()["creados"] == 0
+
+
+def test_sincronizacion_incremental_de_clientes_y_articulos():
+    client = TestClient(fastapi_app)
+    resp = client.get("/v1/clientes/", params={"limit": 5}, headers=_auth_headers())
+    token = resp.headers["X-Sync-Token"]
+
+    with Session(_test_engine) as session:
+        nuevo = Client(nombre="Sync Nuevo", id_comercial_propietario=_ids["admin"])
+        borrado = Client(nombre="Sync Borrado", id_comercial_propietario=_ids["admin"])
+        session.add_all([nuevo, borrado])
+        session.commit()
+        id_nuevo, id_borrado = nuevo.id_cliente, borrado.id_cliente
+    assert client.delete(f"/v1/clientes/{id_borrado}", headers=_auth_headers()).status_code in (200, 204)
+
+    resp = client.get("/v1/clientes/", params={"updated_since": token}, headers=_auth_headers())
+    assert resp.status_code == 200, resp.text
+    sync = resp.json()
+    assert id_nuevo in {c["id_cliente"] for c in sync["cambios"]}
+    assert id_borrado not in {c["id_cliente"] for c in sync["cambios"]}
+    assert id_borrado in sync["borrados"]
+    assert sync["token"] == resp.headers["X-Sync-Token"]
+
+    # Artículos: mismo mecanismo, ids de texto
+    token = client.get("/v1/articulos/", params={"limit": 1}).headers["X-Sync-Token"]
+    with Session(_test_engine) as session:
+        for codigo in ("ART-SYNC", "ART-SYNC-BORRADO"):
+            session.add(Articulo(id=codigo, nombre=codigo, descripcion="x", categoria="Fachadas", precio=1.0, stock=1))
+        session.commit()
+    assert client.delete("/v1/articulos/ART-SYNC-BORRADO").status_code in (200, 204)
+    sync = client.get("/v1/articulos/", params={"updated_since": token}).json()
+    assert "ART-SYNC" in {a["id"] for a in sync["cambios"]}
+    assert sync["borrados"] == ["ART-SYNC-BORRADO"]
+
+    assert client.get("/v1/articulos/", params={"updated_since": "basura"}).status_code == 400
+
+
+def test_sincronizacion_de_un_comercial_con_reasignaciones_y_borrados_ajenos():
+    with Session(_test_engine) as session:
+        anterior, nuevo = (
+            User(nombre=n, apellidos="Sync", email=f"{n.lower()}_sync@example.com", rol="COMERCIAL", password_hash="x")
+            for n in ("Anterior", "Nuevo")
+        )
+        session.add_all([anterior, nuevo])
+        session.commit()
+        reasignado = Client(nombre="Sync Reasignado", id_comercial_propietario=anterior.id_usuario)
+        ajeno = Client(nombre="Sync Ajeno", id_comercial_propietario=_ids["admin"])
+        session.add_all([reasignado, ajeno])
+        session.commit()
+        id_anterior, id_nuevo = anterior.id_usuario, nuevo.id_usuario
+        id_reasignado, id_ajeno = reasignado.id_cliente, ajeno.id_cliente
+
+    client = TestClient(fastapi_app)
+    cabeceras = {
+        id_usuario: {"Authorization": f"Bearer {create_access_token(subject=id_usuario)}"}
+        for id_usuario in (id_anterior, id_nuevo)
+    }
+    token = client.get("/v1/clientes/", headers=_auth_headers()).headers["X-Sync-Token"]
+
+    resp = client.put(
+        f"/v1/clientes/{id_reasignado}", json={"id_comercial_propietario": id_nuevo}, headers=_auth_headers()
+    )
+    assert resp.status_code == 200, resp.text
+    assert client.delete(f"/v1/clientes/{id_ajeno}", headers=_auth_headers()).status_code in (200, 204)
+
+    def sincronizar(headers):
+        resp = client.get("/v1/clientes/", params={"updated_since": token}, headers=headers)
+        assert resp.status_code == 200, resp.text
+        return resp.json()
+
+    # El anterior propietario lo quita de su copia; no se entera de borrados ajenos
+    sync = sincronizar(cabeceras[id_anterior])
+    assert sync["cambios"] == []
+    assert sync["borrados"] == [id_reasignado]
+
+    sync = sincronizar(cabeceras[id_nuevo])
+    assert [c["id_cliente"] for c in sync["cambios"]] == [id_reasignado]
+    assert sync["borrados"] == []
+
+    # El ADMIN lo sigue viendo: para él no es un borrado
+    sync = sincronizar(_auth_headers())
+    assert id_reasignado in {c["id_cliente"] for c in sync["cambios"]}
+    assert id_reasignado not in sync["borrados"]
+    assert id_ajeno in sync["borrados"]
+
+
+def test_respuestas_comprimidas_segun_accept_encoding():
+    import brotli
+    import gzip
+    import json
+    from app.core.compresion import CompresionMiddleware, elegir_codificacion
+
+    assert elegir_codificacion("gzip, deflate, br") == "br"
+    assert elegir_codificacion("br;q=0, gzip") == "gzip"
+    assert elegir_codificacion("identity") is None
+
+    _crear_presupuestos(10, lineas_por_presupuesto=5)
+    client = TestClient(fastapi_app)
+    url = "/v1/presupuestos/?limit=10"
+
+    # Se pide sin descomprimir para ver los bytes que viajan
+    plano = client.get(url, headers={**_auth_headers(), "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plano.headers
+    with client.stream("GET", url, headers={**_auth_headers(), "Accept-Encoding": "br"}) as resp:
+        crudo = b"".join(resp.iter_raw())
+        assert resp.headers["content-encoding"] == "br"
+        assert "Accept-Encoding" in resp.headers["vary"]
+    assert len(crudo) < len(plano.content)
+    assert json.loads(brotli.decompress(crudo)) == plano.json()
+
+    with client.stream("GET", url, headers={**_auth_headers(), "Accept-Encoding": "gzip"}) as resp:
+        assert resp.headers["content-encoding"] == "gzip"
+        assert json.loads(gzip.decompress(b"".join(resp.iter_raw()))) == plano.json()
+
+    # Cuerpos pequeños, tal cual
+    resp = client.get("/v1/articulos/ART-1", headers=_auth_headers())
+    assert "content-encoding" not in resp.headers
+
+    # Detalle con ETag: ETag débil, se comprime una sola vez y el 304 sigue funcionando
+    with Session(_test_engine) as session:
+        presupuesto_id = session.exec(select(Presupuesto.id)).first()
+    detalle = f"/v1/presupuestos/{presupuesto_id}"
+    body = {"lineas": [
+        {"id_articulo": "ART-1", "descripcion": f"Línea larga {j} " * 5, "cantidad": 1, "precio_unitario": 1}
+        for j in range(20)
+    ]}
+    assert client.put(detalle, json=body, headers=_auth_headers()).status_code == 200
+    resp = client.get(detalle, headers=_auth_headers())
+    assert resp.headers["content-encoding"] == "br"
+    etag = resp.headers["etag"]
+    assert etag.startswith('W/"')
+    assert resp.json()["id"] == presupuesto_id
+    assert client.get(detalle, headers={**_auth_headers(), "If-None-Match": etag}).status_code == 304
+
+    middleware = fastapi_app.middleware_stack
+    while not isinstance(middleware, CompresionMiddleware):
+        middleware = middleware.app
+    en_cache = len(middleware.cache)
+    assert en_cache >= 1
+    assert client.get(detalle, headers=_auth_headers()).json() == resp.json()
+    assert len(middleware.cache) == en_cache  # misma versión: no se vuelve a comprimir
+
+    # Exportación en streaming: comprimida por trozos
+    with client.stream("GET", "/v1/export/lineas", headers={**_auth_headers(), "Accept-Encoding": "gzip"}) as resp:
+        assert resp.headers["content-encoding"] == "gzip"
+        assert "content-length" not in resp.headers
+        texto = gzip.decompress(b"".join(resp.iter_raw())).decode()
+    assert len(texto.splitlines()) > 1